@@ -1,11 +1,9 @@
+import os
 import dash
 import dash_bootstrap_components as dbc
 from dash import dcc, html
 from dash.dependencies import Input, Output
-from pages import detection, video, education, problem  
-
-# Initialize the app with a Bootstrap theme
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True)
+import registry
 
 # Define the navbar
 navbar = dbc.Navbar(
@@ -34,31 +32,55 @@ navbar = dbc.Navbar(
     fixed="top",
 )
 
-# Define the layout with a placeholder content area
-app.layout = html.Div([
-    dcc.Location(id='url', refresh=False),
-    navbar,
-    html.Div(id='page-content', style={"margin-top": "80px"}),  # Added margin to avoid overlap with navbar
-])
+def create_app():
+    """Build the Dash app: pages, callbacks and the upload routes on its Flask server."""
+    # Imported here: the pages set up the detection pipeline, job runners and upload store
+    from pages import detection, video, education, problem
+    import uploads
 
-@app.callback(
-    Output('page-content', 'children'),
-    [Input('url', 'pathname')]
-)
-def display_page(pathname):
-    if pathname == '/detection':
-        return detection.layout
-    elif pathname == '/':
-        return problem.layout  # Fixed problem page navigation
-    elif pathname == '/education':
-        return education.layout
-    elif pathname == '/video':
-        return video.layout
-    else:
-        return problem.layout  # Default to problem page
+    # Initialize the app with a Bootstrap theme
+    app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True)
+
+    # Resumable chunked uploads (used by assets/chunked_upload.js) go straight to disk on the Flask server
+    uploads.register_routes(app.server)
+
+    # Define the layout with a placeholder content area
+    app.layout = html.Div([
+        dcc.Location(id='url', refresh=False),
+        navbar,
+        html.Div(id='page-content', style={"margin-top": "80px"}),  # Added margin to avoid overlap with navbar
+    ])
+
+    @app.callback(
+        Output('page-content', 'children'),
+        [Input('url', 'pathname')]
+    )
+    def display_page(pathname):
+        if pathname == '/detection':
+            return detection.layout
+        elif pathname == '/':
+            return problem.layout  # Fixed problem page navigation
+        elif pathname == '/education':
+            return education.layout
+        elif pathname == '/video':
+            return video.layout
+        else:
+            return problem.layout  # Default to problem page
+
+    detection.register_callbacks(app)
+    video.register_callbacks(app)  # Register video callbacks
+    return app
 
-detection.register_callbacks(app)
-video.register_callbacks(app)  # Register video callbacks
+# Spawned inference workers (INFERENCE_WORKERS > 0) re-import this script as __mp_main__; they only
+# need the model, not a second copy of the web app
+if __name__ != '__mp_main__':
+    app = create_app()
 
 if __name__ == '__main__':
-    app.run_server(debug=True)
\ No newline at end of file
+    debug = True
+    # Load the shared YOLO model in the background so the first request does not pay for it. With the
+    # reloader this script also runs in a file-watching parent that never serves requests; only the
+    # serving child (WERKZEUG_RUN_MAIN=true) warms up, so the model (or inference pool) is loaded once.
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        registry.warm_up()
+    app.run_server(debug=debug)
\ No newline at end of file
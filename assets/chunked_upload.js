@@ -0,0 +1,112 @@
+// assets/chunked_upload.js
+// Sends files dropped on (or picked through) a dcc.Upload wrapped in a [data-chunked-upload] element
+// to the resumable /uploads routes in fixed-size chunks, instead of letting dcc.Upload read the whole
+// file into a base64 data URI. When the upload completes, only {upload_id, filename} is written to the
+// dcc.Store named by data-chunked-upload; progress text goes to the element named by data-upload-progress.
+//
+// Interrupted uploads resume: the upload id is remembered per file (name, size, mtime) in localStorage
+// and the server is asked how many bytes it already has before sending the rest.
+
+(function () {
+    var CHUNK_SIZE = 8 * 1024 * 1024;
+    var MAX_RETRIES = 5;
+
+    function setProps(id, props) {
+        if (id && window.dash_clientside && window.dash_clientside.set_props) {
+            window.dash_clientside.set_props(id, props);
+        }
+    }
+
+    function sleep(ms) {
+        return new Promise(function (resolve) { setTimeout(resolve, ms); });
+    }
+
+    function fileKey(file) {
+        return 'chunked-upload:' + file.name + ':' + file.size + ':' + file.lastModified;
+    }
+
+    async function json(response) {
+        var body = await response.json().catch(function () { return {}; });
+        if (!response.ok && response.status !== 409) {
+            throw new Error(body.error || ('HTTP ' + response.status));
+        }
+        body.status = response.status;
+        return body;
+    }
+
+    async function startOrResume(file) {
+        var uploadId = localStorage.getItem(fileKey(file));
+        if (uploadId) {
+            var status = await fetch('/uploads/' + uploadId).then(json).catch(function () { return null; });
+            if (status && !status.complete) {
+                return {uploadId: uploadId, offset: status.received};
+            }
+        }
+        var created = await fetch('/uploads', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({filename: file.name, size: file.size})
+        }).then(json);
+        localStorage.setItem(fileKey(file), created.upload_id);
+        return {uploadId: created.upload_id, offset: 0};
+    }
+
+    async function sendChunk(uploadId, file, offset) {
+        for (var attempt = 0; ; attempt++) {
+            try {
+                var body = await fetch('/uploads/' + uploadId + '?offset=' + offset, {
+                    method: 'PUT',
+                    headers: {'Content-Type': 'application/octet-stream'},
+                    body: file.slice(offset, offset + CHUNK_SIZE)
+                }).then(json);
+                return body.received;  // On 409 this is where the server wants us to continue
+            } catch (err) {
+                if (attempt >= MAX_RETRIES) {
+                    throw err;
+                }
+                await sleep(Math.min(8000, 500 * Math.pow(2, attempt)));
+            }
+        }
+    }
+
+    async function upload(file, storeId, progressId) {
+        try {
+            var state = await startOrResume(file);
+            var offset = state.offset;
+            while (offset < file.size) {
+                setProps(progressId, {children: 'Uploading ' + file.name + ': ' + Math.floor(100 * offset / file.size) + '%'});
+                offset = await sendChunk(state.uploadId, file, offset);
+            }
+            var done = await fetch('/uploads/' + state.uploadId + '/complete', {method: 'POST'}).then(json);
+            localStorage.removeItem(fileKey(file));
+            setProps(progressId, {children: ''});
+            setProps(storeId, {data: {upload_id: done.upload_id, filename: done.filename}});
+        } catch (err) {
+            setProps(progressId, {children: 'Upload of ' + file.name + ' failed: ' + err.message + ' (select the file again to resume)'});
+        }
+    }
+
+    function intercept(event, files) {
+        var zone = event.target && event.target.closest && event.target.closest('[data-chunked-upload]');
+        if (!zone || !files || !files.length || !window.fetch) {
+            return;
+        }
+        // Keep dcc.Upload from reading the file into memory
+        event.preventDefault();
+        event.stopPropagation();
+        upload(files[0], zone.getAttribute('data-chunked-upload'), zone.getAttribute('data-upload-progress'));
+        if (event.target.value !== undefined) {
+            event.target.value = '';  // Allow picking the same file again
+        }
+    }
+
+    // Capture phase on window runs before React's own listeners
+    window.addEventListener('change', function (event) {
+        if (event.target && event.target.type === 'file') {
+            intercept(event, event.target.files);
+        }
+    }, true);
+    window.addEventListener('drop', function (event) {
+        intercept(event, event.dataTransfer && event.dataTransfer.files);
+    }, true);
+})();
@@ -0,0 +1,23 @@
+# atomic.py
+# Write-then-rename for files that other threads or processes may read while they are being written
+# (cache entries, recorded backend responses, batch result parts): readers see the old file or the
+# complete new one, never a half-written one.
+
+import contextlib
+import os
+import threading
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode='w'):
+    """Open a temporary file next to `path`; on a clean exit it replaces `path`, on an error it is removed."""
+    # pid and thread id keep concurrent writers of the same path (threads, spawned workers) apart
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,261 @@
+# batch.py
+# Headless batch detection for survey ingestion: walk a folder of images and videos, run the same
+# ensemble as the Dash app (model.process_image_file / process_video_file) across a process pool with
+# the YOLO model loaded once per worker, and append fused detections to JSONL or Parquet as each file
+# finishes. Re-running with the same output skips files that were already processed successfully.
+#
+#   python batch.py survey/2024-06-01 --output results/2024-06-01.jsonl --workers 4
+#   python batch.py survey/2024-06-01 --output results/2024-06-01.parquet --annotated-dir results/annotated
+
+import argparse
+import concurrent.futures
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+
+from atomic import atomic_write
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv')
+PARQUET_FLUSH_ROWS = 200  # Rows per Parquet part file
+
+# Set in each worker process by _init_worker
+_model_module = None
+_worker_options = {}
+
+
+def find_media(root):
+    """Images and videos under root, in a stable order."""
+    paths = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if name.lower().endswith(IMAGE_EXTENSIONS + VIDEO_EXTENSIONS):
+                paths.append(os.path.join(dirpath, name))
+    return sorted(paths)
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return stat.st_size, int(stat.st_mtime)
+
+
+def annotated_name(path, root, ext=None):
+    """Flattened relative path, so same-named files from different subfolders do not collide."""
+    name = os.path.relpath(path, root).replace(os.sep, '__')
+    return f"{os.path.splitext(name)[0]}{ext}" if ext else name
+
+
+def _jsonable(value):
+    return value.tolist() if hasattr(value, 'tolist') else float(value)
+
+
+def _init_worker(torch_threads, options):
+    """Load the model once per worker process, with its share of the CPU cores."""
+    global _model_module, _worker_options
+    import torch
+    torch.set_num_threads(torch_threads)
+    # Every ingested file is new: caching would only write a PNG per image to disk and hold annotated images in memory
+    os.environ['DETECTION_CACHE_DIR'] = ''
+    import model
+    model.detection_cache.max_entries = 0
+    from registry import get_local_model
+    get_local_model()  # Never an inference pool: these processes are the workers
+    _model_module = model
+    _worker_options = options
+
+
+def process_file(path):
+    """Detections for one image or video; runs in a worker process and returns a JSON-ready record."""
+    import cv2
+    from motion import MotionGate
+
+    size, mtime = file_signature(path)
+    record = {'path': path, 'bytes': size, 'mtime': mtime, 'status': 'ok'}
+    annotated_dir = _worker_options.get('annotated_dir')
+    start = time.perf_counter()
+    try:
+        if path.lower().endswith(IMAGE_EXTENSIONS):
+            image, boxes, sources = _model_module.process_image_file(path)
+            record.update(type='image', frames=1, sources=sources, detections=boxes)
+            if annotated_dir:
+                cv2.imwrite(os.path.join(annotated_dir, annotated_name(path, _worker_options['root'])), image)
+        else:
+            if annotated_dir:
+                output_path = os.path.join(annotated_dir, annotated_name(path, _worker_options['root'], '.mp4'))
+            else:
+                fd, output_path = tempfile.mkstemp(suffix='.mp4')
+                os.close(fd)
+            try:
+                gate = MotionGate() if _worker_options.get('motion_gating') else None
+                _, stats = _model_module.process_video_file(path, skip_frames=_worker_options.get('skip_frames', 5),
+                                                            output_path=output_path, motion_gate=gate)
+            finally:
+                if not annotated_dir and os.path.exists(output_path):
+                    os.remove(output_path)
+            record.update(type='video', frames=stats['frames_processed'], class_counts=stats['class_counts'],
+                          inference_calls=stats.get('inference_calls'))
+    except Exception as e:
+        record.update(status='error', error=str(e))
+    record['seconds'] = time.perf_counter() - start
+    return record
+
+
+class JsonlSink:
+    """One JSON record per line, flushed per record so an interrupted run keeps everything written so far."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def done(self):
+        """{path: (bytes, mtime)} of files already processed successfully."""
+        done = {}
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # A line cut short by an interrupted run
+                if record.get('status') == 'ok':
+                    done[record['path']] = (record['bytes'], record['mtime'])
+        return done
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._file = open(self.path, 'a')
+        return self
+
+    def write(self, record):
+        self._file.write(json.dumps(record, default=_jsonable) + '\n')
+        self._file.flush()
+
+    def __exit__(self, *exc):
+        self._file.close()
+
+
+class ParquetSink:
+    """A Parquet dataset directory; every PARQUET_FLUSH_ROWS records become a new part file.
+
+    Detections are stored as a JSON string column so images and videos share one schema.
+    """
+
+    def __init__(self, path, flush_rows=PARQUET_FLUSH_ROWS):
+        self.path = path
+        self.flush_rows = flush_rows
+        self._rows = []
+
+    def _parts(self):
+        return sorted(glob.glob(os.path.join(self.path, 'part-*.parquet')))
+
+    def done(self):
+        import pyarrow.parquet as pq
+        done = {}
+        for part in self._parts():
+            table = pq.read_table(part, columns=['path', 'status', 'bytes', 'mtime'])
+            for row in table.to_pylist():
+                if row['status'] == 'ok':
+                    done[row['path']] = (row['bytes'], row['mtime'])
+        return done
+
+    def __enter__(self):
+        # Imported here so pyarrow stays optional for JSONL runs
+        import pyarrow  # noqa: F401
+        os.makedirs(self.path, exist_ok=True)
+        self._next_part = len(self._parts())
+        return self
+
+    def write(self, record):
+        payload = {k: v for k, v in record.items() if k not in ('path', 'type', 'status', 'error', 'bytes', 'mtime', 'seconds', 'frames')}
+        self._rows.append({
+            'path': record['path'], 'type': record.get('type'), 'status': record['status'], 'error': record.get('error'),
+            'bytes': record['bytes'], 'mtime': record['mtime'], 'seconds': record['seconds'], 'frames': record.get('frames'),
+            'result': json.dumps(payload, default=_jsonable),
+        })
+        if len(self._rows) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._rows:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        path = os.path.join(self.path, f"part-{self._next_part:05d}.parquet")
+        with atomic_write(path, 'wb') as f:  # A resumed run never reads a half-written part
+            pq.write_table(pa.Table.from_pylist(self._rows), f)
+        self._next_part += 1
+        self._rows = []
+
+    def __exit__(self, *exc):
+        self.flush()
+
+
+def run(root, sink, workers, options, resume=True):
+    paths = find_media(root)
+    if resume:
+        done = sink.done()
+        todo = [p for p in paths if done.get(p) != file_signature(p)]
+        if len(todo) < len(paths):
+            print(f"Resuming: {len(paths) - len(todo)} of {len(paths)} files already processed")
+        paths = todo
+    if not paths:
+        print("Nothing to do.")
+        return {}
+
+    if options.get('annotated_dir'):
+        os.makedirs(options['annotated_dir'], exist_ok=True)
+    options = {**options, 'root': root}
+    torch_threads = max(1, (os.cpu_count() or 1) // workers)
+    summary = {'files': 0, 'failed': 0, 'images': 0, 'videos': 0, 'frames': 0, 'detections': 0}
+    start = time.perf_counter()
+    with sink, concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                      initargs=(torch_threads, options)) as executor:
+        futures = [executor.submit(process_file, path) for path in paths]
+        for future in concurrent.futures.as_completed(futures):
+            record = future.result()
+            sink.write(record)
+            summary['files'] += 1
+            if record['status'] != 'ok':
+                summary['failed'] += 1
+                print(f"[{summary['files']}/{len(paths)}] {record['path']}: FAILED {record['error']}")
+                continue
+            summary[f"{record['type']}s"] += 1
+            summary['frames'] += record['frames']
+            found = len(record['detections']) if record['type'] == 'image' else sum(record['class_counts'].values())
+            summary['detections'] += found
+            elapsed = time.perf_counter() - start
+            print(f"[{summary['files']}/{len(paths)}] {record['path']}: {found} objects in {record['seconds']:.1f}s "
+                  f"({summary['files'] / elapsed:.2f} files/s)")
+
+    summary['seconds'] = time.perf_counter() - start
+    summary['files_per_second'] = summary['files'] / summary['seconds']
+    summary['frames_per_second'] = summary['frames'] / summary['seconds']
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run AquaEye detection over a folder of images and videos')
+    parser.add_argument('input', help='folder to scan (recursively)')
+    parser.add_argument('--output', required=True, help='results file: .jsonl, or .parquet (a directory of part files)')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2), help='worker processes, each with its own model')
+    parser.add_argument('--skip-frames', type=int, default=5, help='keep every n-th video frame when motion gating is off')
+    parser.add_argument('--motion-gating', action='store_true', help='infer video frames by motion instead of a fixed stride')
+    parser.add_argument('--annotated-dir', help='also write annotated images/videos here')
+    parser.add_argument('--no-resume', action='store_true', help='reprocess files already in the output')
+    args = parser.parse_args()
+
+    sink = ParquetSink(args.output) if args.output.endswith('.parquet') else JsonlSink(args.output)
+    options = {'skip_frames': args.skip_frames, 'motion_gating': args.motion_gating, 'annotated_dir': args.annotated_dir}
+    summary = run(args.input, sink, args.workers, options, resume=not args.no_resume)
+    if summary:
+        print(f"Processed {summary['files']} files ({summary['images']} images, {summary['videos']} videos, "
+              f"{summary['failed']} failed) in {summary['seconds']:.1f}s: {summary['files_per_second']:.2f} files/s, "
+              f"{summary['frames_per_second']:.1f} frames/s, {summary['detections']} objects")
+    sys.exit(1 if summary.get('failed') else 0)
+
+
+if __name__ == '__main__':
+    main()
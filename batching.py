@@ -0,0 +1,45 @@
+# batching.py
+# Batched YOLOv5 inference: N frames go through one forward pass instead of N threads sharing the model
+
+import cv2
+
+# Frames stacked into one forward pass
+DEFAULT_BATCH_SIZE = 8
+
+
+def detect_batch(model, frames, size=640, slots=None):
+    """Run the YOLOv5 hub model on a list of BGR frames in a single forward pass.
+
+    Returns one Detections object per frame, in input order, each shaped like the
+    result of model(single_image) (so results.xyxy[0], .render() etc. still work).
+    A pooled model gets the BGR frames through its shared-memory ring instead; `slots`
+    are the (slot, shape) pairs of frames that were decoded straight into that ring.
+    """
+    if not frames:
+        return []
+    if hasattr(model, 'detect_bgr'):
+        return model.detect_bgr(frames, size=size, slots=slots).tolist()
+    # AutoShape letterboxes every image to `size` and stacks them into one tensor
+    frames_rgb = [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in frames]
+    return model(frames_rgb, size=size).tolist()
+
+
+def batched(iterable, batch_size=DEFAULT_BATCH_SIZE, key=None, max_items=None):
+    """Group an iterable into lists of up to batch_size items.
+
+    With `key`, only items for which key(item) is truthy count towards batch_size;
+    the others ride along in order (e.g. frames that reuse earlier detections).
+    `max_items` caps the total list length so riders cannot grow a batch unboundedly.
+    """
+    batch = []
+    counted = 0
+    for item in iterable:
+        batch.append(item)
+        if key is None or key(item):
+            counted += 1
+        if counted == batch_size or (max_items is not None and len(batch) >= max_items):
+            yield batch
+            batch = []
+            counted = 0
+    if batch:
+        yield batch
@@ -0,0 +1,66 @@
+# benchmarks/bench_batch.py
+# Frames per second: batched YOLO forward passes vs. the old per-frame ThreadPoolExecutor approach.
+#
+# Run from the repo root:  python -m benchmarks.bench_batch --frames 64 --batch-size 8
+
+import argparse
+import concurrent.futures
+import time
+
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+
+from batching import detect_batch, batched
+
+
+def synthetic_frames(n, width=1280, height=720, seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 255, (height, width, 3), dtype=np.uint8) for _ in range(n)]
+
+
+def run_threaded(model, frames, workers):
+    """ The previous pages/video.py approach: one model call per frame, spread over threads """
+    def run_model(frame):
+        return model(Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for start in range(0, len(frames), workers):
+            list(executor.map(run_model, frames[start:start + workers]))
+
+
+def run_batched(model, frames, batch_size):
+    for batch in batched(frames, batch_size):
+        detect_batch(model, batch)
+
+
+def timed_fps(fn, n_frames):
+    start = time.perf_counter()
+    fn()
+    return n_frames / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare batched vs. threaded YOLO throughput')
+    parser.add_argument('--frames', type=int, default=64)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=4, help='threads for the per-frame baseline')
+    parser.add_argument('--weights', default='best_250_with_yolov5s.pt')
+    args = parser.parse_args()
+
+    model = torch.hub.load('./yolov5', 'custom', path=args.weights, source='local')
+    frames = synthetic_frames(args.frames)
+
+    # Warm up both paths so lazy initialisation is not measured
+    detect_batch(model, frames[:2])
+
+    threaded = timed_fps(lambda: run_threaded(model, frames, args.workers), len(frames))
+    batch = timed_fps(lambda: run_batched(model, frames, args.batch_size), len(frames))
+    print(f"threaded ({args.workers} workers): {threaded:.2f} fps")
+    print(f"batched (batch size {args.batch_size}): {batch:.2f} fps")
+    print(f"speed-up: {batch / threaded:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+# benchmarks/bench_transport.py
+# Frames per second and bytes copied per frame when handing decoded frames to another process:
+# pickling each frame through a multiprocessing.Queue (what InferencePool.submit does) vs. writing it
+# into the shared-memory FrameRing and sending only its (slot, shape) index. The consumer touches every
+# pixel (a checksum) so both paths pay for actually reading the frame.
+#
+# Run from the repo root:  python -m benchmarks.bench_transport --frames 300 --width 1920 --height 1080
+
+import argparse
+import multiprocessing
+import time
+
+import numpy as np
+
+from frame_ring import FrameRing
+
+
+def synthetic_frames(n, width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 255, (height, width, 3), dtype=np.uint8) for _ in range(n)]
+
+
+def consume_pickled(requests, done):
+    while True:
+        frame = requests.get()
+        if frame is None:
+            return
+        done.put(int(frame.sum(dtype=np.uint64)))
+
+
+def consume_ring(requests, done, ring_spec):
+    ring = FrameRing.attach(*ring_spec)
+    try:
+        while True:
+            item = requests.get()
+            if item is None:
+                return
+            slot, shape = item
+            done.put((slot, int(ring.frame(slot, shape).sum(dtype=np.uint64))))
+    finally:
+        ring.close()
+
+
+def run_pickled(context, frames, in_flight):
+    requests, done = context.Queue(maxsize=in_flight), context.Queue()
+    consumer = context.Process(target=consume_pickled, args=(requests, done))
+    consumer.start()
+    start = time.perf_counter()
+    checksum = 0
+    for i, frame in enumerate(frames):
+        requests.put(frame)
+        if i >= in_flight - 1:
+            checksum += done.get()
+    for _ in range(min(in_flight - 1, len(frames))):
+        checksum += done.get()
+    seconds = time.perf_counter() - start
+    requests.put(None)
+    consumer.join()
+    # Pickled into the pipe by the producer, then unpickled into a new array by the consumer
+    return seconds, checksum, 2 * frames[0].nbytes
+
+
+def run_ring(context, frames, slots):
+    ring = FrameRing(slots, frames[0].nbytes)
+    requests, done = context.Queue(), context.Queue()
+    consumer = context.Process(target=consume_ring, args=(requests, done, (ring.name, ring.slots, ring.slot_bytes)))
+    consumer.start()
+    try:
+        start = time.perf_counter()
+        checksum = 0
+        received = 0
+        for frame in frames:
+            while ring.free_slots() == 0:
+                slot, value = done.get()
+                ring.release(slot)
+                checksum += value
+                received += 1
+            requests.put(ring.write(frame))
+        while received < len(frames):
+            slot, value = done.get()
+            ring.release(slot)
+            checksum += value
+            received += 1
+        seconds = time.perf_counter() - start
+        requests.put(None)
+        consumer.join()
+        # Only the producer's copy into the slot; decoding straight into the slot (jobs.read_batch_into) removes that too
+        return seconds, checksum, ring.bytes_written / len(frames)
+    finally:
+        ring.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare pickled queue vs. shared-memory ring frame transport')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--slots', type=int, default=8, help='ring slots, and frames in flight for the queue baseline')
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    frames = synthetic_frames(min(args.frames, 16), args.width, args.height)
+    frames = [frames[i % len(frames)] for i in range(args.frames)]  # Reuse a few distinct frames to bound memory
+
+    pickled_seconds, pickled_sum, pickled_bytes = run_pickled(context, frames, args.slots)
+    ring_seconds, ring_sum, ring_bytes = run_ring(context, frames, args.slots)
+    if pickled_sum != ring_sum:
+        raise SystemExit("Checksums differ: the consumer did not see the same pixels")
+
+    pickled_fps = args.frames / pickled_seconds
+    ring_fps = args.frames / ring_seconds
+    print(f"{args.width}x{args.height} frames, {args.frames} frames, {args.slots} in flight")
+    print(f"pickled queue: {pickled_fps:.1f} fps, {pickled_bytes / 2**20:.1f} MB copied per frame")
+    print(f"frame ring:    {ring_fps:.1f} fps, {ring_bytes / 2**20:.1f} MB copied per frame")
+    print(f"speed-up: {ring_fps / pickled_fps:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
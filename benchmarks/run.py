@@ -0,0 +1,349 @@
+# benchmarks/run.py
+# Offline benchmark suite for the detection hot paths: process_image, combine_results, annotation
+# rendering and both video paths (model.process_video and the video page's per-job loop). Remote detectors are replaced by local
+# stubs with configurable latency, so it runs on a CPU-only machine with no network.
+#
+#   python -m benchmarks.run --output benchmarks/results/today.json
+#   python -m benchmarks.run --stub-yolo --baseline benchmarks/results/last_week.json
+
+import argparse
+import base64
+import glob
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+# The benchmark must measure inference, not cache hits
+os.environ.setdefault('DETECTION_CACHE_DIR', '')
+
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+
+import registry  # noqa: E402
+from remote import ResilientClient, backend_health  # noqa: E402
+from benchmarks.stubs import StubClient, StubYolo  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class StageTimer:
+    """Collects wall-clock durations per stage name from any thread."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def wrap(self, stage, fn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+        return timed
+
+    def reset(self):
+        with self._lock:
+            self.samples.clear()
+
+    def summary(self):
+        with self._lock:
+            return {stage: {'calls': len(v), 'mean_ms': 1000 * float(np.mean(v)), 'p50_ms': 1000 * float(np.percentile(v, 50)),
+                            'total_s': float(np.sum(v))}
+                    for stage, v in self.samples.items()}
+
+
+class TimedModel:
+    """Proxy around the YOLO model that times every forward call."""
+
+    def __init__(self, model, timer):
+        self._model = model
+        self._timer = timer
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._model(*args, **kwargs)
+        finally:
+            self._timer.record('yolo', time.perf_counter() - start)
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+def peak_rss_mb():
+    """Process-wide peak RSS so far (it never goes down, so read it as 'peak up to this scenario')."""
+    if resource is None:
+        return registry.current_rss_mb()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if platform.system() == 'Darwin' else peak / 2**10
+
+
+def percentiles(samples):
+    arr = np.array(samples) * 1000
+    return {'n': len(samples), 'p50_ms': float(np.percentile(arr, 50)), 'p90_ms': float(np.percentile(arr, 90)),
+            'p99_ms': float(np.percentile(arr, 99)), 'mean_ms': float(arr.mean())}
+
+
+def data_uri(data, mime):
+    return f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+def load_images(synthetic_sizes):
+    """Bundled images from the repo plus synthetic ones, as (name, data URI) pairs."""
+    images = []
+    for path in ['temp_image.jpg'] + sorted(glob.glob(os.path.join('static', 'images', '*.png'))):
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                images.append((path, data_uri(f.read(), 'image/jpeg' if path.endswith('.jpg') else 'image/png')))
+    rng = np.random.default_rng(0)
+    for width, height in synthetic_sizes:
+        image = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+        _, buffer = cv2.imencode('.jpg', image)
+        images.append((f"synthetic_{width}x{height}", data_uri(buffer.tobytes(), 'image/jpeg')))
+    return images
+
+
+def make_video(path, frames, width=640, height=360, fps=20.0):
+    """Synthetic clip: static background with a few moving squares, plus a still stretch for motion gating."""
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    background = np.full((height, width, 3), (90, 60, 20), dtype=np.uint8)
+    for i in range(frames):
+        frame = background.copy()
+        moving = i < frames // 2  # Second half is static
+        for k in range(3):
+            x = (40 + k * 150 + (i * 6 if moving else 0)) % (width - 60)
+            cv2.rectangle(frame, (x, 80 + k * 80), (x + 50, 130 + k * 80), (200, 200, 200), -1)
+        out.write(frame)
+    out.release()
+
+
+def bench_combine(combine_results, box_counts, repeats):
+    """combine_results alone on synthetic candidates from all three sources."""
+    stub_yolo = StubYolo(latency=0, per_image=0)
+    results = {}
+    for n in box_counts:
+        stub_yolo.boxes = n
+        yolo = stub_yolo(np.zeros((1080, 1920, 3), dtype=np.uint8))
+        client = StubClient(latency=0, boxes=n)
+        seascanner = client.infer(None)
+        neuralocean = {'neuralocean': client.run_workflow()[0]}
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            combine_results(yolo, seascanner, neuralocean)
+            samples.append(time.perf_counter() - start)
+        results[f"boxes_{n}"] = percentiles(samples)
+    return results
+
+
+def bench_process_image(model_module, images, repeats, timer):
+    timer.reset()
+    samples = defaultdict(list)
+    for name, contents in images:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model_module.process_image(contents)
+            samples[name].append(time.perf_counter() - start)
+    all_samples = [s for v in samples.values() for s in v]
+    return {'overall': percentiles(all_samples), 'per_image': {k: percentiles(v) for k, v in samples.items()},
+            'stages': timer.summary(), 'peak_rss_mb': peak_rss_mb()}
+
+
+def bench_model_video(model_module, video_path, timer):
+    timer.reset()
+    with open(video_path, 'rb') as f:
+        contents = data_uri(f.read(), 'video/mp4')
+    output_path = os.path.join(tempfile.gettempdir(), 'bench_processed_video.mp4')
+    start = time.perf_counter()
+    _, stats = model_module.process_video(contents, output_path=output_path)
+    elapsed = time.perf_counter() - start
+    os.remove(output_path)
+    return {'frames': stats['frames_processed'], 'seconds': elapsed, 'fps': stats['frames_processed'] / elapsed,
+            'inference_calls': stats.get('inference_calls'), 'stages': timer.summary(), 'peak_rss_mb': peak_rss_mb()}
+
+
+def bench_page_video(video_page, video_path, timer):
+    timer.reset()
+    # The job deletes its file when closed, so give it a copy
+    job_path = os.path.join(tempfile.gettempdir(), 'bench_page_video.mp4')
+    with open(video_path, 'rb') as src, open(job_path, 'wb') as dst:
+        dst.write(src.read())
+    job = video_page.video_jobs.create(job_path, 'bench.mp4', batch_size=video_page.batch_size)
+    ticks = []
+    start = time.perf_counter()
+    while True:
+        tick_start = time.perf_counter()
+        if video_page.process_video(job) is None:  # End of the video
+            break
+        ticks.append(time.perf_counter() - tick_start)
+    elapsed = time.perf_counter() - start
+    frames = job.frames_read
+    latency = job.latency_stats()
+    video_page.video_jobs.remove(job.job_id)
+    return {'frames': frames, 'seconds': elapsed, 'fps': frames / elapsed, 'tick': percentiles(ticks) if ticks else None,
+            'frame_latency': latency, 'stages': timer.summary(), 'peak_rss_mb': peak_rss_mb()}
+
+
+def legacy_render(frame, boxes, colors):
+    """The pre-render.py paths: getTextSize per box, BGR->RGB to return the still, RGB->BGR again to encode."""
+    for box in boxes:
+        x1, y1, x2, y2 = map(int, box['box'])
+        label = f"{box['class']} {box['conf']:.2f}"
+        (w, h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.4, 1)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), colors[box['source']], 2)
+        cv2.rectangle(frame, (x1, y1 - h - 5), (x1 + w, y1), colors[box['source']], -1)
+        cv2.putText(frame, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
+    image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    _, buffer = cv2.imencode('.jpg', cv2.cvtColor(image_rgb, cv2.COLOR_BGR2RGB))
+    return buffer.tobytes()
+
+
+def bench_render(repeats, box_count=30, size=(1920, 1080)):
+    """Per-frame annotate + JPEG encode time, legacy paths vs the shared renderer, on a synthetic frame."""
+    import render
+
+    rng = np.random.default_rng(0)
+    width, height = size
+    frame = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    classes = ['fish', 'pbottle', 'glove', 'net', 'can']
+    boxes = []
+    for i in range(box_count):
+        x, y = int(rng.integers(0, width - 100)), int(rng.integers(20, height - 100))
+        boxes.append({'box': [x, y, x + 80, y + 60], 'conf': float(rng.uniform(0.4, 1.0)), 'class': classes[i % len(classes)],
+                      'source': list(render.SOURCE_COLORS)[i % 3]})
+
+    results = {}
+    for name, fn in (('legacy', lambda f: legacy_render(f, boxes, render.SOURCE_COLORS)),
+                     ('shared', lambda f: render.encode_jpeg(render.draw_detections(f, boxes)))):
+        samples = []
+        for _ in range(repeats):
+            work = frame.copy()  # Both paths draw in place
+            start = time.perf_counter()
+            fn(work)
+            samples.append(time.perf_counter() - start)
+        results[name] = percentiles(samples)
+    return results
+
+
+# Metrics compared against a baseline run: (path into the results, higher_is_better)
+COMPARED_METRICS = [
+    (('process_image', 'overall', 'p50_ms'), False),
+    (('process_image', 'overall', 'p90_ms'), False),
+    (('combine_results', 'boxes_100', 'p50_ms'), False),
+    (('model_video', 'fps'), True),
+    (('page_video', 'fps'), True),
+    (('upload', 'bytes_sent'), False),
+    (('render', 'shared', 'p50_ms'), False),
+]
+
+
+def compare(current, baseline, tolerance):
+    """Print metric changes against a baseline run; returns the list of regressions beyond tolerance (a fraction)."""
+    regressions = []
+    for path, higher_is_better in COMPARED_METRICS:
+        try:
+            new, old = current, baseline
+            for key in path:
+                new, old = new[key], old[key]
+        except (KeyError, TypeError):
+            continue
+        change = (new - old) / old if old else 0.0
+        worse = -change if higher_is_better else change
+        flag = 'REGRESSION' if worse > tolerance else ''
+        print(f"{'.'.join(path):40s} {old:10.2f} -> {new:10.2f} ({change:+.1%}) {flag}")
+        if flag:
+            regressions.append('.'.join(path))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the AquaEye detection hot paths offline')
+    parser.add_argument('--repeats', type=int, default=5, help='runs per image')
+    parser.add_argument('--remote-latency', type=float, default=0.25, help='stub SeaScanner/NeuralOcean latency (s)')
+    parser.add_argument('--remote-failure-rate', type=float, default=0.0)
+    parser.add_argument('--stub-yolo', action='store_true', help='replace YOLO with a stub (no weights needed)')
+    parser.add_argument('--yolo-latency', type=float, default=0.03, help='stub YOLO latency per image (s)')
+    parser.add_argument('--remote-max-side', type=int, help='override REMOTE_MAX_SIDE (0 uploads full resolution, for before/after runs)')
+    parser.add_argument('--video-frames', type=int, default=120)
+    parser.add_argument('--synthetic-sizes', default='1280x720,3840x2160')
+    parser.add_argument('--skip', default='', help='comma-separated scenarios to skip (image,combine,render,model_video,page_video)')
+    parser.add_argument('--output', default=os.path.join('benchmarks', 'results', f"{time.strftime('%Y%m%d-%H%M%S')}.json"))
+    parser.add_argument('--baseline', help='previous results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='allowed slowdown before flagging a regression')
+    args = parser.parse_args()
+    skip = set(filter(None, args.skip.split(',')))
+
+    timer = StageTimer()
+    if args.stub_yolo:
+        registry._model = TimedModel(StubYolo(per_image=args.yolo_latency), timer)
+    else:
+        registry._model = TimedModel(registry.get_model(), timer)
+
+    import model as model_module
+    model_module.CLIENT1 = ResilientClient(StubClient(latency=args.remote_latency, failure_rate=args.remote_failure_rate, seed=1), 'seascanner')
+    model_module.CLIENT2 = ResilientClient(StubClient(latency=args.remote_latency, failure_rate=args.remote_failure_rate, seed=2), 'neuralocean')
+    combine_results = model_module.combine_results  # Unwrapped, so the stage timer does not skew the microbenchmark
+    for name, stage in (('run_seascanner', 'seascanner'), ('run_neuralocean', 'neuralocean'),
+                        ('combine_results', 'combine'), ('draw_detections', 'draw'), ('prepare_for_upload', 'encode')):
+        setattr(model_module, name, timer.wrap(stage, getattr(model_module, name)))
+    model_module.detection_cache.max_entries = 0
+    if args.remote_max_side is not None:
+        model_module.REMOTE_MAX_SIDE = args.remote_max_side
+
+    sizes = [tuple(int(v) for v in s.split('x')) for s in args.synthetic_sizes.split(',') if s]
+    results = {
+        'meta': {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': sys.version.split()[0],
+                 'platform': platform.platform(), 'cpus': os.cpu_count(), 'args': vars(args)},
+    }
+
+    if 'combine' not in skip:
+        results['combine_results'] = bench_combine(combine_results, [10, 100, 500], repeats=50)
+        print(f"combine_results: {results['combine_results']}")
+    if 'render' not in skip:
+        results['render'] = bench_render(repeats=50)
+        print(f"render per frame: legacy {results['render']['legacy']['p50_ms']:.2f} ms, "
+              f"shared {results['render']['shared']['p50_ms']:.2f} ms")
+    if 'image' not in skip:
+        results['process_image'] = bench_process_image(model_module, load_images(sizes), args.repeats, timer)
+        print(f"process_image: {results['process_image']['overall']}")
+
+    video_path = os.path.join(tempfile.gettempdir(), 'bench_video.mp4')
+    make_video(video_path, args.video_frames)
+    if 'model_video' not in skip:
+        results['model_video'] = bench_model_video(model_module, video_path, timer)
+        print(f"model.process_video: {results['model_video']['fps']:.2f} fps")
+    if 'page_video' not in skip:
+        from pages import video as video_page
+        results['page_video'] = bench_page_video(video_page, video_path, timer)
+        print(f"pages/video.py: {results['page_video']['fps']:.2f} fps")
+    os.remove(video_path)
+
+    results['backend_health'] = backend_health()
+    results['upload'] = dict(model_module.upload_stats)
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
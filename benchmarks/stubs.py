@@ -0,0 +1,105 @@
+# benchmarks/stubs.py
+# Local stand-ins for the Roboflow clients and (optionally) the YOLO model, with configurable latency,
+# so the benchmarks run on a CPU-only machine with no network.
+
+import time
+
+import cv2
+import numpy as np
+
+
+class _Array(np.ndarray):
+    """ndarray with the .cpu()/.numpy() calls code written for torch tensors expects."""
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return np.asarray(self)
+
+
+def _random_boxes(rng, n, width, height):
+    x1 = rng.uniform(0, width * 0.8, n)
+    y1 = rng.uniform(0, height * 0.8, n)
+    w = rng.uniform(20, width * 0.2, n)
+    h = rng.uniform(20, height * 0.2, n)
+    return np.stack([x1, y1, np.minimum(x1 + w, width), np.minimum(y1 + h, height)], axis=1)
+
+
+class StubClient:
+    """Mimics InferenceHTTPClient.infer / run_workflow: sleeps for `latency` seconds and returns random boxes."""
+
+    def __init__(self, latency=0.2, boxes=5, classes=('pbottle', 'can', 'fish'), seed=0, failure_rate=0.0):
+        self.latency = latency
+        self.boxes = boxes
+        self.classes = classes
+        self.failure_rate = failure_rate
+        self._rng = np.random.default_rng(seed)
+        self.calls = 0
+
+    def configure(self, configuration):
+        return self
+
+    def _predictions(self, width=640, height=480):
+        self.calls += 1
+        time.sleep(self.latency)
+        if self._rng.random() < self.failure_rate:
+            raise ConnectionError("stub backend failure")
+        predictions = []
+        for x1, y1, x2, y2 in _random_boxes(self._rng, self.boxes, width, height):
+            predictions.append({'x': (x1 + x2) / 2, 'y': (y1 + y2) / 2, 'width': x2 - x1, 'height': y2 - y1,
+                                'confidence': float(self._rng.uniform(0.3, 0.95)),
+                                'class': str(self._rng.choice(self.classes))})
+        return predictions
+
+    def infer(self, inference_input, model_id=None):
+        return {'predictions': self._predictions()}
+
+    def run_workflow(self, workspace_name=None, workflow_id=None, images=None, use_cache=True, **kwargs):
+        return [{'predictions': {'predictions': self._predictions()}}]
+
+
+class StubDetections:
+    """Enough of YOLOv5's Detections for the app: xyxy, names, tolist() and render()."""
+
+    def __init__(self, ims, preds, names):
+        self.ims = ims
+        self.pred = preds
+        self.xyxy = preds
+        self.names = names
+        self.n = len(ims)
+
+    def tolist(self):
+        return [StubDetections([im], [pred], self.names) for im, pred in zip(self.ims, self.pred)]
+
+    def render(self):
+        for im, pred in zip(self.ims, self.pred):
+            for x1, y1, x2, y2, _, _ in pred:
+                cv2.rectangle(im, (int(x1), int(y1)), (int(x2), int(y2)), (255, 0, 0), 2)
+        return self.ims
+
+
+class StubYolo:
+    """Callable like the hub AutoShape model. Costs `latency` per call plus `per_image` per image in the batch."""
+
+    names = {0: 'pbottle', 1: 'fish', 2: 'net', 3: 'can', 4: 'plastic'}
+
+    def __init__(self, latency=0.02, per_image=0.03, boxes=6, seed=0):
+        self.latency = latency
+        self.per_image = per_image
+        self.boxes = boxes
+        self._rng = np.random.default_rng(seed)
+
+    def __call__(self, imgs, size=640):
+        if not isinstance(imgs, list):
+            imgs = [imgs]
+        ims = [np.array(im) for im in imgs]
+        time.sleep(self.latency + self.per_image * len(ims))
+        preds = []
+        for im in ims:
+            h, w = im.shape[:2]
+            boxes = _random_boxes(self._rng, self.boxes, w, h)
+            conf = self._rng.uniform(0.3, 0.95, (self.boxes, 1))
+            cls = self._rng.integers(0, len(self.names), (self.boxes, 1))
+            preds.append(np.hstack([boxes, conf, cls]).astype(np.float32).view(_Array))
+        return StubDetections(ims, preds, self.names)
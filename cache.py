@@ -0,0 +1,201 @@
+# cache.py
+# Content-addressed cache for image detections: bounded in-memory LRU in front of an on-disk store
+
+import concurrent.futures
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from atomic import atomic_write
+
+
+def content_key(image, settings):
+    """Hash of the decoded pixels plus everything that changes the detections (models, thresholds, fusion)."""
+    h = hashlib.sha256()
+    h.update(repr(image.shape).encode())
+    h.update(np.ascontiguousarray(image).data)
+    h.update(json.dumps(settings, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+class DetectionCache:
+    """Caches (annotated_image, final_boxes, sources) tuples by content key.
+
+    Lookups go memory -> disk -> compute. Concurrent requests for the same key
+    wait on a single computation instead of each running inference.
+    Pass cache_dir=None to keep the cache in memory only.
+
+    The memory tier holds at most `max_entries` results and `max_bytes` of
+    annotated pixels; the disk tier is trimmed to `disk_max_bytes` by
+    deleting the least recently used entries.
+    """
+
+    def __init__(self, max_entries=64, cache_dir=None, max_bytes=None, disk_max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_evictions = 0
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk_bytes = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+
+    def _remember(self, key, value):
+        with self._lock:
+            if key in self._memory:
+                self._memory_bytes -= self._memory[key][0].nbytes
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            self._memory_bytes += value[0].nbytes
+            # Always keep the newest entry, even if it alone is over max_bytes
+            while len(self._memory) > 1 and (len(self._memory) > self.max_entries or
+                                             (self.max_bytes is not None and self._memory_bytes > self.max_bytes)):
+                _, (image, _, _) = self._memory.popitem(last=False)
+                self._memory_bytes -= image.nbytes
+
+    def _paths(self, key):
+        return os.path.join(self.cache_dir, f"{key}.png"), os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load(self, key):
+        if not self.cache_dir:
+            return None
+        image_path, meta_path = self._paths(key)
+        if not (os.path.exists(image_path) and os.path.exists(meta_path)):
+            return None
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable cache entry {key}: {e}")
+            return None
+        if image is None:
+            return None
+        try:
+            os.utime(image_path)  # Mark as recently used, so disk eviction drops colder entries first
+        except OSError:
+            pass
+        return image, meta['boxes'], meta['sources']
+
+    def _disk_entries(self):
+        """(key, total bytes, last used) of every complete entry on disk."""
+        entries = {}
+        for entry in os.scandir(self.cache_dir):
+            key, ext = os.path.splitext(entry.name)
+            if ext not in ('.png', '.json'):
+                continue  # Includes in-progress .tmp files
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue  # Evicted by another process meanwhile
+            size, used = entries.get(key, (0, 0.0))
+            entries[key] = (size + stat.st_size, max(used, stat.st_mtime))
+        return [(key, size, used) for key, (size, used) in entries.items()]
+
+    def _trim_disk(self):
+        """Delete least recently used entries until the disk tier is back under 90% of disk_max_bytes."""
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = 0.9 * self.disk_max_bytes  # Headroom, so a full cache is not rescanned on every store
+        for key, size, _ in entries:
+            if total <= target:
+                break
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            self.disk_evictions += 1
+        self._disk_bytes = total
+
+    def _store(self, key, value):
+        if not self.cache_dir:
+            return
+        image, boxes, sources = value
+        image_path, meta_path = self._paths(key)
+        ok, buffer = cv2.imencode('.png', image)  # Lossless, so a hit is pixel-identical to the original result
+        if not ok:
+            return
+        with atomic_write(image_path, 'wb') as f:
+            f.write(buffer.tobytes())
+        with atomic_write(meta_path) as f:
+            json.dump({'boxes': boxes, 'sources': sources}, f)
+
+        if self.disk_max_bytes is None:
+            return
+        with self._disk_lock:
+            # Running total between scans; other processes sharing the directory are picked up on the next trim
+            self._disk_bytes += os.path.getsize(image_path) + os.path.getsize(meta_path)
+            if self._disk_bytes > self.disk_max_bytes:
+                self._trim_disk()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+        value = self._load(key)
+        if value is not None:
+            self.disk_hits += 1
+            self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        self._remember(key, value)
+        self._store(key, value)
+
+    def get_or_compute(self, key, compute, cacheable=None):
+        """Return the cached value for key, computing it at most once across threads.
+
+        `cacheable(value)` can veto storing a result (e.g. one produced while a
+        backend was down) - the caller still gets it, it just isn't kept.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            # Another thread may have finished this key since the lookup above
+            if key in self._memory:
+                return self._memory[key]
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = concurrent.futures.Future()
+                self._inflight[key] = future
+        if not owner:
+            return future.result()
+
+        try:
+            self.misses += 1
+            value = compute()
+            if cacheable is None or cacheable(value):
+                self.put(key, value)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self):
+        return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses, 'entries': len(self._memory),
+                'memory_bytes': self._memory_bytes, 'disk_bytes': self._disk_bytes, 'disk_evictions': self.disk_evictions}
@@ -0,0 +1,137 @@
+# engines.py
+# Pluggable YOLO inference engines for CPU deployments: eager PyTorch, TorchScript, ONNX Runtime
+# and an int8 (dynamically quantized) ONNX Runtime model.
+#
+# Every engine is loaded through the YOLOv5 hub `custom` entry point, which wraps the exported
+# file in DetectMultiBackend + AutoShape, so callers get the same Detections API whichever one
+# is selected. Pick one per deployment with AQUAEYE_ENGINE=torch|torchscript|onnx|onnx-int8.
+#
+#   python engines.py export --engine onnx-int8
+#   python engines.py parity --engine onnx-int8 --images static/images
+
+import argparse
+import glob
+import os
+import subprocess
+import sys
+
+import cv2
+import dotenv
+import numpy as np
+import torch
+
+from fusion import iou_matrix
+
+dotenv.load_dotenv()
+
+ENGINES = ('torch', 'torchscript', 'onnx', 'onnx-int8')
+AQUAEYE_ENGINE = os.getenv('AQUAEYE_ENGINE', 'torch')
+EXPORT_IMAGE_SIZE = int(os.getenv('EXPORT_IMAGE_SIZE', 640))
+
+
+def engine_weights(engine, weights):
+    """Path of the weights file an engine loads, derived from the .pt checkpoint."""
+    stem = os.path.splitext(weights)[0]
+    paths = {
+        'torch': weights,
+        'torchscript': f"{stem}.torchscript",
+        'onnx': f"{stem}.onnx",
+        'onnx-int8': f"{stem}.int8.onnx",
+    }
+    if engine not in paths:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {', '.join(ENGINES)}")
+    return paths[engine]
+
+
+def load_engine(engine, repo, weights):
+    """Load the YOLO model for an engine; the file must have been exported beforehand."""
+    path = engine_weights(engine, weights)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found - run `python engines.py export --engine {engine}` first")
+    return torch.hub.load(repo, 'custom', path=path, source='local')
+
+
+def export(engine, repo, weights, image_size=EXPORT_IMAGE_SIZE):
+    """Export the .pt checkpoint for an engine using YOLOv5's own export script."""
+    if engine == 'torch':
+        return weights
+    if engine == 'onnx-int8':
+        onnx_path = engine_weights('onnx', weights)
+        if not os.path.exists(onnx_path):
+            export('onnx', repo, weights, image_size)
+        # Imported here so onnxruntime stays optional for deployments that do not use it
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        int8_path = engine_weights('onnx-int8', weights)
+        quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QUInt8)
+        return int8_path
+
+    include = {'torchscript': 'torchscript', 'onnx': 'onnx'}[engine]
+    command = [sys.executable, os.path.join(repo, 'export.py'), '--weights', weights,
+               '--include', include, '--imgsz', str(image_size), '--device', 'cpu']
+    if engine == 'onnx':
+        command.append('--dynamic')  # Allow batched inference (video batches, image tiles)
+    subprocess.run(command, check=True)
+    return engine_weights(engine, weights)
+
+
+def match_detections(reference, candidate, iou_threshold=0.5):
+    """Compare two (N, 6) detection arrays; returns (recall of reference boxes, mean |conf diff| of matches)."""
+    if len(reference) == 0:
+        return (1.0 if len(candidate) == 0 else 0.0), 0.0
+    if len(candidate) == 0:
+        return 0.0, 0.0
+    ious = iou_matrix(reference[:, :4], candidate[:, :4])
+    ious[reference[:, None, 5] != candidate[None, :, 5]] = 0  # Only same-class boxes can match
+    best = ious.argmax(axis=1)
+    matched = ious[np.arange(len(reference)), best] >= iou_threshold
+    conf_diff = np.abs(reference[matched, 4] - candidate[best[matched], 4])
+    return float(matched.mean()), float(conf_diff.mean()) if len(conf_diff) else 0.0
+
+
+def parity(engine, repo, weights, image_paths, baseline='torch', iou_threshold=0.5):
+    """Run `engine` and `baseline` on the same images and report how closely their detections agree."""
+    reference_model = load_engine(baseline, repo, weights)
+    candidate_model = load_engine(engine, repo, weights)
+    report = []
+    for path in image_paths:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        reference = reference_model(rgb, size=EXPORT_IMAGE_SIZE).xyxy[0].cpu().numpy()
+        candidate = candidate_model(rgb, size=EXPORT_IMAGE_SIZE).xyxy[0].cpu().numpy()
+        recall, conf_diff = match_detections(reference, candidate, iou_threshold)
+        report.append({'image': path, 'baseline_boxes': len(reference), 'engine_boxes': len(candidate),
+                       'recall': recall, 'mean_conf_diff': conf_diff})
+    return report
+
+
+def main():
+    from registry import YOLO_REPO, YOLO_WEIGHTS
+
+    parser = argparse.ArgumentParser(description='Export YOLO engines and check detection parity')
+    sub = parser.add_subparsers(dest='command', required=True)
+    export_parser = sub.add_parser('export', help='export the checkpoint for an engine')
+    export_parser.add_argument('--engine', choices=ENGINES, required=True)
+    parity_parser = sub.add_parser('parity', help='compare an engine against eager torch')
+    parity_parser.add_argument('--engine', choices=ENGINES, required=True)
+    parity_parser.add_argument('--images', default=os.path.join('static', 'images'), help='folder of test images')
+    parity_parser.add_argument('--min-recall', type=float, default=0.9)
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        print(f"Exported {export(args.engine, YOLO_REPO, YOLO_WEIGHTS)}")
+        return
+
+    image_paths = sorted(p for ext in ('*.jpg', '*.jpeg', '*.png') for p in glob.glob(os.path.join(args.images, ext)))
+    report = parity(args.engine, YOLO_REPO, YOLO_WEIGHTS, image_paths)
+    for row in report:
+        print(f"{row['image']}: {row['baseline_boxes']} vs {row['engine_boxes']} boxes, "
+              f"recall {row['recall']:.2f}, mean conf diff {row['mean_conf_diff']:.3f}")
+    mean_recall = sum(r['recall'] for r in report) / len(report) if report else 0.0
+    print(f"Mean recall vs torch: {mean_recall:.3f}")
+    sys.exit(0 if mean_recall >= args.min_recall else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# frame_ring.py
+# Zero-copy frame transport between the server process and the inference workers: a fixed ring of
+# frame-sized slots in one multiprocessing.shared_memory block. Frames are written into a slot in place
+# (ideally decoded straight into it) and only (slot, shape) index messages cross the process boundary;
+# workers read numpy views of the same memory. Pickling a 1080p frame through a queue instead costs
+# about 6 MB of copying on each side.
+#
+# The ring lives in /dev/shm. Docker gives containers 64 MB there by default, less than the default ring
+# (16 x 1080p, about 100 MB); run with e.g. --shm-size=256m. A ring that does not fit is not created and
+# frames are pickled instead, since touching shared memory past the limit kills the process with SIGBUS.
+
+import os
+import queue
+import shutil
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Two video batches in flight (VIDEO_BATCH_SIZE frames each)
+FRAME_RING_SLOTS = int(os.getenv('FRAME_RING_SLOTS', 2 * int(os.getenv('VIDEO_BATCH_SIZE', 8))))
+SHM_DIR = '/dev/shm'
+FRAME_RING_SLOT_BYTES = int(os.getenv('FRAME_RING_SLOT_BYTES', 1920 * 1080 * 3))  # One 1080p BGR frame
+
+
+class RingFull(RuntimeError):
+    """Raised when no slot frees up within the acquire timeout."""
+
+
+def shm_free_bytes(shm_dir=SHM_DIR):
+    """Free space for shared memory, or None where it is not a filesystem (macOS, Windows)."""
+    try:
+        return shutil.disk_usage(shm_dir).free
+    except OSError:
+        return None
+
+
+class FrameRing:
+    """Fixed-size slots in shared memory. The owning process hands out and takes back slot indices;
+    other processes attach by name and only ever read the slots they were sent.
+
+    Slots are reference counted in the owner: acquire() returns a slot holding one
+    reference, retain() adds one (e.g. for a request in flight on a worker), and a
+    slot only becomes free again when release() has dropped the last reference.
+    """
+
+    def __init__(self, slots=FRAME_RING_SLOTS, slot_bytes=FRAME_RING_SLOT_BYTES, name=None):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+            self._free = queue.Queue()
+            for slot in range(slots):
+                self._free.put(slot)
+            self._refs = [0] * slots
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.bytes_written = 0  # Copied into slots by write(); frames decoded in place add nothing
+        self._lock = threading.Lock()
+
+    @classmethod
+    def attach(cls, name, slots, slot_bytes):
+        return cls(slots, slot_bytes, name=name)
+
+    @classmethod
+    def create_if_room(cls, slots=FRAME_RING_SLOTS, slot_bytes=FRAME_RING_SLOT_BYTES, shm_dir=SHM_DIR):
+        """A new ring, or None (with a warning) when shared memory cannot hold it."""
+        if slots <= 0:
+            return None
+        free = shm_free_bytes(shm_dir)
+        if free is not None and free < slots * slot_bytes:
+            print(f"Frame ring needs {slots * slot_bytes / 2**20:.0f} MB but {shm_dir} has {free / 2**20:.0f} MB free; "
+                  f"pickling frames instead (raise --shm-size or lower FRAME_RING_SLOTS)")
+            return None
+        return cls(slots, slot_bytes)
+
+    def fits(self, shape, dtype=np.uint8):
+        return int(np.prod(shape)) * np.dtype(dtype).itemsize <= self.slot_bytes
+
+    def frame(self, slot, shape, dtype=np.uint8):
+        """numpy view of a slot; no copy is made."""
+        return np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def acquire(self, timeout=None):
+        """Take a free slot index (owner only); blocks until one is released."""
+        try:
+            slot = self._free.get(timeout=timeout)
+        except queue.Empty:
+            raise RingFull(f"No free frame slot within {timeout}s ({self.slots} slots)")
+        with self._lock:
+            self._refs[slot] = 1
+        return slot
+
+    def retain(self, slot):
+        with self._lock:
+            if self._refs[slot] == 0:
+                raise ValueError(f"Frame slot {slot} is not in use")
+            self._refs[slot] += 1
+
+    def release(self, slot):
+        with self._lock:
+            if self._refs[slot] == 0:
+                raise ValueError(f"Frame slot {slot} released twice")
+            self._refs[slot] -= 1
+            free = self._refs[slot] == 0
+        if free:
+            self._free.put(slot)
+
+    def write(self, frame, timeout=None):
+        """Copy a frame into a free slot; returns (slot, shape). For frames not decoded into the ring directly."""
+        slot = self.acquire(timeout)
+        np.copyto(self.frame(slot, frame.shape, frame.dtype), frame)
+        with self._lock:
+            self.bytes_written += frame.nbytes
+        return slot, frame.shape
+
+    def free_slots(self):
+        return self._free.qsize() if self.owner else None
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
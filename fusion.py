@@ -0,0 +1,131 @@
+# fusion.py
+# Vectorized box fusion for the detector ensemble (YOLO + SeaScanner + NeuralOcean)
+
+import numpy as np
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """IoU between every box in boxes_a (N, 4) and every box in boxes_b (M, 4), as an (N, M) array."""
+    boxes_a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+
+    xi1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    yi1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    xi2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    yi2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    inter_area = np.clip(xi2 - xi1, 0, None) * np.clip(yi2 - yi1, 0, None)
+
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union_area = area_a[:, None] + area_b[None, :] - inter_area
+
+    # An empty union counts as no overlap, as in the scalar IoU this replaced
+    out = np.zeros_like(inter_area)
+    np.divide(inter_area, union_area, out=out, where=union_area > 0)
+    return out
+
+
+def nms(boxes, scores, iou_threshold=0.4, classes=None):
+    """Greedy non-maximum suppression. Returns kept indices, highest score first.
+
+    With `classes` given, a box can only suppress boxes of the same class.
+    Ties in score keep their input order, matching the stable list.sort used before.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    order = np.argsort(-scores, kind='stable')
+    if len(order) == 0:
+        return order
+
+    ious = iou_matrix(np.asarray(boxes)[order], np.asarray(boxes)[order])
+    if classes is not None:
+        classes = np.asarray(classes)[order]
+        ious[classes[:, None] != classes[None, :]] = 0
+
+    suppressed = np.zeros(len(order), dtype=bool)
+    keep = []
+    for i in range(len(order)):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        suppressed |= ious[i] > iou_threshold
+    return order[keep]
+
+
+def weighted_box_fusion(boxes, scores, sources, iou_threshold=0.4, classes=None):
+    """Cluster overlapping boxes and average them, weighted by confidence.
+
+    Returns (fused_boxes, fused_scores, members) where members[k] lists the input
+    indices merged into cluster k. A cluster's score is its mean confidence scaled
+    by how many distinct sources agreed on it, so boxes seen by only one backend
+    rank below boxes the whole ensemble agrees on.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    scores = np.asarray(scores, dtype=np.float64)
+    n_sources = max(1, len(set(sources)))
+    order = np.argsort(-scores, kind='stable')
+
+    fused = np.empty((0, 4))
+    weight_sums = []
+    members = []
+    for idx in order:
+        match = -1
+        if len(fused):
+            ious = iou_matrix(boxes[idx], fused)[0]
+            if classes is not None:
+                ious[[classes[members[k][0]] != classes[idx] for k in range(len(members))]] = 0
+            best = int(np.argmax(ious))
+            if ious[best] > iou_threshold:
+                match = best
+
+        if match < 0:
+            fused = np.vstack([fused, boxes[idx]])
+            weight_sums.append(scores[idx])
+            members.append([idx])
+        else:
+            # Running confidence-weighted mean of the cluster's coordinates
+            total = weight_sums[match] + scores[idx]
+            fused[match] = (fused[match] * weight_sums[match] + boxes[idx] * scores[idx]) / total
+            weight_sums[match] = total
+            members[match].append(idx)
+
+    fused_scores = np.array([
+        scores[m].mean() * min(len({sources[i] for i in m}), n_sources) / n_sources
+        for m in members
+    ])
+    return fused, fused_scores, members
+
+
+def fuse_boxes(combined_boxes, method='nms', iou_threshold=0.4, class_aware=False):
+    """Fuse the per-source box dicts built by model.combine_results.
+
+    method='nms' with class_aware=False reproduces the original greedy suppression.
+    method='wbf' merges overlapping boxes instead of dropping them; the fused box
+    keeps the class and source of its most confident member.
+    """
+    if not combined_boxes:
+        return []
+
+    boxes = np.array([b['box'] for b in combined_boxes], dtype=np.float64)
+    scores = np.array([b['conf'] for b in combined_boxes], dtype=np.float64)
+    classes = np.array([b['class'] for b in combined_boxes]) if class_aware else None
+
+    if method == 'nms':
+        return [combined_boxes[i] for i in nms(boxes, scores, iou_threshold, classes)]
+
+    if method == 'wbf':
+        sources = [b['source'] for b in combined_boxes]
+        fused, fused_scores, members = weighted_box_fusion(boxes, scores, sources, iou_threshold, classes)
+        final_boxes = []
+        for box, conf, m in zip(fused, fused_scores, members):
+            top = combined_boxes[m[0]]
+            final_boxes.append({
+                'box': box.tolist(),
+                'conf': float(conf),
+                'class': top['class'],
+                'source': top['source'],
+                'sources': sorted({combined_boxes[i]['source'] for i in m}),
+            })
+        final_boxes.sort(key=lambda x: x['conf'], reverse=True)
+        return final_boxes
+
+    raise ValueError(f"Unknown fusion method: {method}")
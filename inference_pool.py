@@ -0,0 +1,346 @@
+# inference_pool.py
+# YOLO inference in N worker processes, each holding its own model, so inference from concurrent Dash
+# callbacks scales with CPU cores instead of sharing one torch instance and one GIL in the server.
+#
+# registry.get_model() hands out a PooledModel when INFERENCE_WORKERS > 0. It is called exactly like the
+# hub model (model(images, size=...) -> Detections-like results) and blocks on a future, so the
+# detection paths do not change. BGR video frames travel through a shared-memory FrameRing as
+# (slot, shape) messages instead of being pickled (see detect_bgr).
+
+import atexit
+import concurrent.futures
+import itertools
+import multiprocessing
+import os
+import pickle
+import queue
+import threading
+import time
+
+from frame_ring import FrameRing, RingFull
+
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', 0))  # 0 keeps the model in the server process
+INFERENCE_QUEUE_SIZE = int(os.getenv('INFERENCE_QUEUE_SIZE', 16))  # Requests waiting for a worker
+INFERENCE_SUBMIT_TIMEOUT = float(os.getenv('INFERENCE_SUBMIT_TIMEOUT', 5))  # Wait this long for queue space
+INFERENCE_TIMEOUT = float(os.getenv('INFERENCE_TIMEOUT', 60))  # A worker stuck longer than this is restarted
+HEALTH_CHECK_INTERVAL = float(os.getenv('HEALTH_CHECK_INTERVAL', 2))
+
+
+class PoolBusy(RuntimeError):
+    """Raised when the request queue stays full for longer than the submit timeout."""
+
+
+class WorkerFailed(RuntimeError):
+    """Raised for requests that were in flight on a worker that died or hung."""
+
+
+class ArrayDetections:
+    """YOLO results returned by a worker, shaped like YOLOv5's Detections (xyxy per image, names, tolist())."""
+
+    def __init__(self, xyxy, names):
+        import torch
+        self.xyxy = [torch.from_numpy(boxes) for boxes in xyxy]
+        self.names = names
+
+    def tolist(self):
+        return [ArrayDetections([boxes.numpy()], self.names) for boxes in self.xyxy]
+
+    def __len__(self):
+        return len(self.xyxy)
+
+
+def _worker_main(worker_id, requests, results, torch_threads, ring_spec, current):
+    import cv2
+    import torch
+    torch.set_num_threads(torch_threads)
+    from registry import get_local_model
+    model = get_local_model()
+    ring = FrameRing.attach(*ring_spec) if ring_spec else None
+    results.put(('ready', worker_id, os.getpid(), dict(model.names)))
+    while True:
+        item = requests.get()
+        if item is None:
+            return
+        request_id, images, size = item
+        # Shared memory, visible to the pool at once: results.put() is flushed by a feeder thread and can be
+        # lost if this process dies, which would leave the request (and its frame slots) unaccounted for
+        current.value = request_id
+        results.put(('start', worker_id, request_id, None))
+        start = time.perf_counter()
+        try:
+            if isinstance(images, tuple) and images[0] == 'ring':
+                # Views of the shared slots; the BGR->RGB conversion is the only copy, made here
+                images = [cv2.cvtColor(ring.frame(slot, shape), cv2.COLOR_BGR2RGB) for slot, shape in images[1]]
+            detections = model(images, size=size)
+            boxes = [t.cpu().numpy() for t in detections.xyxy]
+            results.put(('done', worker_id, request_id, (boxes, time.perf_counter() - start)))
+        except Exception as e:
+            results.put(('error', worker_id, request_id, (f"{type(e).__name__}: {e}", time.perf_counter() - start)))
+        current.value = -1
+
+
+def _payload_bytes(image):
+    """Bytes an image adds to a pickled request: arrays and PIL images carry their raw pixel buffer."""
+    if hasattr(image, 'nbytes'):
+        return image.nbytes
+    if hasattr(image, 'getbands'):
+        return image.width * image.height * len(image.getbands())
+    return len(pickle.dumps(image, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class WorkerStats:
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.pid = None
+        self.ready = False
+        self.requests = 0
+        self.errors = 0
+        self.restarts = 0
+        self.busy_seconds = 0.0
+        self.last_seconds = None
+        self.current = None  # (request_id, started at) while busy
+
+
+class InferencePool:
+    """N model processes fed from one bounded request queue; results resolve concurrent.futures.Futures."""
+
+    worker_main = staticmethod(_worker_main)  # Entry point of each worker process (must be importable by name)
+
+    def __init__(self, workers=INFERENCE_WORKERS, queue_size=INFERENCE_QUEUE_SIZE, submit_timeout=INFERENCE_SUBMIT_TIMEOUT,
+                 request_timeout=INFERENCE_TIMEOUT, health_interval=HEALTH_CHECK_INTERVAL):
+        self.workers = workers
+        self.submit_timeout = submit_timeout
+        self.request_timeout = request_timeout
+        self.health_interval = health_interval
+        self._context = multiprocessing.get_context('spawn')  # Never fork a process that already runs torch threads
+        self._requests = self._context.Queue(maxsize=queue_size)
+        self._results = self._context.Queue()
+        self._torch_threads = max(1, (os.cpu_count() or 1) // workers)
+        self._ids = itertools.count()
+        self._pending = {}  # request_id -> Future
+        self._ring_slots = {}  # request_id -> frame slots the request holds a reference to, released when it finishes
+        self.ring = FrameRing.create_if_room()  # None: frames are pickled
+        self.transport = {'ring_frames': 0, 'ring_bytes_copied': 0, 'pickled_frames': 0, 'pickled_bytes': 0}
+        self._lock = threading.Lock()
+        self._names = None
+        self._ready = threading.Event()
+        self._closed = False
+        self._processes = {}
+        self._current = {}  # worker_id -> shared request id the worker is on (-1 when idle)
+        self.stats = {i: WorkerStats(i) for i in range(workers)}
+        for worker_id in range(workers):
+            self._start_worker(worker_id)
+        threading.Thread(target=self._dispatch, name='inference-results', daemon=True).start()
+        threading.Thread(target=self._monitor, name='inference-health', daemon=True).start()
+        atexit.register(self.close)
+
+    def _start_worker(self, worker_id):
+        ring_spec = (self.ring.name, self.ring.slots, self.ring.slot_bytes) if self.ring is not None else None
+        self._current[worker_id] = self._context.Value('q', -1, lock=False)
+        process = self._context.Process(target=self.worker_main, name=f'inference-{worker_id}', daemon=True,
+                                        args=(worker_id, self._requests, self._results, self._torch_threads, ring_spec,
+                                              self._current[worker_id]))
+        process.start()
+        self._processes[worker_id] = process
+
+    def submit(self, images, size=640):
+        """Queue one inference call on RGB images (pickled to the worker); returns a Future resolving to ArrayDetections."""
+        frames = images if isinstance(images, list) else [images]
+        with self._lock:
+            self.transport['pickled_frames'] += len(frames)
+            self.transport['pickled_bytes'] += sum(_payload_bytes(f) for f in frames)
+        return self._submit(images, size)
+
+    def submit_bgr(self, frames, size=640, slots=None):
+        """Queue inference on BGR frames through the frame ring.
+
+        `slots` are (slot, shape) pairs for frames the caller already decoded into
+        the ring; nothing is copied. Otherwise each frame is copied into a free slot
+        once. Either way the request holds its own reference to the slots until a
+        worker has finished with it (or it failed), so a caller that gives up on the
+        future can release its slots without them being reused under the worker.
+        Frames too large for a slot, or a pool without a ring, fall back to
+        converting and pickling.
+        """
+        if slots is None and self.ring is not None and all(self.ring.fits(f.shape, f.dtype) for f in frames):
+            owned = []
+            try:
+                for frame in frames:
+                    owned.append(self.ring.write(frame, timeout=self.submit_timeout)[0])
+            except RingFull:
+                for slot in owned:
+                    self.ring.release(slot)
+                raise PoolBusy("No free frame slots")
+            slots = [(slot, frame.shape) for slot, frame in zip(owned, frames)]
+            with self._lock:
+                self.transport['ring_bytes_copied'] += sum(f.nbytes for f in frames)
+            return self._submit(('ring', slots), size, owned)
+        if slots is not None:
+            for slot, _ in slots:
+                self.ring.retain(slot)
+            return self._submit(('ring', slots), size, [slot for slot, _ in slots])
+        import cv2
+        return self.submit([cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in frames], size)
+
+    def _submit(self, images, size, owned_slots=()):
+        if self._closed:
+            raise RuntimeError("Inference pool is closed")
+        future = concurrent.futures.Future()
+        request_id = next(self._ids)
+        with self._lock:
+            self._pending[request_id] = future
+            if owned_slots:
+                self._ring_slots[request_id] = owned_slots
+            if isinstance(images, tuple):
+                self.transport['ring_frames'] += len(images[1])
+        try:
+            self._requests.put((request_id, images, size), timeout=self.submit_timeout)
+        except queue.Full:
+            self._finish(request_id)
+            raise PoolBusy(f"Inference queue full for {self.submit_timeout:.0f}s")
+        return future
+
+    def _finish(self, request_id):
+        """Forget a request and give back any ring slots it held; returns its future (None if already finished)."""
+        with self._lock:
+            future = self._pending.pop(request_id, None)
+            slots = self._ring_slots.pop(request_id, ())
+        for slot in slots:
+            self.ring.release(slot)
+        return future
+
+    def _dispatch(self):
+        while not self._closed:
+            try:
+                kind, worker_id, a, b = self._results.get(timeout=1)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            stats = self.stats[worker_id]
+            if kind == 'ready':
+                stats.pid, stats.ready = a, True
+                self._names = b
+                self._ready.set()
+                continue
+            if kind == 'start':
+                with self._lock:
+                    pending = a in self._pending
+                if pending:  # Not a late message for a request already failed by the health check
+                    stats.current = (a, time.monotonic())
+                continue
+            stats.current = None
+            stats.requests += 1
+            payload, seconds = b
+            stats.busy_seconds += seconds
+            stats.last_seconds = seconds
+            future = self._finish(a)
+            if future is None:
+                continue  # Already failed by the health check
+            if kind == 'done':
+                future.set_result(ArrayDetections(payload, self._names))
+            else:
+                stats.errors += 1
+                future.set_exception(RuntimeError(payload))
+
+    def _monitor(self):
+        """Restart workers that died or hung, failing the request they were working on."""
+        while not self._closed:
+            time.sleep(self.health_interval)
+            for worker_id, process in list(self._processes.items()):
+                stats = self.stats[worker_id]
+                hung = stats.current is not None and time.monotonic() - stats.current[1] > self.request_timeout
+                if process.is_alive() and not hung:
+                    continue
+                if self._closed:
+                    return
+                reason = 'hung' if hung else f'exited with code {process.exitcode}'
+                print(f"Inference worker {worker_id} {reason}, restarting")
+                if hung:
+                    process.terminate()
+                    process.join(5)
+                # The shared id also covers a worker that died before its 'start' message got through
+                request_ids = {self._current[worker_id].value, stats.current[0] if stats.current else -1} - {-1}
+                for request_id in request_ids:
+                    future = self._finish(request_id)
+                    if future is not None:
+                        future.set_exception(WorkerFailed(f"Inference worker {worker_id} {reason}"))
+                stats.current = None
+                stats.ready = False
+                stats.restarts += 1
+                self._start_worker(worker_id)
+
+    @property
+    def names(self):
+        if not self._ready.wait(self.request_timeout):
+            raise WorkerFailed("No inference worker became ready")
+        return self._names
+
+    def health(self):
+        """Pool-wide and per-worker state, for status pages and logs."""
+        now = time.monotonic()
+        try:
+            queued = self._requests.qsize()
+        except NotImplementedError:  # macOS
+            queued = None
+        return {
+            'workers': self.workers,
+            'alive': sum(p.is_alive() for p in self._processes.values()),
+            'ready': sum(s.ready for s in self.stats.values()),
+            'queued': queued,
+            'in_flight': len(self._pending),
+            'free_frame_slots': self.ring.free_slots() if self.ring is not None else None,
+            'transport': dict(self.transport),
+            'per_worker': [{
+                'worker': s.worker_id, 'pid': s.pid, 'alive': self._processes[s.worker_id].is_alive(), 'ready': s.ready,
+                'requests': s.requests, 'errors': s.errors, 'restarts': s.restarts,
+                'busy_seconds': s.busy_seconds, 'last_ms': s.last_seconds * 1000 if s.last_seconds is not None else None,
+                'current_ms': (now - s.current[1]) * 1000 if s.current else None,
+            } for s in self.stats.values()],
+        }
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._processes:
+            try:
+                self._requests.put_nowait(None)
+            except queue.Full:
+                break
+        for process in self._processes.values():
+            process.join(2)
+            if process.is_alive():
+                process.terminate()
+        for request_id in list(self._pending):
+            future = self._finish(request_id)
+            if future is not None:
+                future.set_exception(RuntimeError("Inference pool closed"))
+        if self.ring is not None:
+            self.ring.close()
+
+
+class PooledModel:
+    """Stands in for the hub model: model(images, size=...) runs on the pool and waits for the result."""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    @property
+    def names(self):
+        return self.pool.names
+
+    def __call__(self, images, size=640):
+        return self.pool.submit(images, size).result(timeout=self.pool.request_timeout + self.pool.submit_timeout)
+
+    def submit(self, images, size=640):
+        return self.pool.submit(images, size)
+
+    @property
+    def ring(self):
+        return self.pool.ring
+
+    def detect_bgr(self, frames, size=640, slots=None):
+        """Inference on BGR frames via the shared-memory ring (see InferencePool.submit_bgr)."""
+        future = self.pool.submit_bgr(frames, size, slots)
+        return future.result(timeout=self.pool.request_timeout + self.pool.submit_timeout)
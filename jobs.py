@@ -0,0 +1,305 @@
+# jobs.py
+# Per-upload job bookkeeping so several users can process videos on one server at the same time
+
+import collections
+import concurrent.futures
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+import cv2
+import numpy as np
+
+from frame_ring import RingFull
+from stats import RollingStats
+from tracker import Tracker
+
+# Jobs untouched for this long are released on the next lookup
+JOB_IDLE_TIMEOUT = float(os.getenv('JOB_IDLE_TIMEOUT', 300))
+MAX_VIDEO_JOBS = int(os.getenv('MAX_VIDEO_JOBS', 8))
+# A live video job is stopped after this many failed batches in a row
+VIDEO_MAX_BATCH_ERRORS = int(os.getenv('VIDEO_MAX_BATCH_ERRORS', 3))
+
+# Local worker pool for long-running detection jobs, and where their finished outputs are kept
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', 2))
+JOB_OUTPUT_DIR = os.getenv('JOB_OUTPUT_DIR', os.path.join('.cache', 'jobs'))
+
+
+class VideoJob:
+    """One uploaded video: its own capture, running aggregates and worker budget."""
+
+    def __init__(self, job_id, video_path, filename, batch_size=4, motion_gate=None):
+        self.job_id = job_id
+        self.video_path = video_path
+        self.filename = filename
+        self.batch_size = batch_size  # Frames this job may push through the model per tick
+        self.cap = cv2.VideoCapture(video_path)
+        height, width = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.frame_shape = (height, width, 3) if height and width else None  # Decoded BGR frame shape
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 0.0  # Source frame rate (0 when unknown), paces the stream
+        self.class_counts = {}  # Unique tracked objects per class
+        self.tracker = Tracker()
+        self.stats = RollingStats()  # New objects over time, for the windowed counts and timeline
+        self.frames_read = 0
+        self.motion_gate = motion_gate  # Optional motion.MotionGate deciding which frames are inferred
+        self.last_encoded_frame = None  # JPEG bytes of the latest annotated frame
+        self.frames_streamed = 0
+        self.latencies = collections.deque(maxlen=100)  # Seconds from frame read to JPEG ready, recent frames
+        self.batch_errors = 0  # Failed batches in a row
+        self.last_error = None
+        self.failed = False  # Stopped after VIDEO_MAX_BATCH_ERRORS failed batches
+        self.last_used = time.monotonic()
+        # Interval ticks can overlap; only one may read from the capture at a time
+        self.lock = threading.Lock()
+
+    def is_open(self):
+        return not self.failed and self.cap is not None and self.cap.isOpened()
+
+    def read_batch(self):
+        """Read up to batch_size frames from this job's capture."""
+        frames = []
+        for _ in range(self.batch_size):
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        self.frames_read += len(frames)
+        return frames
+
+    def read_batch_into(self, ring):
+        """Like read_batch, but decode each frame straight into a free slot of a frame_ring.FrameRing.
+
+        Returns (frames, slots): the frames are views of their slots, and slots[i] is
+        None for a frame read normally because the ring was full. The caller releases
+        the slots once it is done with the frames.
+        """
+        frames, slots = [], []
+        for _ in range(self.batch_size):
+            try:
+                slot = ring.acquire(timeout=0)
+            except RingFull:
+                slot = None
+            view = ring.frame(slot, self.frame_shape) if slot is not None else None
+            ret, frame = self.cap.read(view)
+            if not ret:
+                if slot is not None:
+                    ring.release(slot)
+                break
+            if slot is not None and not np.shares_memory(frame, view):
+                # The decoder allocated its own buffer (e.g. an unexpected frame size)
+                if frame.shape == view.shape:
+                    np.copyto(view, frame)
+                    frame = view
+                else:
+                    ring.release(slot)
+                    slot = None
+            frames.append(frame)
+            slots.append(slot)
+        self.frames_read += len(frames)
+        return frames, slots
+
+    def record_error(self, error, max_errors=VIDEO_MAX_BATCH_ERRORS):
+        """Count a failed batch; returns True once the job has failed too often in a row and should stop."""
+        self.batch_errors += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+        if self.batch_errors >= max_errors:
+            self.failed = True
+        return self.failed
+
+    def record_latency(self, seconds):
+        self.frames_streamed += 1
+        self.latencies.append(seconds)
+
+    def latency_stats(self):
+        """Per-frame latency over the recent window, in milliseconds."""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return {
+            'last_ms': self.latencies[-1] * 1000,
+            'mean_ms': sum(ordered) / len(ordered) * 1000,
+            'p95_ms': ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000,
+        }
+
+    def close(self):
+        with self.lock:
+            if self.cap is not None:
+                self.cap.release()
+                self.cap = None
+        try:
+            os.remove(self.video_path)
+        except OSError:
+            pass
+
+
+class JobManager:
+    """Thread-safe registry of VideoJobs keyed by id, with idle eviction."""
+
+    def __init__(self, idle_timeout=JOB_IDLE_TIMEOUT, max_jobs=MAX_VIDEO_JOBS):
+        self.idle_timeout = idle_timeout
+        self.max_jobs = max_jobs
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, video_path, filename, **kwargs):
+        self.evict_idle()
+        job = VideoJob(uuid.uuid4().hex, video_path, filename, **kwargs)
+        with self._lock:
+            # Over capacity: drop the least recently used job
+            while len(self._jobs) >= self.max_jobs:
+                oldest = min(self._jobs.values(), key=lambda j: j.last_used)
+                self._jobs.pop(oldest.job_id).close()
+            self._jobs[job.job_id] = job
+        return job
+
+    def get(self, job_id):
+        self.evict_idle()
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            job.last_used = time.monotonic()
+        return job
+
+    def remove(self, job_id):
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is not None:
+            job.close()
+
+    def evict_idle(self):
+        now = time.monotonic()
+        with self._lock:
+            idle = [job for job in self._jobs.values() if now - job.last_used > self.idle_timeout]
+            for job in idle:
+                del self._jobs[job.job_id]
+        for job in idle:
+            job.close()
+
+    def __len__(self):
+        return len(self._jobs)
+
+
+class BackgroundJob:
+    """A long-running detection job: status, progress and (partial) results.
+
+    The job id is the content key, so the same upload always maps to the same job.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.status = 'queued'  # queued -> running -> done | failed
+        self.frames_done = 0
+        self.frames_total = 0
+        self.partial = {}
+        self.result = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self.saved = False  # Result written to disk (degraded results are kept in memory only)
+
+    def update(self, frames_done, frames_total, partial):
+        """Progress callback handed to the worker function."""
+        self.frames_done = frames_done
+        self.frames_total = frames_total
+        self.partial = partial
+
+    def progress(self):
+        elapsed = ((self.finished or time.monotonic()) - self.started) if self.started else 0.0
+        fps = self.frames_done / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, self.frames_total - self.frames_done)
+        return {
+            'status': self.status,
+            'frames_done': self.frames_done,
+            'frames_total': self.frames_total,
+            'fps': fps,
+            'eta_seconds': remaining / fps if fps > 0 and self.status == 'running' else None,
+            'error': self.error,
+        }
+
+
+class BackgroundJobRunner:
+    """Runs jobs on a local thread pool and keeps finished results keyed by content.
+
+    Submitting the same key again returns the existing job (running or done),
+    and finished results are also written to disk so a page reload - or a
+    server restart - can pick them up without reprocessing.
+    """
+
+    def __init__(self, max_workers=BACKGROUND_WORKERS, output_dir=JOB_OUTPUT_DIR, cacheable=None):
+        self.output_dir = output_dir
+        self.cacheable = cacheable  # cacheable(result) can veto saving a result, which is then rerun on resubmit
+        os.makedirs(output_dir, exist_ok=True)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def output_path(self, key, ext):
+        return os.path.join(self.output_dir, f"{key}{ext}")
+
+    def _summary_path(self, key):
+        return self.output_path(key, '.json')
+
+    def _load_finished(self, key):
+        try:
+            with open(self._summary_path(key)) as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(result.get('output_path', '')):
+            return None
+        job = BackgroundJob(key)
+        job.status = 'done'
+        job.result = result
+        job.saved = True
+        return job
+
+    def submit(self, key, fn, *args, **kwargs):
+        """Start fn(job, *args, **kwargs) in the background unless this key already has a job.
+
+        fn returns a JSON-serialisable result dict and can report progress via job.update.
+        Returns (job, started): started is False when an existing job was returned and
+        fn will not run, so the caller still owns anything it meant to hand over to fn.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status != 'failed' and not (job.status == 'done' and not job.saved):
+                return job, False
+            job = self._load_finished(key)
+            started = job is None
+            if started:
+                job = BackgroundJob(key)
+                self._executor.submit(self._run, job, fn, args, kwargs)
+            self._jobs[key] = job
+            return job, started
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = 'running'
+        job.started = time.monotonic()
+        try:
+            job.result = fn(job, *args, **kwargs)
+            if self.cacheable is None or self.cacheable(job.result):
+                with open(self._summary_path(job.job_id), 'w') as f:
+                    json.dump(job.result, f)
+                job.saved = True
+            job.status = 'done'
+        except Exception as e:
+            print(f"Background job {job.job_id} failed: {e}")
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished = time.monotonic()
+
+    def get(self, job_id):
+        # Ids come back from the browser; only accept content keys so they are safe to use in paths
+        if not job_id or not re.fullmatch(r'[0-9a-f]{64}', job_id):
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                job = self._load_finished(job_id)
+                if job is not None:
+                    self._jobs[job_id] = job
+            return job
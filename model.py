@@ -1,15 +1,29 @@
 # model.py
 
-# import time
+import time
 import base64
-import pathlib
+import concurrent.futures
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
 import cv2
-import torch
 from PIL import Image
 import numpy as np
 from inference_sdk import InferenceHTTPClient, InferenceConfiguration
 import os
 import dotenv
+from fusion import fuse_boxes
+from cache import DetectionCache, content_key
+from batching import detect_batch, batched
+from registry import get_model, YOLO_WEIGHTS
+from engines import AQUAEYE_ENGINE
+from replay import ReplayClient
+from remote import ResilientClient
+from tracker import Tracker
+from render import draw_detections
+from tiling import detect_tiled, should_tile, tile_count, TILED_INFERENCE, TILE_MIN_SIDE, TILE_SIZE, TILE_OVERLAP, TILE_IOU_THRESHOLD
 # from ratelimit import limits, sleep_and_retry
 
 # Load the environment variables
@@ -17,57 +31,107 @@ dotenv.load_dotenv()
 CLIENT1_API_KEY = os.getenv('CLIENT1_API_KEY')
 CLIENT2_API_KEY = os.getenv('CLIENT2_API_KEY')
 
+# Per-backend deadlines (seconds) for the concurrent detector fan-out
+BACKEND_TIMEOUTS = {
+    'yolo': float(os.getenv('YOLO_TIMEOUT', 10)),
+    'seascanner': float(os.getenv('SEASCANNER_TIMEOUT', 8)),
+    'neuralocean': float(os.getenv('NEURALOCEAN_TIMEOUT', 8)),
+}
+
 # Configuration for the HTTP clients
 custom_configuration = InferenceConfiguration(confidence_threshold=0.4, iou_threshold=0.4)
-CLIENT1 = InferenceHTTPClient(
+# Both clients go through the record/replay layer (ROBOFLOW_REPLAY_MODE, off by default), wrapped in
+# retries and a circuit breaker so a dead backend is skipped instead of stalling every frame.
+# SeaScanner is configured once here: use_configuration() swaps the setting on the shared client and
+# would race between the detector threads. Retries stop at the backend's deadline, after which nobody
+# waits for the answer and the call would only hold a detector thread.
+CLIENT1 = ResilientClient(ReplayClient(InferenceHTTPClient(
     api_url="https://detect.roboflow.com",
     api_key=CLIENT1_API_KEY,
-)
+), 'seascanner'), 'seascanner', budget=BACKEND_TIMEOUTS['seascanner']).configure(custom_configuration)
 
-CLIENT2 = InferenceHTTPClient(
+CLIENT2 = ResilientClient(ReplayClient(InferenceHTTPClient(
     api_url="https://detect.roboflow.com",
     api_key=CLIENT2_API_KEY,
+), 'neuralocean'), 'neuralocean', budget=BACKEND_TIMEOUTS['neuralocean'])
+
+# Box fusion settings: 'nms' with class-agnostic suppression matches the original behaviour, 'wbf' averages overlapping boxes
+FUSION_METHOD = os.getenv('FUSION_METHOD', 'nms')
+FUSION_IOU_THRESHOLD = float(os.getenv('FUSION_IOU_THRESHOLD', 0.4))
+FUSION_CLASS_AWARE = os.getenv('FUSION_CLASS_AWARE', '0') == '1'
+
+# Image sent to the remote detectors: longest side resized to their native input size (0 keeps full
+# resolution) and JPEG quality of the in-memory buffer
+REMOTE_MAX_SIDE = int(os.getenv('REMOTE_MAX_SIDE', 640))
+REMOTE_JPEG_QUALITY = int(os.getenv('REMOTE_JPEG_QUALITY', 90))
+
+# Running totals for the pre-upload stage (what the remote clients would otherwise have been handed vs. what was sent)
+upload_stats = {'images': 0, 'source_raw_bytes': 0, 'bytes_sent': 0, 'encode_seconds': 0.0}
+upload_stats_lock = threading.Lock()
+
+# Frames per batched YOLO forward pass in the video pipeline
+VIDEO_BATCH_SIZE = int(os.getenv('VIDEO_BATCH_SIZE', 8))
+
+# Frames buffered between video pipeline stages (decode -> infer -> encode)
+VIDEO_QUEUE_SIZE = int(os.getenv('VIDEO_QUEUE_SIZE', 8))
+
+# Re-encode finished videos to H.264 fragmented MP4 (needs ffmpeg on PATH) so browsers can start playback early;
+# OpenCV's mp4v output does not play in most browsers at all
+BROWSER_TRANSCODE = os.getenv('BROWSER_TRANSCODE', '1') == '1'
+
+# Shared pool for the remote detector fan-out; sized so a few requests can overlap
+detector_executor = concurrent.futures.ThreadPoolExecutor(max_workers=int(os.getenv('DETECTOR_WORKERS', 6)), thread_name_prefix='detector')
+# YOLO has its own pool, so remote calls still running past their deadline can never make it queue
+yolo_executor = concurrent.futures.ThreadPoolExecutor(max_workers=int(os.getenv('YOLO_WORKERS', 2)), thread_name_prefix='yolo')
+# Remote calls for video batches (two per frame) get their own pool, so background videos never queue ahead of
+# an image upload's detectors and eat into their deadlines
+video_remote_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.getenv('VIDEO_REMOTE_WORKERS', 2 * VIDEO_BATCH_SIZE)), thread_name_prefix='video-remote')
+
+# Detection cache: bounded memory LRU in front of a disk store (DETECTION_CACHE_DIR='' keeps it in memory only).
+# The memory tier is capped by count and by decoded pixels (one 4K result is ~25 MB), the disk tier by size.
+detection_cache = DetectionCache(
+    max_entries=int(os.getenv('DETECTION_CACHE_SIZE', 64)),
+    max_bytes=int(os.getenv('DETECTION_CACHE_MEMORY_MB', 256)) * 2**20,
+    cache_dir=os.getenv('DETECTION_CACHE_DIR', os.path.join('.cache', 'detections')) or None,
+    disk_max_bytes=int(os.getenv('DETECTION_CACHE_DISK_MB', 1024)) * 2**20,
 )
 
-# Temporarily change pathlib for Windows compatibility
-temp = pathlib.PosixPath
-pathlib.PosixPath = pathlib.WindowsPath
-
-# Load the YOLO model
-model = torch.hub.load('./yolov5', 'custom', path='best_250_with_yolov5s.pt', source='local')
-print("YOLO model loaded successfully.")
-
-# Define colors for different sources
-colors = {
-    'yolo': (255, 0, 0),  # Red
-    'seascanner': (0, 100, 0),  # Dark Green
-    'neuralocean': (0, 0, 0)  # Black
+# Everything besides the pixels that changes what process_image returns
+CACHE_SETTINGS = {
+    'yolo_weights': YOLO_WEIGHTS,
+    'yolo_engine': AQUAEYE_ENGINE,
+    'yolo_conf': 0.5,
+    'seascanner_model': 'seascanner/3',
+    'seascanner_conf': 0.41,
+    'neuralocean_workflows': ['neuralocean'],
+    'neuralocean_conf': 0.5,
+    'remote_thresholds': [custom_configuration.confidence_threshold, custom_configuration.iou_threshold],
+    'remote_upload': [REMOTE_MAX_SIDE, REMOTE_JPEG_QUALITY],
+    'fusion': [FUSION_METHOD, FUSION_IOU_THRESHOLD, FUSION_CLASS_AWARE],
+    'tiling': [TILED_INFERENCE, TILE_MIN_SIDE, TILE_SIZE, TILE_OVERLAP, TILE_IOU_THRESHOLD],
+    'annotated': 'bgr',  # Cached images used to be stored RGB
 }
 
-# IoU calculation function
-def iou(box1, box2):
-    x1, y1, x2, y2 = box1
-    x1_, y1_, x2_, y2_ = box2
-    xi1, yi1 = max(x1, x1_), max(y1, y1_)
-    xi2, yi2 = min(x2, x2_), min(y2, y2_)
-    inter_area = max(0, xi2 - xi1) * max(0, yi2 - yi1)
-    box1_area = (x2 - x1) * (y2 - y1)
-    box2_area = (x2_ - x1_) * (y2_ - y1_)
-    union_area = box1_area + box2_area - inter_area
-    return inter_area / union_area if union_area > 0 else 0
-
-# Combine results from multiple models
-def combine_results(yolo_results, seascanner_results, neuralocean_results):
+# The YOLO model is loaded lazily (or warmed up at startup) by the shared registry
+
+# Combine results from multiple models (a backend that did not answer is passed as None).
+# remote_scale maps SeaScanner/NeuralOcean coordinates back to the source image when a downscaled copy was uploaded.
+def combine_results(yolo_results, seascanner_results, neuralocean_results, remote_scale=1.0):
     combined_boxes = []
+    yolo_names = yolo_results.names if yolo_results is not None else {}
+    yolo_results = yolo_results.xyxy[0] if yolo_results is not None else []
+    seascanner_results = seascanner_results or {'predictions': []}
+    neuralocean_results = neuralocean_results or {}
 
     # Process YOLO results
-    for yolo_box in yolo_results.xyxy[0]:
+    for yolo_box in yolo_results:
         confidence = yolo_box[4].item()
         if confidence > 0.5:  # Filter by confidence threshold
             combined_boxes.append({
                 'box': yolo_box[:4].tolist(),
                 'conf': confidence,
-                'class': model.names[int(yolo_box[5].item())],
+                'class': yolo_names[int(yolo_box[5].item())],
                 'source': 'yolo'
             })
 
@@ -75,8 +139,8 @@ def combine_results(yolo_results, seascanner_results, neuralocean_results):
     for seascanner_box in seascanner_results['predictions']:
         if seascanner_box['confidence'] > 0.41:
             combined_boxes.append({
-                'box': [seascanner_box['x'] - seascanner_box['width'] / 2, seascanner_box['y'] - seascanner_box['height'] / 2,
-                        seascanner_box['x'] + seascanner_box['width'] / 2, seascanner_box['y'] + seascanner_box['height'] / 2],
+                'box': [remote_scale * (seascanner_box['x'] - seascanner_box['width'] / 2), remote_scale * (seascanner_box['y'] - seascanner_box['height'] / 2),
+                        remote_scale * (seascanner_box['x'] + seascanner_box['width'] / 2), remote_scale * (seascanner_box['y'] + seascanner_box['height'] / 2)],
                 'conf': seascanner_box['confidence'],
                 'class': seascanner_box['class'],
                 'source': 'seascanner'
@@ -90,196 +154,326 @@ def combine_results(yolo_results, seascanner_results, neuralocean_results):
                 class_label = class_mapping.get(str(box['class']), box['class'])
                 if box['confidence'] > 0.5:
                     combined_boxes.append({
-                        'box': [box['x'] - box['width'] / 2, box['y'] - box['height'] / 2,
-                                box['x'] + box['width'] / 2, box['y'] + box['height'] / 2],
+                        'box': [remote_scale * (box['x'] - box['width'] / 2), remote_scale * (box['y'] - box['height'] / 2),
+                                remote_scale * (box['x'] + box['width'] / 2), remote_scale * (box['y'] + box['height'] / 2)],
                         'conf': box['confidence'],
                         'class': class_label,
                         'source': workflow_id
                     })
 
-    # Sort by confidence and filter overlapping boxes
-    combined_boxes.sort(key=lambda x: x['conf'], reverse=True)
-    final_boxes = []
-    for box in combined_boxes:
-        if not any([iou(box['box'], existing_box['box']) > 0.4 for existing_box in final_boxes]):
-            final_boxes.append(box)
-
-    return final_boxes
+    # Sort by confidence and filter (or merge) overlapping boxes
+    return fuse_boxes(combined_boxes, method=FUSION_METHOD, iou_threshold=FUSION_IOU_THRESHOLD, class_aware=FUSION_CLASS_AWARE)
+
+def prepare_for_upload(image, max_side=None, quality=None):
+    """Resize a BGR image to the remote models' input size and JPEG-encode it once for both clients.
+
+    Returns (base64_jpeg, scale) where multiplying remote box coordinates by scale
+    gives source-image coordinates. Bytes and encode time go into upload_stats.
+    """
+    max_side = REMOTE_MAX_SIDE if max_side is None else max_side
+    quality = REMOTE_JPEG_QUALITY if quality is None else quality
+    start = time.perf_counter()
+    h, w = image.shape[:2]
+    scale = 1.0
+    if max_side and max(h, w) > max_side:
+        scale = max(h, w) / max_side
+        image = cv2.resize(image, (round(w / scale), round(h / scale)), interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Could not encode image for upload.")
+    # base64 string, which both inference clients accept in place of a file path
+    image_ref = base64.b64encode(buffer).decode('ascii')
+
+    with upload_stats_lock:
+        upload_stats['images'] += 1
+        upload_stats['source_raw_bytes'] += h * w * 3
+        upload_stats['bytes_sent'] += len(image_ref)
+        upload_stats['encode_seconds'] += time.perf_counter() - start
+    return image_ref, scale
+
+# Run SeaScanner inference over HTTP
+def run_seascanner(image_ref):
+    return CLIENT1.infer(image_ref, model_id="seascanner/3")
+
+# Run the NeuralOcean workflow(s) over HTTP, keyed by workflow id
+def run_neuralocean(image_ref):
+    results = {}
+    for workflow_id in ["neuralocean"]:
+        response = CLIENT2.run_workflow(
+            workspace_name="trashdetection-eihzd",
+            workflow_id=workflow_id,
+            images={"image": image_ref},
+            use_cache=True
+        )
+        if isinstance(response, list) and len(response) > 0:
+            results[workflow_id] = response[0]  # Take the first element if it's a list
+        else:
+            results[workflow_id] = response  # Otherwise, store as-is
+    return results
+
+def submit_detectors(image_ref, pil_img=None, executor=None):
+    """Start the remote backends on the shared pool (and YOLO on its own, when given a PIL image); returns futures by source."""
+    executor = executor or detector_executor
+    futures = {}
+    if pil_img is not None:
+        futures['yolo'] = yolo_executor.submit(get_model(), pil_img)
+    futures['seascanner'] = executor.submit(run_seascanner, image_ref)
+    futures['neuralocean'] = executor.submit(run_neuralocean, image_ref)
+    return futures
+
+def collect_detections(futures, start, timeouts=None):
+    """Wait for each future until its backend's deadline (measured from start); returns results by source."""
+    timeouts = {**BACKEND_TIMEOUTS, **(timeouts or {})}
+    detections = {}
+    for source, future in futures.items():
+        remaining = max(0.0, timeouts[source] - (time.monotonic() - start))
+        try:
+            detections[source] = future.result(timeout=remaining)
+        except concurrent.futures.TimeoutError:
+            # The worker thread keeps running in the background; we just stop waiting for it
+            print(f"{source} missed its {timeouts[source]:.1f}s deadline, skipping")
+        except Exception as e:
+            print(f"Error calling {source}: {e}")
+    return detections
 
 def process_image(contents):
     # Decode the image
     content_type, content_string = contents.split(',')
     decoded = base64.b64decode(content_string)
     image = cv2.imdecode(np.frombuffer(decoded, np.uint8), cv2.IMREAD_COLOR)
-
-    # Convert the frame for YOLO inference
-    frame_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    pil_img = Image.fromarray(frame_rgb)
-
-    # Run YOLO inference
-    yolo_results = model(pil_img)
-
-    # Save the image to a temporary file
-    temp_image_path = 'temp_image.jpg'
-    cv2.imwrite(temp_image_path, image)
-
-    # Run HTTP inference for SeaScanner model
+    return process_image_array(image)
+
+# Same as process_image for an image already on disk (chunked uploads, batch runs)
+def process_image_file(image_path):
+    image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Unable to read image {image_path}")
+    return process_image_array(image)
+
+def process_image_array(image):
+    """Detections for a BGR image: (annotated BGR image, fused boxes, sources that answered)."""
+    # Re-uploads of the same image are served from the cache without running any model;
+    # results missing a backend (timeout/error) are returned but not cached
+    key = content_key(image, CACHE_SETTINGS)
+    return detection_cache.get_or_compute(key, lambda: detect_image(image), cacheable=lambda result: len(result[2]) == len(BACKEND_TIMEOUTS))
+
+def detect_image(image):
+    # Resize and encode once in memory; both remote clients share the same buffer
+    image_ref, remote_scale = prepare_for_upload(image)
+
+    # Run YOLO, SeaScanner and NeuralOcean concurrently; large stills go through YOLO tile by tile
+    start = time.monotonic()
+    timeouts = None
+    if should_tile(image):
+        futures = submit_detectors(image_ref)
+        futures['yolo'] = yolo_executor.submit(detect_tiled, get_model(), image)
+        # Every tile plus the full image is a YOLO pass; give each one the single-image deadline
+        timeouts = {'yolo': BACKEND_TIMEOUTS['yolo'] * (tile_count(image) + 1)}
+    else:
+        # Convert the frame for YOLO inference
+        frame_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        pil_img = Image.fromarray(frame_rgb)
+        futures = submit_detectors(image_ref, pil_img)
+    detections = collect_detections(futures, start, timeouts)
+    sources = list(detections)
+    if hasattr(detections.get('yolo'), 'timings'):
+        timings = detections['yolo'].timings
+        print(f"Tiled YOLO: {timings['tiles']} tiles, inference {timings['inference']:.2f}s, merge {timings['merge'] * 1000:.1f}ms")
+
+    # Combine the results from the models that answered in time
+    final_boxes = combine_results(detections.get('yolo'), detections.get('seascanner'), detections.get('neuralocean'), remote_scale)
+
+    # Draw the combined results in place; the annotated image stays BGR for encoding
+    draw_detections(image, final_boxes)
+
+    return image, final_boxes, sources
+
+def ensemble_batch(frames, stats=None):
+    """Fused ensemble detections for a batch of BGR frames, one box list per frame.
+
+    The remote calls for every frame are started first, then YOLO runs once over
+    the whole batch while they are in flight. Frames that are missing a backend
+    (error, timeout or open circuit) are counted in stats['degraded_frames'].
+    """
+    start = time.monotonic()
+    uploads = [prepare_for_upload(frame) for frame in frames]
+    remote_futures = [submit_detectors(image_ref, executor=video_remote_executor) for image_ref, _ in uploads]
     try:
-        with CLIENT1.use_configuration(custom_configuration):
-            seascanner_results = CLIENT1.infer(temp_image_path, model_id="seascanner/3")
-
+        yolo_batch = detect_batch(get_model(), frames)
     except Exception as e:
-        print(f"Error calling SeaScanner API: {e}")
-        seascanner_results = {'predictions': []}
-
-    # Run inference for NeuralOcean model
-    results = {}
-    for workflow_id in ["neuralocean"]:
+        print(f"Error running YOLO on batch: {e}")
+        yolo_batch = [None] * len(frames)
+
+    batch_boxes = []
+    for futures, yolo_results, (_, remote_scale) in zip(remote_futures, yolo_batch, uploads):
+        detections = collect_detections(futures, start)
+        if stats is not None and (yolo_results is None or len(detections) < len(futures)):
+            stats['degraded_frames'] = stats.get('degraded_frames', 0) + 1
+        batch_boxes.append(combine_results(yolo_results, detections.get('seascanner'), detections.get('neuralocean'), remote_scale))
+    return batch_boxes
+
+# Write a base64 data URI to disk in chunks, so the decoded bytes never sit in memory all at once
+def save_upload(contents, suffix='.mp4', chunk_chars=4 * 1024 * 1024):
+    content_type, content_string = contents.split(',', 1)
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    with temp_file as f:
+        for i in range(0, len(content_string), chunk_chars):  # chunk_chars is a multiple of 4, so chunks decode independently
+            f.write(base64.b64decode(content_string[i:i + chunk_chars]))
+    return temp_file.name
+
+# Run a generator on a background thread, handing items over through a bounded queue.
+# An exception in the stage is re-raised in the consumer, so a failed video is never mistaken for a finished one.
+def threaded_stage(generator, maxsize=VIDEO_QUEUE_SIZE):
+    q = queue.Queue(maxsize=maxsize)
+    done = object()
+    stop = threading.Event()
+    error = []
+
+    def worker():
         try:
-            response = CLIENT2.run_workflow(
-                workspace_name="trashdetection-eihzd",
-                workflow_id=workflow_id,
-                images={"image": temp_image_path},
-                use_cache=True
-            )
-            if isinstance(response, list) and len(response) > 0:
-                results[workflow_id] = response[0]  # Take the first element if it's a list
-            else:
-                results[workflow_id] = response  # Otherwise, store as-is
+            for item in generator:
+                while not stop.is_set():
+                    try:
+                        q.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    break
         except Exception as e:
-            print(f"Error calling NeuralOcean API: {e}")
-            results[workflow_id] = {'predictions': []}
-
-    # Combine the results from all models
-    final_boxes = combine_results(yolo_results, seascanner_results, results)
-
-    # Draw the combined results on the image
-    for box in final_boxes:
-        x1, y1, x2, y2 = map(int, box['box'])
-        label = f"{box['class']} {box['conf']:.2f}"
-        color = colors[box['source']]
-        cv2.rectangle(image, (x1, y1), (x2, y2), color, 2)
-        
-        # Calculate text size
-        (w, h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.4, 1)
-        
-        # Draw filled rectangle behind the label
-        cv2.rectangle(image, (x1, y1 - h - 5), (x1 + w, y1), color, -1)
-        
-        # Draw the label text
-        cv2.putText(image, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
-
-    # Convert the image back to RGB format
-    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-
-    return image_rgb, final_boxes
-
-def process_video(contents, skip_frames=5):
-    # Decode the video
-    content_type, content_string = contents.split(',')
-    decoded = base64.b64decode(content_string)
-    video_path = 'temp_video.mp4'
-    with open(video_path, 'wb') as f:
-        f.write(decoded)
+            print(f"Error in video pipeline stage: {e}")
+            error.append(e)
+        finally:
+            generator.close()  # Runs upstream cleanup (e.g. releasing the capture) on early exit
+            q.put(done)
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = q.get()
+            if item is done:
+                if error:
+                    raise error[0]
+                break
+            yield item
+    finally:
+        # Unblock the producer if the consumer stopped early
+        stop.set()
+        while thread.is_alive():
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                thread.join(0.1)
 
-    # Process the video frame by frame
+# Decode stage: yield (index, frame, infer) where infer says whether the frame goes through the ensemble.
+# With a motion gate every frame is yielded and the gate decides; otherwise every skip_frames-th frame is.
+def read_frames(video_path, skip_frames=5, motion_gate=None):
     cap = cv2.VideoCapture(video_path)
-    frames = []
-    frame_count = 0
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        # Skip frames
-        if frame_count % skip_frames != 0:
+    try:
+        frame_count = 0
+        while cap.isOpened():
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if motion_gate is not None:
+                yield frame_count, frame, motion_gate.should_infer(frame)
+            # Skip frames
+            elif frame_count % skip_frames == 0:
+                yield frame_count, frame, True
             frame_count += 1
-            continue
-
+    finally:
+        cap.release()
+
+# Inference + annotation stage, in batches of VIDEO_BATCH_SIZE inferred frames. Every frame goes
+# through the tracker, so frames the gate skipped are drawn with Kalman-predicted boxes and
+# stats['class_counts'] counts unique tracked objects rather than per-frame detections.
+def annotate_frames(frames, stats, batch_size=VIDEO_BATCH_SIZE, tracker=None):
+    tracker = tracker or Tracker()
+    for batch in batched(frames, batch_size, key=lambda item: item[2], max_items=2 * batch_size):
         try:
-            # Convert the frame for YOLO inference
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            pil_img = Image.fromarray(frame_rgb)
-
-            # Run YOLO inference
-            yolo_results = model(pil_img)
-
-            # Run HTTP inference for SeaScanner model
-            try:
-                with CLIENT1.use_configuration(custom_configuration):
-                    seascanner_results = CLIENT1.infer(frame, model_id="seascanner/3")
-            except Exception as e:
-                print(f"Error calling SeaScanner API: {e}")
-                seascanner_results = {'predictions': []}
-
-            # Run inference for NeuralOcean model
-            results = {}
-            for workflow_id in ["neuralocean"]:
-                try:
-                    response = CLIENT2.run_workflow(
-                        workspace_name="trashdetection-eihzd",
-                        workflow_id=workflow_id,
-                        images={"image": frame},
-                        use_cache=True
-                    )
-                    if isinstance(response, list) and len(response) > 0:
-                        results[workflow_id] = response[0]  # Take the first element if it's a list
-                    else:
-                        results[workflow_id] = response  # Otherwise, store as-is
-                except Exception as e:
-                    print(f"Error calling NeuralOcean API: {e}")
-                    results[workflow_id] = {'predictions': []}
-
-            # Combine the results from all models
-            final_boxes = combine_results(yolo_results, seascanner_results, results)
-
-            # Draw the combined results on the frame
-            for box in final_boxes:
-                x1, y1, x2, y2 = map(int, box['box'])
-                label = f"{box['class']} {box['conf']:.2f}"
-                color = colors[box['source']]
-                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                
-                # Calculate text size
-                (w, h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.4, 1)
-                
-                # Draw filled rectangle behind the label
-                cv2.rectangle(frame, (x1, y1 - h - 5), (x1 + w, y1), color, -1)
-                
-                # Draw the label text
-                cv2.putText(frame, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
-
-            # Display the frame with detections
-            cv2.imshow('Detections', frame)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
-
-            # Convert the frame back to RGB format
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            frames.append(frame_rgb)
+            batch_boxes = iter(ensemble_batch([frame for _, frame, infer in batch if infer], stats))
         except Exception as e:
-            print(f"Error processing frame {frame_count}: {e}")
-
-        frame_count += 1
-
-    cap.release()
-    cv2.destroyAllWindows()
+            # Keep the frames (with predicted boxes only) so the video is not cut short, and mark the run degraded
+            print(f"Error processing frames {batch[0][0]}-{batch[-1][0]}: {e}")
+            stats['degraded_frames'] = stats.get('degraded_frames', 0) + len(batch)
+            batch_boxes = None
+        for _, frame, infer in batch:
+            tracked_boxes = tracker.step(next(batch_boxes) if infer and batch_boxes is not None else None)
+            stats['class_counts'] = tracker.unique_counts()
+            yield draw_detections(frame, tracked_boxes)
+
+# Frame count and frame rate reported by the container (0 when unknown)
+def probe_video(video_path):
+    cap = cv2.VideoCapture(video_path)
+    try:
+        return max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT))), cap.get(cv2.CAP_PROP_FPS) or 0.0
+    finally:
+        cap.release()
+
+def make_browser_playable(video_path):
+    """Re-encode a finished video in place to H.264 fragmented MP4; returns False (leaving it as is) without ffmpeg."""
+    ffmpeg = shutil.which('ffmpeg')
+    if not BROWSER_TRANSCODE or ffmpeg is None:
+        return False
+    tmp_path = f"{video_path}.{threading.get_ident()}.tmp.mp4"
+    command = [ffmpeg, '-y', '-loglevel', 'error', '-i', video_path,
+               '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p',
+               '-movflags', '+frag_keyframe+empty_moov+default_base_moof', tmp_path]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"ffmpeg failed on {video_path}, serving the original encoding: {result.stderr.strip()}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, video_path)
+    return True
+
+def process_video(contents, skip_frames=5, output_path='processed_video.mp4', fps=20.0, progress=None, motion_gate=None):
+    """process_video_file for a base64 data URI from dcc.Upload, via a temporary file."""
+    video_path = save_upload(contents)
+    try:
+        return process_video_file(video_path, skip_frames, output_path, fps, progress, motion_gate)
+    finally:
+        os.remove(video_path)
+
+def process_video_file(video_path, skip_frames=5, output_path='processed_video.mp4', fps=20.0, progress=None, motion_gate=None):
+    """Stream decode -> infer -> annotate -> encode with bounded queues between stages.
+
+    Only a handful of frames are alive at any time, and each annotated frame is
+    written as soon as it is ready, so memory stays flat however long the video is.
+    Returns the output path and a summary dict (frames written, unique objects per class).
+    `progress(frames_done, frames_total, stats)` is called after every written frame.
+
+    With a motion.MotionGate, every frame is written at the source frame rate and
+    the ensemble only runs when the gate sees enough change; skipped frames reuse
+    the previous detections. Otherwise every skip_frames-th frame is kept.
+    """
+    stats = {'frames_processed': 0, 'class_counts': {}, 'degraded_frames': 0}
+    total, source_fps = probe_video(video_path)
+    if motion_gate is not None:
+        fps = source_fps or fps
+    else:
+        total = -(-total // skip_frames)
+    out = None
+    try:
+        frames = threaded_stage(read_frames(video_path, skip_frames, motion_gate))
+        for frame in threaded_stage(annotate_frames(frames, stats)):
+            if out is None:
+                out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (frame.shape[1], frame.shape[0]))
+            out.write(frame)  # Frames are already BGR
+            stats['frames_processed'] += 1
+            if progress is not None:
+                progress(stats['frames_processed'], total, stats)
+    finally:
+        if out is not None:
+            out.release()
 
     # Ensure there are frames to process
-    if not frames:
+    if stats['frames_processed'] == 0:
         raise ValueError("No frames were processed from the video.")
 
-    # Save the processed video
-    processed_video_path = 'processed_video.mp4'
-    out = cv2.VideoWriter(processed_video_path, cv2.VideoWriter_fourcc(*'mp4v'), 20.0, (frames[0].shape[1], frames[0].shape[0]))
-    for frame in frames:
-        # Convert the frame back to BGR format before writing to the video file
-        frame_bgr = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-        out.write(frame_bgr)
-    out.release()
-
-    return processed_video_path, frames
+    if motion_gate is not None:
+        stats.update(motion_gate.stats())
 
-# Restore pathlib
-pathlib.PosixPath = temp
-print("Processing complete.")
\ No newline at end of file
+    return output_path, stats
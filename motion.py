@@ -0,0 +1,80 @@
+# motion.py
+# Motion-gated frame skipping: only run the detector ensemble when the scene has actually changed
+
+import os
+
+import cv2
+import numpy as np
+
+# Off by default: gated videos reuse detections between inferred frames, so their output differs from the
+# fixed frame stride. Set MOTION_GATING=1 to opt in.
+MOTION_GATING = os.getenv('MOTION_GATING', '0') == '1'
+MOTION_MIN_STRIDE = int(os.getenv('MOTION_MIN_STRIDE', 1))
+MOTION_MAX_STRIDE = int(os.getenv('MOTION_MAX_STRIDE', 15))
+MOTION_METHOD = os.getenv('MOTION_METHOD', 'mad')  # 'mad' (mean absolute difference) or 'hist'
+MOTION_THRESHOLD = float(os.getenv('MOTION_THRESHOLD', 6.0))
+
+
+class MotionGate:
+    """Decides per frame whether to run inference or reuse the previous detections.
+
+    Frames are compared, as small grayscale thumbnails, against the last frame that
+    was inferred, so slow drift still triggers inference once it adds up.
+    Inference always runs at least every `max_stride` frames and never more often
+    than every `min_stride` frames.
+
+    `threshold` is in grey levels (0-255) for 'mad' and a Bhattacharyya distance
+    (0-1, try ~0.1) for 'hist'.
+    """
+
+    def __init__(self, min_stride=MOTION_MIN_STRIDE, max_stride=MOTION_MAX_STRIDE,
+                 threshold=MOTION_THRESHOLD, method=MOTION_METHOD, size=(64, 36)):
+        if method not in ('mad', 'hist'):
+            raise ValueError(f"Unknown motion method: {method}")
+        self.min_stride = max(1, min_stride)
+        self.max_stride = max(self.min_stride, max_stride)
+        self.threshold = threshold
+        self.method = method
+        self.size = size
+        self.frames = 0
+        self.inferred = 0
+        self.last_score = 0.0
+        self._reference = None
+        self._since_inference = 0
+
+    def _thumbnail(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        small = cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA)
+        if self.method == 'hist':
+            hist = cv2.calcHist([small], [0], None, [32], [0, 256])
+            return cv2.normalize(hist, hist).flatten()
+        return small.astype(np.int16)
+
+    def _score(self, thumb):
+        if self.method == 'hist':
+            return cv2.compareHist(self._reference, thumb, cv2.HISTCMP_BHATTACHARYYA)
+        return float(np.abs(thumb - self._reference).mean())
+
+    def should_infer(self, frame):
+        """Return True if this frame should go through the full ensemble."""
+        self.frames += 1
+        self._since_inference += 1
+
+        if self._reference is not None and self._since_inference < self.min_stride:
+            return False
+
+        thumb = self._thumbnail(frame)
+        if self._reference is None or self._since_inference >= self.max_stride:
+            infer = True
+        else:
+            self.last_score = self._score(thumb)
+            infer = self.last_score > self.threshold
+
+        if infer:
+            self._reference = thumb
+            self._since_inference = 0
+            self.inferred += 1
+        return infer
+
+    def stats(self):
+        return {'frames': self.frames, 'inference_calls': self.inferred, 'inference_saved': self.frames - self.inferred}
@@ -1,12 +1,20 @@
 # pages/detection.py
 
-import cv2
-# import dash
+import dash
 import dash_bootstrap_components as dbc
 from dash import dcc, html, Output, Input, State
+from flask import abort, send_file
 import os
-import base64
-from model import process_image, process_video
+import hashlib
+import json
+from model import process_image, process_image_file, process_video, process_video_file, make_browser_playable, CACHE_SETTINGS
+from jobs import BackgroundJobRunner
+from motion import MotionGate, MOTION_GATING, MOTION_MIN_STRIDE, MOTION_MAX_STRIDE, MOTION_METHOD, MOTION_THRESHOLD
+from remote import backend_health
+from registry import pool_health
+from uploads import upload_store
+from render import jpeg_data_uri
+from stats import category_counts, is_debris
 import plotly.graph_objs as go
 
 
@@ -14,7 +22,8 @@ import plotly.graph_objs as go
 layout = html.Div([
     html.H2("Underwater Debris Image Detection", style={'textAlign': 'center', 'marginTop': '4rem', 'marginBottom': '3rem', 'fontWeight':'bold'}),
     
-    # File Upload Component with plus symbol
+    # File Upload Component with plus symbol; assets/chunked_upload.js streams the picked file to /uploads
+    # and only the upload id reaches Dash through the detection-upload store
     html.Div([
         dcc.Upload(
             id='upload-data',
@@ -31,10 +40,17 @@ layout = html.Div([
             },
             multiple=False  # Allow only one file at a time
         ),
-    ], style={'textAlign': 'center', 'marginBottom': '20px'}),
+        html.Div(id='detection-upload-progress', style={'marginTop': '10px'}),
+    ], style={'textAlign': 'center', 'marginBottom': '20px'},
+       **{'data-chunked-upload': 'detection-upload', 'data-upload-progress': 'detection-upload-progress'}),
     
     # Hidden div to store filename state
     dcc.Store(id='stored-filename'),
+    dcc.Store(id='detection-upload'),  # {upload_id, filename} of the last chunked upload
+
+    # Background video job for this browser session, polled for progress
+    dcc.Store(id='detection-job-id', storage_type='session'),
+    dcc.Interval(id='detection-job-interval', interval=1000, n_intervals=0, disabled=True),
     
     # Output section
     html.Div(id='output-file-info', style={'marginTop': '20px', 'fontWeight': 'bold', 'textAlign': 'center'}),
@@ -159,21 +175,172 @@ layout = html.Div([
     html.Div(style={'height': '40px'})
 ], style={'backgroundColor': 'white', 'padding': '20px'})
 
-# Categories
-animals = ['coral', 'crab', 'dolphin', 'fish', 'jellyfish', 'narwhal', 'octopus', 'sea-horse', 'sea-turtle', 'seal', 'shark', 'shrimp', 'star-fish', 'sting-ray', 'whale']
-industrial_waste = ['can', 'cellphone', 'electronics', 'gbottle', 'glove', 'metal', 'misc', 'net', 'rod', 'sunglasses', 'tire']
-plastic = ['pbottle', 'plastic', 'pbag', 'trash_plastic']
-medical_waste = ['glove', 'syringe', 'bandage', 'mask']  # New category for medical waste
-miscellaneous = ['sunglasses', 'rod', 'rare_item']  # Rare or miscellaneous items
-
 degradation_times = {
     'mask': 450, 'can': 200, 'cellphone': 1000, 'electronics': 1000, 'gbottle': 10000,
     'glove': 50, 'metal': 500, 'misc': 100, 'net': 600, 'pbag': 20,
     'pbottle': 450, 'plastic': 450, 'rod': 500, 'sunglasses': 1000, 'tire': 2000, 'trash_plastic': 450
 }
 
+# Dashboard figures and container styles for a set of class counts
+def build_dashboards(class_counts):
+    # Categorize the counts into groups (a label can belong to several)
+    categorized_counts = category_counts(class_counts)
+
+    # Create the individual class count bar chart
+    individual_data = [go.Bar(x=list(class_counts.keys()), y=list(class_counts.values()))]
+    individual_figure = {'data': individual_data, 'layout': go.Layout(title='Object Class Counts', paper_bgcolor='#444444', plot_bgcolor='#444444', font=dict(color='#ffffff'))}
+
+    # Create the categorized class count bar chart
+    categorized_data = [go.Bar(x=list(categorized_counts.keys()), y=list(categorized_counts.values()))]
+    categorized_figure = {'data': categorized_data, 'layout': go.Layout(title='Categorized Object Counts', paper_bgcolor='#444444', plot_bgcolor='#444444', font=dict(color='#ffffff'))}
+
+    # Calculate debris percentage
+    debris_count = sum(count for item, count in class_counts.items() if is_debris(item))
+
+    max_percentage = 100 # or some other maximum value
+
+    debris_percentage = (debris_count / max_percentage) * 1000
+    # Determine safety level
+    if debris_percentage <= 30:
+        safety_status = "Safe"
+        gauge_color = "green"
+    elif debris_percentage <= 60:
+        safety_status = "Moderate"
+        gauge_color = "yellow"
+    elif debris_percentage <= 90:
+        safety_status = "Unsafe"
+        gauge_color = "orange"
+    else:
+        safety_status = "Hazardous"
+        gauge_color = "red"
+
+    # Create gauge meter figure
+    gauge_figure = go.Figure(
+        go.Indicator(
+            mode="gauge+number",
+            value=debris_percentage,
+            title={"text": f"Safety Level: {safety_status}"},
+            gauge={
+                "axis": {"range": [0, 100]},
+                "bar": {"color": gauge_color},
+                "steps": [
+                    {"range": [0, 30], "color": "green"},
+                    {"range": [30, 60], "color": "yellow"},
+                    {"range": [60, 90], "color": "orange"},
+                    {"range": [90, 100], "color": "red"}
+                ]
+            }
+        )
+    )
+    gauge_figure.update_layout(paper_bgcolor='#444444', font=dict(color='#ffffff'))
+
+    # Create degradation time bar chart
+    degradation_data = []
+    for item, count in class_counts.items():
+        if item not in degradation_times:
+            continue
+        degradation_time = degradation_times.get(item, 0)
+        degradation_data.append(go.Bar(x=[item], y=[degradation_time]))
+    degradation_figure = {'data': degradation_data, 'layout': go.Layout(title='Degradation Time of Detected Items', paper_bgcolor='#444444', plot_bgcolor='#444444', font=dict(color='#ffffff'))}
+
+    return individual_figure, categorized_figure, {'display': 'block'}, {'display': 'block'}, gauge_figure, {'display': 'block'}, degradation_figure, {'display': 'block'}  # Show all containers
+
+HIDDEN_DASHBOARDS = (go.Figure(), go.Figure(), {'display': 'none'}, {'display': 'none'}, go.Figure(), {'display': 'none'}, go.Figure(), {'display': 'none'})
+
+# Run one uploaded video (a data URI or a finished chunked upload) in the background, reporting progress to the job
+def run_video_job(job, contents=None, upload_id=None):
+    options = dict(
+        skip_frames=VIDEO_SKIP_FRAMES, output_path=video_jobs.output_path(job.job_id, '.mp4'),
+        progress=lambda done, total, stats: job.update(done, total, dict(stats['class_counts'])),
+        motion_gate=MotionGate() if MOTION_GATING else None,
+    )
+    if upload_id is None:
+        processed_video_path, video_stats = process_video(contents, **options)
+    else:
+        try:
+            processed_video_path, video_stats = process_video_file(upload_store.completed_path(upload_id), **options)
+        finally:
+            upload_store.remove(upload_id)
+    make_browser_playable(processed_video_path)
+    print(f"Processed {video_stats['frames_processed']} frames for job {job.job_id}")
+    if 'inference_saved' in video_stats:
+        print(f"Motion gating skipped inference on {video_stats['inference_saved']} of {video_stats['frames']} frames")
+    return {'output_path': processed_video_path, **video_stats}
+
+def backend_health_text():
+    parts = []
+    pool = pool_health()
+    if pool is not None:
+        parts.append(f"YOLO workers {pool['ready']}/{pool['workers']} ready, {pool['in_flight']} requests in flight")
+    for name, health in backend_health().items():
+        if health['state'] == 'closed':
+            parts.append(f"{name} ok")
+        else:
+            parts.append(f"{name} unavailable (retry in {health['retry_in']:.0f}s)")
+    return f"Backends: {', '.join(parts)}\n" if parts else ""
+
+def video_progress_text(job):
+    progress = job.progress()
+    if progress['status'] == 'queued':
+        return "Video queued for processing..."
+    text = f"Processing video: {progress['frames_done']}"
+    if progress['frames_total']:
+        text += f"/{progress['frames_total']}"
+    text += f" frames, {progress['fps']:.1f} fps"
+    if progress['eta_seconds'] is not None:
+        text += f", about {progress['eta_seconds']:.0f}s left"
+    return text
+
+# Callback outputs for a processed image: annotated preview, info text and dashboards
+def image_outputs(filename, image, final_boxes, sources):
+    # The annotated image is BGR, as imencode expects
+    img_src = jpeg_data_uri(image)
+    display_component = html.Img(src=img_src, style={'maxWidth': '100%', 'height': 'auto', 'maxHeight': '500px'})
+
+    # Update individual class counts for the bar chart
+    class_counts = {}
+    for box in final_boxes:
+        class_counts[box['class']] = class_counts.get(box['class'], 0) + 1
+
+    # Update image info to include total detections
+    image_info = f"Processing image: {filename}\n"
+    if sources:
+        image_info += f"Sources: {', '.join(sources)}\n"
+    image_info += backend_health_text()
+
+    return (image_info, display_component, *build_dashboards(class_counts), None, True)
+
+# Videos are processed on a local worker pool instead of inside the callback. Like degraded images,
+# videos with frames a backend did not answer for are returned but not saved, so a re-upload reruns them.
+video_jobs = BackgroundJobRunner(cacheable=lambda result: not result.get('degraded_frames'))
+
+VIDEO_SKIP_FRAMES = 5  # Every n-th frame is inferred when motion gating is off
+
+def video_job_key(content_hash):
+    """Job id for a video: its content plus every setting that changes the processed result."""
+    settings = {
+        'detection': CACHE_SETTINGS,
+        'skip_frames': VIDEO_SKIP_FRAMES,
+        'motion': [MOTION_GATING, MOTION_MIN_STRIDE, MOTION_MAX_STRIDE, MOTION_METHOD, MOTION_THRESHOLD],
+    }
+    return hashlib.sha256(f"{json.dumps(settings, sort_keys=True)}:{content_hash}".encode()).hexdigest()
+
+# Outputs are keyed by content, so browsers may cache them for a long time
+PROCESSED_VIDEO_MAX_AGE = int(os.getenv('PROCESSED_VIDEO_MAX_AGE', 24 * 3600))
+
 # Callback to detect file type and display the file
 def register_callbacks(app):
+    # Finished videos are streamed from disk; conditional send_file answers Range requests (seeking,
+    # progressive playback) and If-None-Match/If-Modified-Since with 206/304
+    @app.server.route('/videos/<job_id>.mp4')
+    def serve_processed_video(job_id):
+        job = video_jobs.get(job_id)
+        if job is None or job.status != 'done':
+            abort(404)
+        # A degraded result is rerun on the next upload, so browsers must not keep it
+        return send_file(job.result['output_path'], mimetype='video/mp4', conditional=True, etag=True,
+                         max_age=PROCESSED_VIDEO_MAX_AGE if job.saved else 0)
+
     @app.callback(
         Output('stored-filename', 'data'),
         Input('upload-data', 'filename')
@@ -191,132 +358,104 @@ def register_callbacks(app):
          Output('safety-gauge', 'figure'),  # New output for gauge meter
          Output('gauge-container', 'style'),
          Output('degradation-time-graph', 'figure'),
-         Output('degradation-time-graph-container', 'style')],
+         Output('degradation-time-graph-container', 'style'),
+         Output('detection-job-id', 'data'),
+         Output('detection-job-interval', 'disabled')],
         [Input('upload-data', 'contents'),
-         State('upload-data', 'filename')]
+         State('upload-data', 'filename'),
+         State('detection-job-id', 'data')]
     )
-    def detect_file_type(contents, filename):
+    def detect_file_type(contents, filename, job_id):
         if not contents:
-            return ("No file uploaded yet.", "", go.Figure(), go.Figure(), {'display': 'none'}, {'display': 'none'}, go.Figure(), {'display': 'none'}, go.Figure(), {'display': 'none'})  # Hide all containers
+            # After a page reload, keep polling the session's video job so its result comes back without reprocessing
+            if job_id and video_jobs.get(job_id) is not None:
+                return ("Loading previous video...", "", *HIDDEN_DASHBOARDS, job_id, False)
+            return ("No file uploaded yet.", "", *HIDDEN_DASHBOARDS, None, True)  # Hide all containers
         
         ext = os.path.splitext(filename)[1].lower()
-        file_type = ""
-        display_component = None
-        final_boxes = []  # Initialize final_boxes as an empty list
         
         if ext in ['.jpg', '.jpeg', '.png']:
-            file_type = "Image"
-            image, final_boxes = process_image(contents)
-            # Convert the image to RGB format for Dash
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            _, buffer = cv2.imencode('.jpg', image_rgb)
-            image_encoded = base64.b64encode(buffer).decode('utf-8')
-            img_src = f'data:image/jpeg;base64,{image_encoded}'
-            display_component = html.Img(src=img_src, style={'maxWidth': '100%', 'height': 'auto', 'maxHeight': '500px'})
+            return image_outputs(filename, *process_image(contents))
         elif ext in ['.mp4']:
-            file_type = "Video"
-            try:
-                processed_video_path, frames = process_video(contents, skip_frames=5)  # Adjust skip_frames as needed
-                with open(processed_video_path, 'rb') as f:
-                    video_encoded = base64.b64encode(f.read()).decode('utf-8')
-                video_src = f'data:video/mp4;base64,{video_encoded}'
-                display_component = html.Video(src=video_src, controls=True, style={'maxWidth': '100%', 'height': 'auto', 'maxHeight': '500px'})
-                
-                # Print frames
-                for i, frame in enumerate(frames):
-                    print(f"Frame {i}: {frame}")
-            except ValueError as e:
-                return str(e), "", go.Figure(), go.Figure(), {'display': 'none'}, {'display': 'none'}, go.Figure(), {'display': 'none'}, go.Figure(), {'display': 'none'}  # Hide all containers
+            # Videos run in the background; the interval below polls for progress and the result
+            key = video_job_key(hashlib.sha256(contents.encode()).hexdigest())
+            job, _ = video_jobs.submit(key, run_video_job, contents)
+            return (video_progress_text(job), "", *HIDDEN_DASHBOARDS, job.job_id, False)
         else:
-            return "Unsupported file format.", "", go.Figure(), go.Figure(), {'display': 'none'}, {'display': 'none'}, go.Figure(), {'display': 'none'}, go.Figure(), {'display': 'none'}  # Hide all containers
-        
-        # Update individual class counts for the bar chart
-        class_counts = {}
-        for box in final_boxes:
-            class_counts[box['class']] = class_counts.get(box['class'], 0) + 1
-
-        # Categorize the counts into groups
-        categorized_counts = {
-            'Animals': 0,
-            'Industrial Waste': 0,
-            'Plastic Waste': 0,
-            'Medical Waste': 0,
-            'Miscellaneous': 0,
-        }
-
-        for label, count in class_counts.items():
-            if label in animals:
-                categorized_counts['Animals'] += count
-            elif label in industrial_waste:
-                categorized_counts['Industrial Waste'] += count
-            if label in plastic:
-                categorized_counts['Plastic Waste'] += count
-            if label in medical_waste:
-                categorized_counts['Medical Waste'] += count
-            if label in miscellaneous:
-                categorized_counts['Miscellaneous'] += count
-
-        total_detections = len(final_boxes)
-        # Create the individual class count bar chart
-        individual_data = [go.Bar(x=list(class_counts.keys()), y=list(class_counts.values()))]
-        individual_figure = {'data': individual_data, 'layout': go.Layout(title='Object Class Counts', paper_bgcolor='#444444', plot_bgcolor='#444444', font=dict(color='#ffffff'))}
-
-        # Create the categorized class count bar chart
-        categorized_data = [go.Bar(x=list(categorized_counts.keys()), y=list(categorized_counts.values()))]
-        categorized_figure = {'data': categorized_data, 'layout': go.Layout(title='Categorized Object Counts', paper_bgcolor='#444444', plot_bgcolor='#444444', font=dict(color='#ffffff'))}
-
-        # Update image info to include total detections
-        image_info = f"Processing image: {filename}\n"
-        # Calculate debris percentage
-        debris_count = sum(count for item, count in class_counts.items() if item not in animals)
-
-        max_percentage = 100 # or some other maximum value
-
-        debris_percentage = (debris_count / max_percentage) * 1000
-        # Determine safety level
-        if debris_percentage <= 30:
-            safety_status = "Safe"
-            gauge_color = "green"
-        elif debris_percentage <= 60:
-            safety_status = "Moderate"
-            gauge_color = "yellow"
-        elif debris_percentage <= 90:
-            safety_status = "Unsafe"
-            gauge_color = "orange"
-        else:
-            safety_status = "Hazardous"
-            gauge_color = "red"
-
-        # Create gauge meter figure
-        gauge_figure = go.Figure(
-            go.Indicator(
-                mode="gauge+number",
-                value=debris_percentage,
-                title={"text": f"Safety Level: {safety_status}"},
-                gauge={
-                    "axis": {"range": [0, 100]},
-                    "bar": {"color": gauge_color},
-                    "steps": [
-                        {"range": [0, 30], "color": "green"},
-                        {"range": [30, 60], "color": "yellow"},
-                        {"range": [60, 90], "color": "orange"},
-                        {"range": [90, 100], "color": "red"}
-                    ]
-                }
-            )
-        )
-        gauge_figure.update_layout(paper_bgcolor='#444444', font=dict(color='#ffffff'))
+            return ("Unsupported file format.", "", *HIDDEN_DASHBOARDS, None, True)  # Hide all containers
+
+    # Same outputs for files sent through the chunked upload routes; only the upload id comes through Dash
+    @app.callback(
+        [Output('output-file-info', 'children', allow_duplicate=True),
+         Output('output-file-display', 'children', allow_duplicate=True),
+         Output('individual-class-count-graph', 'figure', allow_duplicate=True),
+         Output('categorized-class-count-graph', 'figure', allow_duplicate=True),
+         Output('individual-class-graph-container', 'style', allow_duplicate=True),
+         Output('categorized-class-graph-container', 'style', allow_duplicate=True),
+         Output('safety-gauge', 'figure', allow_duplicate=True),
+         Output('gauge-container', 'style', allow_duplicate=True),
+         Output('degradation-time-graph', 'figure', allow_duplicate=True),
+         Output('degradation-time-graph-container', 'style', allow_duplicate=True),
+         Output('detection-job-id', 'data', allow_duplicate=True),
+         Output('detection-job-interval', 'disabled', allow_duplicate=True)],
+        [Input('detection-upload', 'data')],
+        prevent_initial_call=True
+    )
+    def detect_uploaded_file(upload):
+        upload_id = (upload or {}).get('upload_id')
+        meta = upload_store.meta(upload_id)
+        if meta is None or not meta['complete']:
+            return ("Upload not found, please upload again.", "", *HIDDEN_DASHBOARDS, None, True)
+
+        if meta['ext'] in ['.jpg', '.jpeg', '.png']:
+            try:
+                return image_outputs(meta['filename'], *process_image_file(upload_store.completed_path(upload_id)))
+            finally:
+                upload_store.remove(upload_id)
+        # Key on the file hash the upload route computed, so re-uploading the same video reuses its job
+        key = video_job_key(meta['sha256'])
+        job, started = video_jobs.submit(key, run_video_job, upload_id=upload_id)
+        if not started:
+            upload_store.remove(upload_id)  # The existing job already has this video; run_video_job would have removed it
+        return (video_progress_text(job), "", *HIDDEN_DASHBOARDS, job.job_id, False)
+
+    @app.callback(
+        [Output('output-file-info', 'children', allow_duplicate=True),
+         Output('output-file-display', 'children', allow_duplicate=True),
+         Output('individual-class-count-graph', 'figure', allow_duplicate=True),
+         Output('categorized-class-count-graph', 'figure', allow_duplicate=True),
+         Output('individual-class-graph-container', 'style', allow_duplicate=True),
+         Output('categorized-class-graph-container', 'style', allow_duplicate=True),
+         Output('safety-gauge', 'figure', allow_duplicate=True),
+         Output('gauge-container', 'style', allow_duplicate=True),
+         Output('degradation-time-graph', 'figure', allow_duplicate=True),
+         Output('degradation-time-graph-container', 'style', allow_duplicate=True),
+         Output('detection-job-interval', 'disabled', allow_duplicate=True)],
+        [Input('detection-job-interval', 'n_intervals')],
+        [State('detection-job-id', 'data')],
+        prevent_initial_call=True
+    )
+    def poll_video_job(n_intervals, job_id):
+        job = video_jobs.get(job_id)
+        if job is None:
+            return ("Video job not found, please upload again.", "", *HIDDEN_DASHBOARDS, True)
+
+        if job.status == 'failed':
+            return (f"Error processing video: {job.error}", "", *HIDDEN_DASHBOARDS, True)
 
-        # Create degradation time bar chart
-        degradation_data = []
-        for item, count in class_counts.items():
-            if item not in degradation_times:
-                continue
-            degradation_time = degradation_times.get(item, 0)
-            degradation_data.append(go.Bar(x=[item], y=[degradation_time]))
-        degradation_figure = {'data': degradation_data, 'layout': go.Layout(title='Degradation Time of Detected Items', paper_bgcolor='#444444', plot_bgcolor='#444444', font=dict(color='#ffffff'))}
+        if job.status != 'done':
+            # Show the counts gathered so far while the rest of the video is processed
+            dashboards = build_dashboards(job.partial) if job.partial else HIDDEN_DASHBOARDS
+            return (video_progress_text(job), dash.no_update, *dashboards, False)
 
-        return image_info, display_component, individual_figure, categorized_figure, {'display': 'block'}, {'display': 'block'}, gauge_figure, {'display': 'block'}, degradation_figure, {'display': 'block'}  # Show all containers
+        # The browser fetches the video itself from the streaming route instead of through the callback response
+        display_component = html.Video(src=f'/videos/{job.job_id}.mp4', controls=True, style={'maxWidth': '100%', 'height': 'auto', 'maxHeight': '500px'})
+        info = backend_health_text() + f"Processed video: {job.result['frames_processed']} frames"
+        if 'inference_saved' in job.result:
+            info += f" ({job.result['inference_saved']} inference calls saved by motion gating)"
+        if job.result.get('degraded_frames'):
+            info += f"\n{job.result['degraded_frames']} frames are missing a backend; this result is not saved"
+        return (info, display_component, *build_dashboards(job.result['class_counts']), True)
 
     @app.callback(
         Output("suggestions-collapse", "is_open"),
@@ -327,4 +466,4 @@ def register_callbacks(app):
         if n_clicks:
             return not is_open
         return is_open
-# Ensure to register the callbacks in app.py
\ No newline at end of file
+# Ensure to register the callbacks in app.py
@@ -1,25 +1,21 @@
-import pathlib
-import torch
-import cv2
-from PIL import Image
-import numpy as np
 import dash
 import dash_bootstrap_components as dbc
 
 from dash import dcc, html
 from dash.dependencies import Output, Input, State
+from flask import Response, abort
 import plotly.graph_objs as go
 import base64
 # import os
 import tempfile
-import platform
-import concurrent.futures
-
-animals = ['coral', 'crab', 'dolphin', 'fish', 'jellyfish', 'narwhal', 'octopus', 'sea-horse', 'sea-turtle', 'seal', 'shark', 'shrimp', 'star-fish', 'sting-ray', 'whale']
-industrial_waste = ['can', 'cellphone', 'electronics', 'gbottle', 'glove', 'metal', 'misc', 'net', 'rod', 'sunglasses', 'tire']
-plastic = ['pbottle', 'plastic', 'pbag', 'trash_plastic']
-medical_waste = ['glove', 'syringe', 'bandage', 'mask']  # New category for medical waste
-miscellaneous = ['sunglasses', 'rod', 'rare_item']  # Rare or miscellaneous items
+import time
+from batching import detect_batch
+from registry import get_model, pool_health
+from jobs import JobManager
+from motion import MotionGate, MOTION_GATING
+from uploads import upload_store
+from render import draw_detections, encode_jpeg
+from stats import STATS_WINDOWS
 
 degradation_times = {
     'mask': 450, 'can': 200, 'cellphone': 1000, 'electronics': 1000, 'gbottle': 10000,
@@ -27,19 +23,6 @@ degradation_times = {
     'pbottle': 450, 'plastic': 450, 'rod': 500, 'sunglasses': 1000, 'tire': 2000, 'trash_plastic': 450
 }
 
-# Temporary fix for pathlib issue
-if platform.system() == 'Windows':
-    temp = pathlib.PosixPath
-    pathlib.PosixPath = pathlib.WindowsPath
-
-# Load YOLOv5 model
-try:
-    model = torch.hub.load('ultralytics/yolov5', 'custom', path='best_250_with_yolov5s.pt', force_reload=True)
-    print("Model loaded successfully.")
-except Exception as e:
-    print(f"Error loading model: {e}")
-    exit()
-
 # Define the layout for the video page
 layout = html.Div([
     html.H2("Underwater Debris Video Detection", style={'textAlign': 'center', 'marginTop': '10rem', 'marginBottom': '3rem', 'fontWeight':'bold'}),
@@ -58,16 +41,22 @@ layout = html.Div([
                 'backgroundColor': '#ffffff', 
             },
             multiple=False 
-    ), style={'marginBottom': '20px'}),
+    ), style={'marginBottom': '20px'},
+       # assets/chunked_upload.js streams the picked file to /uploads; only the upload id reaches Dash
+       **{'data-chunked-upload': 'video-upload', 'data-upload-progress': 'video-upload-progress'}),
+    html.Div(id='video-upload-progress', style={'textAlign': 'center'}),
 
     html.Div(id='video-info', style={'textAlign': 'center', 'margin': '10px', 'fontSize': '16px'}),
+    html.Div(id='video-stats', style={'textAlign': 'center', 'margin': '10px', 'fontSize': '14px'}),
 
+    # Annotated frames are pushed over an MJPEG stream (/video-stream/<job id>) as soon as they are ready
     html.Div(html.Img(id='video-frame', style={
         'width': '60%', 'margin': '20px auto', 'display': 'block',
         'boxShadow': '0px 4px 10px rgba(0, 0, 0, 0.2)', 'borderRadius': '10px'
     })),
 
     dcc.Graph(id='class-count-graph'),
+    dcc.Graph(id='category-timeline-graph'),  # New objects per category over the largest stats window
 
     # Container for all dashboards
     html.Div(
@@ -179,82 +168,122 @@ layout = html.Div([
         style={'display': 'flex', 'justifyContent': 'center', 'flexWrap': 'wrap', 'backgroundColor': '#333333', 'padding': '20px', 'borderRadius': '12px'}
     ),
 
-    dcc.Interval(id='interval-component', interval=500, n_intervals=0, disabled=True)  # Faster refresh rate
+    dcc.Store(id='video-job-id'),  # Id of this page's video job
+    dcc.Store(id='video-upload'),  # {upload_id, filename} of the last chunked upload
+    dcc.Interval(id='interval-component', interval=2000, n_intervals=0, disabled=True)  # Stats only; frames come over the stream
 ])
 
 # Video Processing Optimizations
 frame_skip = 3  # Skip frames for speed
-batch_size = 4  # Process 4 frames in parallel
-class_counts = {}
-cap = None
-executor = concurrent.futures.ThreadPoolExecutor(max_workers=batch_size)
-
-def process_frames_parallel(frames):
-    """ Process multiple frames in parallel using YOLOv5 """
-    results = []
-    futures = []
-
-    for frame in frames:
-        futures.append(executor.submit(run_model, frame))
-
-    for future in concurrent.futures.as_completed(futures):
-        results.append(future.result())
-
-    return results
-
-def run_model(frame):
-    """ Runs the model on a single frame """
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    pil_img = Image.fromarray(frame_rgb)
-    results = model(pil_img)
-
-    detected_objects = {}
-    for result in results.xyxy[0]:
-        class_id = int(result[5])
-        class_name = model.names[class_id]
-        detected_objects[class_name] = detected_objects.get(class_name, 0) + 1
-
-    annotated_frame = np.squeeze(results.render())
-    _, buffer = cv2.imencode('.jpg', cv2.cvtColor(annotated_frame, cv2.COLOR_RGB2BGR))
-    return base64.b64encode(buffer).decode('utf-8'), detected_objects
-
-def process_video():
-    global cap, class_counts
-    if not cap or not cap.isOpened():
-        return None, None
-
-    frames_to_process = []
-    for _ in range(batch_size):
-        ret, frame = cap.read()
-        if not ret:
-            break
-        frames_to_process.append(frame)
-
-    if not frames_to_process:
-        return None, None
-
-    results = process_frames_parallel(frames_to_process)
-
-    final_counts = {}
-    last_encoded_frame = None
-
-    for encoded_frame, frame_counts in results:
-        last_encoded_frame = encoded_frame  # Use the last valid frame for display
-        for key, value in frame_counts.items():
-            final_counts[key] = final_counts.get(key, 0) + value
-
-    return last_encoded_frame, final_counts
+batch_size = 4  # Frames per batched forward pass
+video_jobs = JobManager()  # One capture and set of counts per upload
+
+def yolo_boxes(results):
+    """ Single-frame YOLO result as box dicts for the tracker """
+    return [{'box': row[:4].tolist(), 'conf': row[4].item(), 'class': results.names[int(row[5])], 'source': 'yolo'}
+            for row in results.xyxy[0]]
+
+def encode_annotated(frame, boxes):
+    """ Draw boxes on the decoded BGR frame in place and encode it as JPEG bytes for the stream """
+    return encode_jpeg(draw_detections(frame, boxes))
+
+def process_video(job):
+    """ Process the next batch of frames for one job; returns the JPEG of every frame read ([] if the job is busy, None when done) """
+    # Another stream connection for the same job is mid-batch
+    if not job.lock.acquire(blocking=False):
+        return []
+    encoded = []
+    model = get_model()
+    ring = getattr(model, 'ring', None)  # Set when inference runs in the worker pool
+    slots = []
+    try:
+        if not job.is_open():
+            return None
+
+        read_at = time.monotonic()
+        if ring is not None and job.frame_shape is not None and ring.fits(job.frame_shape):
+            # Decode into shared memory so the workers read the frames without them being copied
+            frames_read, slots = job.read_batch_into(ring)
+        else:
+            frames_read = job.read_batch()
+        if not frames_read:
+            return None
+
+        # Frames the motion gate rejects are drawn with the tracker's predicted boxes instead of running the model
+        infer_flags = [job.motion_gate is None or job.motion_gate.should_infer(frame) for frame in frames_read]
+        inferred = [i for i, infer in enumerate(infer_flags) if infer]
+        inferred_slots = [(slots[i], frames_read[i].shape) for i in inferred] if slots else None
+        if inferred_slots and any(slot is None for slot, _ in inferred_slots):
+            inferred_slots = None  # Some frames missed the ring; let the pool copy them all in
+        results = iter(detect_batch(model, [frames_read[i] for i in inferred], slots=inferred_slots))
+
+        # Every frame advances the tracker so each object is only counted once, and is drawn with the
+        # tracked boxes (stable ids, predicted on skipped frames) as in model.process_video
+        for frame, infer in zip(frames_read, infer_flags):
+            tracked_boxes = job.tracker.step(yolo_boxes(next(results)) if infer else None)
+            job.stats.add_cumulative(job.tracker.unique_counts())
+            job.last_encoded_frame = encode_annotated(frame, tracked_boxes)
+            job.record_latency(time.monotonic() - read_at)
+            encoded.append(job.last_encoded_frame)
+        job.class_counts = job.tracker.unique_counts()
+        job.batch_errors = 0
+    finally:
+        # Annotation drew on the slot memory in place and the frames are encoded. A request still in flight
+        # (e.g. after a result timeout) holds its own reference, so the slots are only reused once it is done
+        for slot in slots:
+            if slot is not None:
+                ring.release(slot)
+        job.lock.release()
+
+    return encoded
+
+def stream_frames(job):
+    """ multipart/x-mixed-replace body: one JPEG part per decoded frame, produced as fast as the model keeps up """
+    def part(jpeg):
+        return b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: ' + str(len(jpeg)).encode() + b'\r\n\r\n' + jpeg + b'\r\n'
+
+    # A reconnecting viewer sees the current frame straight away
+    if job.last_encoded_frame is not None:
+        yield part(job.last_encoded_frame)
+    next_at = time.monotonic()
+    while True:
+        job.last_used = time.monotonic()  # An open stream keeps the job from being evicted as idle
+        try:
+            frames = process_video(job)
+        except Exception as e:
+            # A busy or restarting inference pool, or a bad frame: drop this batch and carry on with the next one
+            print(f"Video job {job.job_id}: batch failed: {e}")
+            if job.record_error(e):
+                print(f"Video job {job.job_id}: stopping after {job.batch_errors} failed batches in a row")
+                return
+            time.sleep(0.5)
+            continue
+        if frames is None:
+            return
+        if not frames and job.lock.locked():
+            time.sleep(0.05)  # Another connection is processing this job
+        for jpeg in frames:
+            # Skipped frames cost no inference; never play faster than the source frame rate
+            if job.fps:
+                now = time.monotonic()
+                if next_at > now:
+                    time.sleep(next_at - now)
+                next_at = max(next_at, now) + 1 / job.fps
+            yield part(jpeg)
 
 def register_callbacks(app):
     @app.callback(
-        [Output('video-info', 'children'), Output('interval-component', 'disabled')],
+        [Output('video-info', 'children'), Output('interval-component', 'disabled'), Output('video-job-id', 'data')],
         [Input('upload-video', 'contents')],
-        [State('upload-video', 'filename')]
+        [State('upload-video', 'filename'), State('video-job-id', 'data')]
     )
-    def upload_video(contents, filename):
-        global cap, class_counts
+    def upload_video(contents, filename, previous_job_id):
         if contents is None:
-            return "No video uploaded.", True
+            return "No video uploaded.", True, None
+
+        # A new upload from the same page replaces that page's previous job only
+        if previous_job_id:
+            video_jobs.remove(previous_job_id)
 
         # Save uploaded video to a temporary file
         content_type, content_string = contents.split(',')
@@ -263,31 +292,99 @@ def register_callbacks(app):
         with open(temp_file.name, 'wb') as f:
             f.write(decoded)
 
-        # Initialize video capture
-        cap = cv2.VideoCapture(temp_file.name)
-        if not cap.isOpened():
-            return "Error: Unable to open the uploaded video.", True
+        # Initialize this upload's own video capture
+        job = video_jobs.create(temp_file.name, filename, batch_size=batch_size, motion_gate=MotionGate() if MOTION_GATING else None)
+        if not job.is_open():
+            video_jobs.remove(job.job_id)
+            return "Error: Unable to open the uploaded video.", True, None
 
-        class_counts = {}
-        return f"Processing video: {filename}", False
+        return f"Processing video: {filename}", False, job.job_id
 
     @app.callback(
-        [Output('class-count-graph', 'figure'), Output('video-frame', 'src')],
-        [Input('interval-component', 'n_intervals')]
+        [Output('video-info', 'children', allow_duplicate=True), Output('interval-component', 'disabled', allow_duplicate=True),
+         Output('video-job-id', 'data', allow_duplicate=True)],
+        [Input('video-upload', 'data')],
+        [State('video-job-id', 'data')],
+        prevent_initial_call=True
     )
-    def update_output(n):
-        frame_encoded, class_counts = process_video()
-        if frame_encoded is None:
-            return dash.no_update, dash.no_update
+    def upload_chunked_video(upload, previous_job_id):
+        upload = upload or {}
+        # The job takes ownership of the uploaded file and deletes it when closed
+        video_path = upload_store.take(upload.get('upload_id'))
+        if video_path is None:
+            return "Upload not found, please upload again.", True, None
 
-        # Update bar chart
-        data = [go.Bar(x=list(class_counts.keys()), y=list(class_counts.values()))]
-        figure = {'data': data, 'layout': go.Layout(title='Object Class Counts')}
+        if previous_job_id:
+            video_jobs.remove(previous_job_id)
+
+        job = video_jobs.create(video_path, upload['filename'], batch_size=batch_size, motion_gate=MotionGate() if MOTION_GATING else None)
+        if not job.is_open():
+            video_jobs.remove(job.job_id)
+            return "Error: Unable to open the uploaded video.", True, None
 
-        # Update video frame
-        img_src = f'data:image/jpeg;base64,{frame_encoded}'
-        return figure, img_src
+        return f"Processing video: {upload['filename']}", False, job.job_id
 
-# Restore pathlib
-if platform.system() == 'Windows':
-    pathlib.PosixPath = temp
\ No newline at end of file
+    # Point the frame at this job's MJPEG stream; the browser keeps the connection open and swaps in each part
+    @app.callback(
+        Output('video-frame', 'src'),
+        [Input('video-job-id', 'data')]
+    )
+    def show_stream(job_id):
+        return f"/video-stream/{job_id}" if job_id else None
+
+    @app.server.route('/video-stream/<job_id>')
+    def stream_video(job_id):
+        job = video_jobs.get(job_id)
+        if job is None:
+            abort(404)
+        return Response(stream_frames(job), mimetype='multipart/x-mixed-replace; boundary=frame',
+                        headers={'Cache-Control': 'no-store'})
+
+    @app.callback(
+        [Output('class-count-graph', 'figure'), Output('video-stats', 'children'),
+         Output('categorized-class-count-graph', 'figure'), Output('categorized-class-graph-container', 'style'),
+         Output('category-timeline-graph', 'figure')],
+        [Input('interval-component', 'n_intervals')],
+        [State('video-job-id', 'data')]
+    )
+    def update_output(n, job_id):
+        job = video_jobs.get(job_id) if job_id else None
+        if job is None:
+            return (dash.no_update,) * 5
+        # Everything below reads the job's running aggregates; nothing is recounted from past frames
+        class_counts, category_totals = job.stats.totals()
+
+        # Update bar chart
+        data = [go.Bar(x=list(class_counts.keys()), y=list(class_counts.values()))]
+        title = 'Unique Objects by Class'
+        if job.motion_gate is not None:
+            title += f" ({job.motion_gate.stats()['inference_saved']} of {job.motion_gate.frames} frames skipped by motion gating)"
+        figure = {'data': data, 'layout': go.Layout(title=title)}
+
+        # Categories: all time next to each sliding window
+        categories = list(category_totals)
+        category_data = [go.Bar(name='Total', x=categories, y=list(category_totals.values()))]
+        for seconds in STATS_WINDOWS:
+            category_data.append(go.Bar(name=f'Last {seconds}s', x=categories, y=list(job.stats.window(seconds).values())))
+        category_figure = {'data': category_data, 'layout': go.Layout(title='Categorized Object Counts', barmode='group', paper_bgcolor='#444444', plot_bgcolor='#444444', font=dict(color='#ffffff'))}
+
+        times, series = job.stats.timeline()
+        timeline_data = [go.Scatter(name=category, x=times, y=counts, mode='lines') for category, counts in series.items()]
+        timeline_figure = {'data': timeline_data, 'layout': go.Layout(title='New Objects per Category', xaxis={'title': 'Seconds ago'})}
+
+        # Per-frame latency of the stream, read to JPEG ready
+        latency = job.latency_stats()
+        stats = f"{job.frames_streamed} frames streamed"
+        if job.failed:
+            stats = f"Processing stopped after {job.batch_errors} failed batches ({job.last_error}); " + stats
+        elif job.batch_errors:
+            stats += f", last batch failed ({job.last_error})"
+        if latency is not None:
+            stats += f", latency {latency['last_ms']:.0f} ms (mean {latency['mean_ms']:.0f} ms, p95 {latency['p95_ms']:.0f} ms)"
+        pool = pool_health()
+        if pool is not None:
+            busy = sum(w['current_ms'] is not None for w in pool['per_worker'])
+            stats += f", YOLO workers {busy}/{pool['workers']} busy"
+            if pool['free_frame_slots'] is not None:
+                stats += f", {pool['free_frame_slots']} free frame slots"
+        return figure, stats, category_figure, {'width': '45%', 'margin': '20px', 'display': 'block', 'backgroundColor': '#444444', 'padding': '20px', 'borderRadius': '12px'}, timeline_figure
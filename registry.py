@@ -0,0 +1,124 @@
+# registry.py
+# One lazily-loaded YOLOv5 model shared by every page, with an optional background warm-up.
+# With INFERENCE_WORKERS > 0 the shared model is a proxy for a pool of model processes instead.
+
+import os
+import pathlib
+import platform
+import threading
+import time
+
+import dotenv
+import numpy as np
+
+from engines import AQUAEYE_ENGINE, engine_weights, load_engine
+from inference_pool import INFERENCE_WORKERS, InferencePool, PooledModel
+
+dotenv.load_dotenv()
+YOLO_REPO = os.getenv('YOLO_REPO', './yolov5')
+YOLO_WEIGHTS = os.getenv('YOLO_WEIGHTS', 'best_250_with_yolov5s.pt')
+
+_model = None
+_pool = None
+_lock = threading.Lock()
+_warmup_thread = None
+load_stats = {}
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB (0 if it cannot be read on this platform)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if platform.system() == 'Darwin' else peak / 2**10
+    except ImportError:
+        return 0.0
+
+
+def _load():
+    # Temporary fix for loading checkpoints saved on Linux from Windows
+    if platform.system() == 'Windows':
+        temp = pathlib.PosixPath
+        pathlib.PosixPath = pathlib.WindowsPath
+    try:
+        return load_engine(AQUAEYE_ENGINE, YOLO_REPO, YOLO_WEIGHTS)
+    finally:
+        if platform.system() == 'Windows':
+            pathlib.PosixPath = temp
+
+
+def get_model():
+    """Return the shared YOLO model (or the worker pool standing in for it), loading it on first use."""
+    global _model, _pool
+    if _model is not None:
+        return _model
+    if INFERENCE_WORKERS > 0:
+        with _lock:
+            if _model is None:
+                _pool = InferencePool(INFERENCE_WORKERS)
+                _model = PooledModel(_pool)
+                print(f"Started {INFERENCE_WORKERS} inference worker processes ({AQUAEYE_ENGINE}).")
+        return _model
+    return get_local_model()
+
+
+def get_local_model():
+    """Load the YOLO model into this process (the server, or one pool worker)."""
+    global _model
+    if _model is not None:
+        return _model
+    with _lock:
+        if _model is None:
+            rss_before = current_rss_mb()
+            start = time.perf_counter()
+            model = _load()
+            load_stats['load_seconds'] = time.perf_counter() - start
+            load_stats['rss_delta_mb'] = current_rss_mb() - rss_before
+            load_stats['param_mb'] = sum(p.numel() * p.element_size() for p in model.parameters()) / 2**20
+            print(f"YOLO model ({AQUAEYE_ENGINE}) loaded in {load_stats['load_seconds']:.1f}s "
+                  f"({load_stats['param_mb']:.1f} MB weights, +{load_stats['rss_delta_mb']:.0f} MB RSS).")
+            _model = model
+    return _model
+
+
+def warm_up(background=True, size=640):
+    """Load the model and run one dummy inference so the first real request is not slow.
+
+    With background=True this returns immediately and the work happens on a daemon thread.
+    """
+    global _warmup_thread
+
+    def run():
+        model = get_model()
+        start = time.perf_counter()
+        model(np.zeros((size, size, 3), dtype=np.uint8), size=size)
+        load_stats['warmup_seconds'] = time.perf_counter() - start
+        print(f"YOLO warm-up inference took {load_stats['warmup_seconds']:.2f}s.")
+
+    if not background:
+        run()
+        return None
+    with _lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=run, name='yolo-warmup', daemon=True)
+            _warmup_thread.start()
+    return _warmup_thread
+
+
+def model_info():
+    """Load state, load time and memory use, for logs or a status page."""
+    info = {'loaded': _model is not None, 'engine': AQUAEYE_ENGINE, 'weights': engine_weights(AQUAEYE_ENGINE, YOLO_WEIGHTS),
+            **load_stats, 'rss_mb': current_rss_mb()}
+    if _pool is not None:
+        info['pool'] = _pool.health()
+    return info
+
+
+def pool_health():
+    """Inference pool health, or None while the model runs in this process."""
+    return _pool.health() if _pool is not None else None
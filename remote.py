@@ -0,0 +1,155 @@
+# remote.py
+# Resilience for the remote detectors: bounded retries with jittered backoff, and a circuit breaker
+# that skips a backend for a cool-down window after repeated failures instead of letting every frame
+# wait for it to time out.
+
+import os
+import random
+import threading
+import time
+
+from replay import ReplayMiss
+
+REMOTE_MAX_RETRIES = int(os.getenv('REMOTE_MAX_RETRIES', 2))
+REMOTE_BACKOFF_BASE = float(os.getenv('REMOTE_BACKOFF_BASE', 0.2))  # Seconds before the first retry
+REMOTE_BACKOFF_MAX = float(os.getenv('REMOTE_BACKOFF_MAX', 2.0))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', 3))
+BREAKER_COOLDOWN = float(os.getenv('BREAKER_COOLDOWN', 30))
+
+# Every ResilientClient registers here so the UI can show per-backend health
+_backends = {}
+
+
+class BackendUnavailable(RuntimeError):
+    """Raised without calling the backend while its circuit is open."""
+
+
+class CircuitBreaker:
+    """closed -> open after `failure_threshold` consecutive failures; after `cooldown` seconds one
+    trial call is let through (half-open), which either closes the circuit or re-opens it."""
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = 'half_open'
+                self._trial_in_flight = False
+            if self.state == 'half_open':
+                if self._trial_in_flight:
+                    return False
+                self._trial_in_flight = True
+                return True
+            return self.state == 'closed'
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == 'half_open' or self.consecutive_failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """Let another half-open trial through without recording a result (the call told us nothing)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def retry_in(self):
+        """Seconds until the next trial call is allowed (0 unless open)."""
+        with self._lock:
+            if self.state != 'open':
+                return 0.0
+            return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+
+class ResilientClient:
+    """Wraps an inference client (infer / run_workflow / configure) with retries and a circuit breaker."""
+
+    def __init__(self, client, name, max_retries=REMOTE_MAX_RETRIES, backoff_base=REMOTE_BACKOFF_BASE,
+                 backoff_max=REMOTE_BACKOFF_MAX, breaker=None, budget=None):
+        self.client = client
+        self.name = name
+        self.max_retries = max_retries
+        self.budget = budget  # Seconds from the first attempt after which no further retry is started
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.successes = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_error = None
+        self.last_latency = None
+        _backends[name] = self
+
+    def configure(self, configuration):
+        self.client.configure(configuration)
+        return self
+
+    def _call(self, fn):
+        if not self.breaker.allow():
+            self.skipped += 1
+            raise BackendUnavailable(f"{self.name} circuit open, retrying in {self.breaker.retry_in():.0f}s")
+
+        first_start = time.monotonic()
+        try:
+            for attempt in range(self.max_retries + 1):
+                start = time.monotonic()
+                try:
+                    response = fn()
+                except ReplayMiss:
+                    raise  # Offline mode miss: not the backend's fault, nothing to retry
+                except Exception as e:
+                    self.failures += 1
+                    self.last_error = str(e)
+                    # Full jitter: sleep a random time up to the exponential backoff
+                    backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                    out_of_budget = self.budget is not None and time.monotonic() + backoff - first_start >= self.budget
+                    if attempt == self.max_retries or out_of_budget:
+                        self.breaker.record_failure()
+                        raise
+                    time.sleep(backoff)
+                else:
+                    self.successes += 1
+                    self.last_latency = time.monotonic() - start
+                    self.breaker.record_success()
+                    return response
+        finally:
+            # ReplayMiss, or a BaseException, leaves without a recorded result: free the half-open slot
+            self.breaker.release_trial()
+
+    def infer(self, *args, **kwargs):
+        return self._call(lambda: self.client.infer(*args, **kwargs))
+
+    def run_workflow(self, *args, **kwargs):
+        return self._call(lambda: self.client.run_workflow(*args, **kwargs))
+
+    def health(self):
+        return {
+            'state': self.breaker.state,
+            'retry_in': self.breaker.retry_in(),
+            'consecutive_failures': self.breaker.consecutive_failures,
+            'successes': self.successes,
+            'failures': self.failures,
+            'skipped': self.skipped,
+            'last_error': self.last_error,
+            'last_latency': self.last_latency,
+        }
+
+
+def backend_health():
+    """Health of every registered remote backend, keyed by name."""
+    return {name: client.health() for name, client in _backends.items()}
@@ -0,0 +1,62 @@
+# render.py
+# One annotation renderer for every detection path (stills, processed videos, the live video page).
+# Boxes are drawn in place on the native BGR buffer that OpenCV decoded, and encoded from it directly,
+# so no path needs a colour conversion or an extra copy just to show results.
+
+import base64
+import functools
+import os
+
+import cv2
+
+# BGR colours per detection source
+SOURCE_COLORS = {
+    'yolo': (255, 0, 0),
+    'seascanner': (0, 100, 0),  # Dark Green
+    'neuralocean': (0, 0, 0)  # Black
+}
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FONT_SCALE = 0.4
+FONT_THICKNESS = 1
+JPEG_QUALITY = int(os.getenv('RENDER_JPEG_QUALITY', 95))  # OpenCV's own default
+
+
+@functools.lru_cache(maxsize=4096)
+def label_size(label):
+    """(width, height) of a label; classes x rounded confidences repeat constantly, so this is almost always a hit."""
+    return cv2.getTextSize(label, FONT, FONT_SCALE, FONT_THICKNESS)[0]
+
+
+def box_label(box):
+    label = f"{box['class']} {box['conf']:.2f}"
+    if 'track_id' in box:
+        label = f"#{box['track_id']} {label}"
+    return label
+
+
+def draw_detections(frame, boxes, colors=SOURCE_COLORS):
+    """Draw fused/tracked box dicts on a BGR frame in place and return the same frame."""
+    for box in boxes:
+        x1, y1, x2, y2 = map(int, box['box'])
+        label = box_label(box)
+        color = colors[box['source']]
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+
+        # Filled rectangle behind the label, then the label text
+        w, h = label_size(label)
+        cv2.rectangle(frame, (x1, y1 - h - 5), (x1 + w, y1), color, -1)
+        cv2.putText(frame, label, (x1, y1 - 5), FONT, FONT_SCALE, (255, 255, 255), FONT_THICKNESS)
+    return frame
+
+
+def encode_jpeg(frame, quality=JPEG_QUALITY):
+    """JPEG bytes of a BGR frame."""
+    ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return buffer.tobytes()
+
+
+def jpeg_data_uri(frame, quality=JPEG_QUALITY):
+    return f"data:image/jpeg;base64,{base64.b64encode(encode_jpeg(frame, quality)).decode('ascii')}"
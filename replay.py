@@ -0,0 +1,114 @@
+# replay.py
+# Record/replay layer for the Roboflow clients. Responses are stored on disk keyed by the image
+# content hash, model/workflow id and client configuration, so reprocessing footage we have already
+# analysed costs no network time or quota, and benchmark runs are repeatable.
+#
+# ROBOFLOW_REPLAY_MODE:
+#   off     - pass every call through (default)
+#   record  - always call the API and store the response
+#   replay  - serve stored responses, call (and store) only on a miss
+#   offline - serve stored responses, never touch the network (a miss raises ReplayMiss)
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from atomic import atomic_write
+
+REPLAY_MODES = ('off', 'record', 'replay', 'offline')
+REPLAY_MODE = os.getenv('ROBOFLOW_REPLAY_MODE', 'off')
+REPLAY_DIR = os.getenv('ROBOFLOW_REPLAY_DIR', os.path.join('.cache', 'roboflow'))
+
+
+class ReplayMiss(LookupError):
+    """Raised in offline mode when no recorded response exists for a request."""
+
+
+def image_digest(image_ref):
+    """Content hash of an image reference as the inference clients accept it (array, path or base64 string)."""
+    h = hashlib.sha256()
+    if isinstance(image_ref, np.ndarray):
+        h.update(repr(image_ref.shape).encode())
+        h.update(np.ascontiguousarray(image_ref).data)
+    elif isinstance(image_ref, str) and os.path.isfile(image_ref):
+        with open(image_ref, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+    elif isinstance(image_ref, bytes):
+        h.update(image_ref)
+    else:
+        h.update(str(image_ref).encode())
+    return h.hexdigest()
+
+
+class ReplayClient:
+    """Wraps an InferenceHTTPClient with the same infer / run_workflow / configure surface."""
+
+    def __init__(self, client, name, mode=REPLAY_MODE, store_dir=REPLAY_DIR):
+        if mode not in REPLAY_MODES:
+            raise ValueError(f"Unknown replay mode '{mode}', expected one of {', '.join(REPLAY_MODES)}")
+        self.client = client
+        self.name = name
+        self.mode = mode
+        self.store_dir = os.path.join(store_dir, name)
+        self.hits = 0
+        self.misses = 0
+        self.configuration = None  # Set once by configure(); part of every recording key
+        if mode != 'off':
+            os.makedirs(self.store_dir, exist_ok=True)
+
+    def configure(self, configuration):
+        self.configuration = configuration
+        self.client.configure(configuration)
+        return self
+
+    def _key(self, image_ref, request):
+        configuration = self.configuration
+        request = {**request, 'configuration': vars(configuration) if configuration is not None else None}
+        h = hashlib.sha256(image_digest(image_ref).encode())
+        h.update(json.dumps(request, sort_keys=True, default=str).encode())
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.store_dir, f"{key}.json")
+
+    def _call(self, key, call):
+        if self.mode == 'off':
+            return call()
+
+        path = self._path(key)
+        if self.mode in ('replay', 'offline') and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    response = json.load(f)
+                self.hits += 1
+                return response
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable {self.name} recording {key}: {e}")
+
+        self.misses += 1
+        if self.mode == 'offline':
+            raise ReplayMiss(f"No recorded {self.name} response for {key} (offline mode)")
+
+        response = call()
+        with atomic_write(path) as f:
+            json.dump(response, f)
+        return response
+
+    def infer(self, inference_input, model_id=None, **kwargs):
+        key = self._key(inference_input, {'call': 'infer', 'model_id': model_id, **kwargs})
+        return self._call(key, lambda: self.client.infer(inference_input, model_id=model_id, **kwargs))
+
+    def run_workflow(self, workspace_name=None, workflow_id=None, images=None, **kwargs):
+        images = images or {}
+        # Hash every image in the request, in a stable order
+        digest = ''.join(image_digest(images[name]) for name in sorted(images))
+        key = self._key(digest, {'call': 'run_workflow', 'workspace': workspace_name, 'workflow_id': workflow_id,
+                                 'images': sorted(images), **kwargs})
+        return self._call(key, lambda: self.client.run_workflow(
+            workspace_name=workspace_name, workflow_id=workflow_id, images=images, **kwargs))
+
+    def stats(self):
+        return {'mode': self.mode, 'hits': self.hits, 'misses': self.misses}
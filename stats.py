@@ -0,0 +1,135 @@
+# stats.py
+# Detection statistics shared by both pages: the label -> category index, and an incremental store that
+# folds each frame's new objects into cumulative totals and sliding time windows as they arrive, so the
+# dashboards read counts instead of rescanning what has been seen so far.
+
+import collections
+import os
+import threading
+import time
+
+CATEGORIES = {
+    'Animals': ['coral', 'crab', 'dolphin', 'fish', 'jellyfish', 'narwhal', 'octopus', 'sea-horse', 'sea-turtle', 'seal', 'shark', 'shrimp', 'star-fish', 'sting-ray', 'whale'],
+    'Industrial Waste': ['can', 'cellphone', 'electronics', 'gbottle', 'glove', 'metal', 'misc', 'net', 'rod', 'sunglasses', 'tire'],
+    'Plastic Waste': ['pbottle', 'plastic', 'pbag', 'trash_plastic'],
+    'Medical Waste': ['glove', 'syringe', 'bandage', 'mask'],
+    'Miscellaneous': ['sunglasses', 'rod', 'rare_item'],  # Rare or miscellaneous items
+}
+
+# A label counts towards every category it is listed in (glove is industrial and medical waste)
+LABEL_CATEGORIES = {}
+for _category, _labels in CATEGORIES.items():
+    for _label in _labels:
+        LABEL_CATEGORIES.setdefault(_label, []).append(_category)
+LABEL_CATEGORIES = {label: tuple(categories) for label, categories in LABEL_CATEGORIES.items()}
+
+STATS_WINDOWS = tuple(int(s) for s in os.getenv('STATS_WINDOWS', '10,60').split(','))  # Seconds
+STATS_BUCKET_SECONDS = float(os.getenv('STATS_BUCKET_SECONDS', 1.0))
+
+
+def is_debris(label):
+    return 'Animals' not in LABEL_CATEGORIES.get(label, ())
+
+
+def category_counts(class_counts):
+    """Per-category totals for a {label: count} dict."""
+    counts = dict.fromkeys(CATEGORIES, 0)
+    for label, count in class_counts.items():
+        for category in LABEL_CATEGORIES.get(label, ()):
+            counts[category] += count
+    return counts
+
+
+class RollingStats:
+    """Cumulative per-label and per-category totals plus per-category sums over sliding windows.
+
+    Counts are kept in time buckets of `bucket_seconds`. Every window keeps a running
+    sum and a pointer to its oldest bucket, so adding a frame and reading a window
+    both cost O(categories) however long the video runs; buckets older than the
+    largest window are dropped.
+    """
+
+    def __init__(self, windows=STATS_WINDOWS, bucket_seconds=STATS_BUCKET_SECONDS, clock=time.monotonic):
+        self.windows = tuple(sorted(windows))
+        self.bucket_seconds = bucket_seconds
+        self.clock = clock
+        self.label_totals = {}
+        self.category_totals = dict.fromkeys(CATEGORIES, 0)
+        self._buckets = collections.deque()  # [bucket index, {category: count}], oldest first
+        self._first_seq = 0  # Sequence number of self._buckets[0]
+        self._window_sums = {w: dict.fromkeys(CATEGORIES, 0) for w in self.windows}
+        self._window_tail = {w: 0 for w in self.windows}  # Sequence number of each window's oldest bucket
+        self._lock = threading.Lock()
+
+    def _bucket_index(self, t):
+        return int(t // self.bucket_seconds)
+
+    def _advance(self, now_index):
+        """Slide every window so it only covers buckets newer than `window` seconds before now."""
+        for w in self.windows:
+            oldest_allowed = now_index - int(w // self.bucket_seconds) + 1
+            sums = self._window_sums[w]
+            while self._window_tail[w] - self._first_seq < len(self._buckets):
+                index, counts = self._buckets[self._window_tail[w] - self._first_seq]
+                if index >= oldest_allowed:
+                    break
+                for category, count in counts.items():
+                    sums[category] -= count
+                self._window_tail[w] += 1
+        # The largest window has the oldest tail; nothing before it is needed any more
+        largest_tail = self._window_tail[self.windows[-1]] if self.windows else self._first_seq + len(self._buckets)
+        while self._first_seq < largest_tail:
+            self._buckets.popleft()
+            self._first_seq += 1
+
+    def add(self, class_counts, t=None):
+        """Fold one frame's new objects ({label: count}) into the totals and windows."""
+        index = self._bucket_index(self.clock() if t is None else t)
+        with self._lock:
+            self._advance(index)
+            if not class_counts:
+                return
+            if not self._buckets or self._buckets[-1][0] != index:
+                self._buckets.append([index, {}])
+            bucket = self._buckets[-1][1]
+            for label, count in class_counts.items():
+                self.label_totals[label] = self.label_totals.get(label, 0) + count
+                for category in LABEL_CATEGORIES.get(label, ()):
+                    self.category_totals[category] += count
+                    bucket[category] = bucket.get(category, 0) + count
+                    for sums in self._window_sums.values():
+                        sums[category] += count
+
+    def add_cumulative(self, class_counts, t=None):
+        """Fold the change since the last call in running per-label totals (e.g. a tracker's unique counts)."""
+        with self._lock:
+            new = {label: count - self.label_totals.get(label, 0) for label, count in class_counts.items()
+                   if count > self.label_totals.get(label, 0)}
+        self.add(new, t)
+
+    def window(self, seconds, t=None):
+        """Per-category counts over the last `seconds` (one of the configured windows)."""
+        if seconds not in self._window_sums:
+            raise ValueError(f"No {seconds}s window, configured windows are {self.windows}")
+        with self._lock:
+            self._advance(self._bucket_index(self.clock() if t is None else t))
+            return dict(self._window_sums[seconds])
+
+    def timeline(self, t=None):
+        """Bucket start times (seconds before now, negative) and per-category counts over the largest window."""
+        now_index = self._bucket_index(self.clock() if t is None else t)
+        with self._lock:
+            self._advance(now_index)
+            span = int(self.windows[-1] // self.bucket_seconds) if self.windows else 0
+            first_index = now_index - span + 1
+            series = {category: [0] * span for category in CATEGORIES}
+            for index, counts in self._buckets:
+                if first_index <= index <= now_index:
+                    for category, count in counts.items():
+                        series[category][index - first_index] += count
+        times = [(i - span + 1) * self.bucket_seconds for i in range(span)]
+        return times, series
+
+    def totals(self):
+        with self._lock:
+            return dict(self.label_totals), dict(self.category_totals)
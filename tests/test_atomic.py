@@ -0,0 +1,27 @@
+# tests/test_atomic.py
+
+import os
+
+import pytest
+
+from atomic import atomic_write
+
+
+def test_replaces_the_file_only_when_complete(tmp_path):
+    path = tmp_path / 'result.json'
+    path.write_text('old')
+    with atomic_write(str(path)) as f:
+        f.write('new')
+        assert path.read_text() == 'old'  # Readers still see the previous version
+    assert path.read_text() == 'new'
+
+
+def test_failed_write_leaves_the_old_file_and_no_temp_file(tmp_path):
+    path = tmp_path / 'result.json'
+    path.write_text('old')
+    with pytest.raises(RuntimeError):
+        with atomic_write(str(path)) as f:
+            f.write('partial')
+            raise RuntimeError("encoder failed")
+    assert path.read_text() == 'old'
+    assert os.listdir(tmp_path) == ['result.json']
@@ -0,0 +1,79 @@
+# tests/test_batch.py
+
+import concurrent.futures
+import json
+
+import pytest
+
+import batch
+from batch import JsonlSink, file_signature
+
+
+class InlineExecutor(concurrent.futures.ThreadPoolExecutor):
+    """Stands in for the process pool: no model to load in the workers."""
+
+    def __init__(self, max_workers=None, initializer=None, initargs=()):
+        super().__init__(max_workers=max_workers)
+
+
+@pytest.fixture
+def survey(tmp_path, monkeypatch):
+    root = tmp_path / 'survey'
+    (root / 'dive2').mkdir(parents=True)
+    for name in ('a.jpg', 'b.jpg', 'dive2/c.mp4', 'notes.txt'):
+        (root / name).write_bytes(b'x' * 10)
+
+    processed, failing = [], set()
+
+    def process_file(path):
+        processed.append(path)
+        size, mtime = file_signature(path)
+        record = {'path': path, 'bytes': size, 'mtime': mtime, 'status': 'ok', 'seconds': 0.0}
+        if path in failing:
+            record.update(status='error', error='decoder crashed')
+        elif path.endswith('.mp4'):
+            record.update(type='video', frames=3, class_counts={'fish': 2})
+        else:
+            record.update(type='image', frames=1, detections=[{'class': 'pbottle'}])
+        return record
+
+    monkeypatch.setattr(batch.concurrent.futures, 'ProcessPoolExecutor', InlineExecutor)
+    monkeypatch.setattr(batch, 'process_file', process_file)
+    return root, tmp_path / 'results.jsonl', processed, failing
+
+
+def test_resume_skips_files_already_processed(survey):
+    root, output, processed, failing = survey
+    failing.add(str(root / 'b.jpg'))
+    summary = batch.run(str(root), JsonlSink(str(output)), workers=2, options={})
+    assert summary['files'] == 3 and summary['failed'] == 1
+    assert summary['images'] == 1 and summary['videos'] == 1 and summary['detections'] == 3
+
+    processed.clear()
+    failing.clear()
+    batch.run(str(root), JsonlSink(str(output)), workers=2, options={})
+    assert processed == [str(root / 'b.jpg')]  # Only the failed file is retried
+
+    processed.clear()
+    (root / 'a.jpg').write_bytes(b'changed content')
+    batch.run(str(root), JsonlSink(str(output)), workers=2, options={})
+    assert processed == [str(root / 'a.jpg')]  # A file that changed since is redone
+
+    processed.clear()
+    assert batch.run(str(root), JsonlSink(str(output)), workers=2, options={}) == {}
+    assert processed == []
+
+
+def test_no_resume_processes_everything(survey):
+    root, output, processed, _ = survey
+    batch.run(str(root), JsonlSink(str(output)), workers=1, options={})
+    batch.run(str(root), JsonlSink(str(output)), workers=1, options={}, resume=False)
+    assert len(processed) == 6
+    with open(output) as f:
+        assert len([json.loads(line) for line in f]) == 6
+
+
+def test_interrupted_last_line_is_ignored(tmp_path):
+    output = tmp_path / 'results.jsonl'
+    output.write_text(json.dumps({'path': 'a.jpg', 'status': 'ok', 'bytes': 1, 'mtime': 2}) + '\n{"path": "b.j')
+    assert JsonlSink(str(output)).done() == {'a.jpg': (1, 2)}
@@ -0,0 +1,76 @@
+# tests/test_cache.py
+
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip('cv2')
+
+from cache import DetectionCache, content_key
+
+
+def result(value, shape=(8, 8, 3)):
+    image = np.full(shape, value, dtype=np.uint8)
+    return image, [{'box': [0, 0, 4, 4], 'class': 'bottle', 'conf': 0.9, 'source': 'yolo'}], {'yolo': 1}
+
+
+def test_content_key_depends_on_pixels_and_settings():
+    image = result(1)[0]
+    assert content_key(image, {'iou': 0.5}) == content_key(image.copy(), {'iou': 0.5})
+    assert content_key(image, {'iou': 0.5}) != content_key(image, {'iou': 0.6})
+    assert content_key(image, {'iou': 0.5}) != content_key(result(2)[0], {'iou': 0.5})
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = DetectionCache(max_entries=2)
+    cache.put('a', result(1))
+    cache.put('b', result(2))
+    cache.get('a')
+    cache.put('c', result(3))
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+
+
+def test_memory_tier_is_bounded_by_image_bytes():
+    cache = DetectionCache(max_entries=100, max_bytes=3 * 192)
+    for i in range(5):
+        cache.put(str(i), result(i))  # 8x8x3 = 192 bytes each
+    assert cache.stats()['entries'] == 3
+    assert cache.stats()['memory_bytes'] == 3 * 192
+    assert cache.get('0') is None and cache.get('4') is not None
+
+
+def test_disk_round_trip_is_pixel_identical(tmp_path):
+    value = result(7)
+    DetectionCache(cache_dir=str(tmp_path)).put('k', value)
+
+    fresh = DetectionCache(cache_dir=str(tmp_path))
+    image, boxes, sources = fresh.get('k')
+    assert np.array_equal(image, value[0])
+    assert boxes == value[1] and sources == value[2]
+    assert fresh.stats()['disk_hits'] == 1
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+
+def test_disk_tier_drops_least_recently_used_entries(tmp_path):
+    cache = DetectionCache(cache_dir=str(tmp_path))
+    for i, key in enumerate(['a', 'b', 'c']):
+        cache.put(key, result(i, shape=(64, 64, 3)))
+        for path in cache._paths(key):
+            os.utime(path, (1000 + i, 1000 + i))
+    entry_bytes = sum(os.path.getsize(path) for path in cache._paths('a'))
+
+    cache = DetectionCache(max_entries=1, cache_dir=str(tmp_path), disk_max_bytes=int(3.5 * entry_bytes))
+    cache.put('d', result(3, shape=(64, 64, 3)))  # Over the cap: trims to 90%, dropping the oldest entry
+    assert not any(os.path.exists(path) for path in cache._paths('a'))
+    assert all(os.path.exists(path) for key in 'bcd' for path in cache._paths(key))
+    assert cache.stats()['disk_evictions'] == 1
+
+
+def test_vetoed_results_are_returned_but_not_kept(tmp_path):
+    cache = DetectionCache(cache_dir=str(tmp_path))
+    value = cache.get_or_compute('k', lambda: result(1), cacheable=lambda value: False)
+    assert value[2] == {'yolo': 1}
+    assert cache.get('k') is None
+    assert os.listdir(tmp_path) == []
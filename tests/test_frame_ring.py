@@ -0,0 +1,57 @@
+# tests/test_frame_ring.py
+
+import numpy as np
+import pytest
+
+from frame_ring import FrameRing, RingFull
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing(slots=2, slot_bytes=4 * 4 * 3)
+    yield ring
+    ring.close()
+
+
+def test_attached_ring_sees_frames_written_by_the_owner(ring):
+    frame = np.arange(4 * 4 * 3, dtype=np.uint8).reshape(4, 4, 3)
+    slot, shape = ring.write(frame)
+    reader = FrameRing.attach(ring.name, ring.slots, ring.slot_bytes)
+    try:
+        np.testing.assert_array_equal(reader.frame(slot, shape), frame)
+    finally:
+        reader.close()
+    assert ring.bytes_written == frame.nbytes
+
+
+def test_slot_is_free_only_after_the_last_reference(ring):
+    slot = ring.acquire()
+    ring.retain(slot)  # e.g. a request in flight on a worker
+    ring.release(slot)  # The caller is done with the frame
+    ring.acquire()
+    with pytest.raises(RingFull):
+        ring.acquire(timeout=0)
+    ring.release(slot)  # The request finished
+    assert ring.acquire(timeout=0) == slot
+
+
+def test_double_release_is_an_error(ring):
+    slot = ring.acquire()
+    ring.release(slot)
+    with pytest.raises(ValueError):
+        ring.release(slot)
+
+
+def test_fits_checks_the_slot_size(ring):
+    assert ring.fits((4, 4, 3))
+    assert not ring.fits((4, 4, 4))
+
+
+def test_ring_is_not_created_when_shared_memory_is_too_small(tmp_path, monkeypatch):
+    monkeypatch.setattr('frame_ring.shm_free_bytes', lambda shm_dir: 64 * 2**20)
+    assert FrameRing.create_if_room(slots=16, slot_bytes=1920 * 1080 * 3) is None
+    ring = FrameRing.create_if_room(slots=2, slot_bytes=1920 * 1080 * 3)
+    try:
+        assert ring is not None and ring.slots == 2
+    finally:
+        ring.close()
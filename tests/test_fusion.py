@@ -0,0 +1,75 @@
+# tests/test_fusion.py
+# fuse_boxes(method='nms') must match the pairwise loop combine_results used before fusion.py,
+# including which of two equally confident boxes survives.
+
+import numpy as np
+import pytest
+
+from fusion import fuse_boxes, iou_matrix
+
+
+def iou(box1, box2):
+    """The scalar IoU model.py used before the vectorized version."""
+    x1, y1, x2, y2 = box1
+    x1_, y1_, x2_, y2_ = box2
+    xi1, yi1 = max(x1, x1_), max(y1, y1_)
+    xi2, yi2 = min(x2, x2_), min(y2, y2_)
+    inter_area = max(0, xi2 - xi1) * max(0, yi2 - yi1)
+    box1_area = (x2 - x1) * (y2 - y1)
+    box2_area = (x2_ - x1_) * (y2_ - y1_)
+    union_area = box1_area + box2_area - inter_area
+    return inter_area / union_area if union_area > 0 else 0
+
+
+def pairwise_nms(combined_boxes, iou_threshold=0.4):
+    """The original loop: stable sort by confidence, keep boxes that overlap no kept box."""
+    combined_boxes = sorted(combined_boxes, key=lambda x: x['conf'], reverse=True)
+    final_boxes = []
+    for box in combined_boxes:
+        if not any([iou(box['box'], existing_box['box']) > iou_threshold for existing_box in final_boxes]):
+            final_boxes.append(box)
+    return final_boxes
+
+
+def random_boxes(rng, n, tied):
+    boxes = []
+    for i in range(n):
+        x1, y1 = rng.uniform(0, 500, 2)
+        w, h = rng.uniform(5, 150, 2)
+        # Few distinct confidences, so many boxes tie
+        conf = float(rng.choice([0.5, 0.6, 0.7])) if tied else float(rng.uniform(0.3, 1.0))
+        boxes.append({'box': [x1, y1, x1 + w, y1 + h], 'conf': conf, 'class': f'c{i % 3}', 'source': f's{i % 2}'})
+    return boxes
+
+
+@pytest.mark.parametrize('tied', [False, True])
+@pytest.mark.parametrize('seed', range(20))
+def test_nms_matches_pairwise_loop(seed, tied):
+    rng = np.random.default_rng(seed)
+    boxes = random_boxes(rng, int(rng.integers(0, 60)), tied)
+    expected = pairwise_nms(boxes)
+    # Same dicts, in the same order: identity also pins which of two tied boxes was kept
+    assert [id(b) for b in fuse_boxes(boxes, method='nms', iou_threshold=0.4)] == [id(b) for b in expected]
+
+
+def test_tied_overlapping_boxes_keep_input_order():
+    first = {'box': [0, 0, 10, 10], 'conf': 0.5, 'class': 'can', 'source': 'yolo'}
+    second = {'box': [1, 1, 11, 11], 'conf': 0.5, 'class': 'net', 'source': 'seascanner'}
+    assert fuse_boxes([first, second]) == [first]
+    assert fuse_boxes([second, first]) == [second]
+
+
+def test_iou_matrix_matches_scalar_iou():
+    rng = np.random.default_rng(0)
+    a = [b['box'] for b in random_boxes(rng, 15, False)] + [[3, 3, 3, 3]]  # Plus a degenerate box
+    b = [b['box'] for b in random_boxes(rng, 10, False)] + [[3, 3, 3, 3]]
+    expected = np.array([[iou(x, y) for y in b] for x in a])
+    np.testing.assert_allclose(iou_matrix(a, b), expected)
+
+
+def test_class_aware_nms_only_suppresses_same_class():
+    can = {'box': [0, 0, 10, 10], 'conf': 0.9, 'class': 'can', 'source': 'yolo'}
+    net = {'box': [0, 0, 10, 10], 'conf': 0.8, 'class': 'net', 'source': 'yolo'}
+    can_dup = {'box': [1, 0, 11, 10], 'conf': 0.7, 'class': 'can', 'source': 'seascanner'}
+    assert fuse_boxes([can, net, can_dup], class_aware=True) == [can, net]
+    assert fuse_boxes([can, net, can_dup]) == [can]
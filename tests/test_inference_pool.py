@@ -0,0 +1,53 @@
+# tests/test_inference_pool.py
+
+import os
+import time
+
+import pytest
+
+import inference_pool
+from inference_pool import InferencePool, WorkerFailed
+
+
+def echo_worker(worker_id, requests, results, torch_threads, ring_spec, current):
+    """Stand-in for _worker_main without a model: 'hang' never finishes, anything else fails with the worker's pid."""
+    results.put(('ready', worker_id, os.getpid(), {0: 'bottle'}))
+    while True:
+        item = requests.get()
+        if item is None:
+            return
+        request_id, images, size = item
+        current.value = request_id
+        results.put(('start', worker_id, request_id, None))
+        if images == 'hang':
+            time.sleep(3600)
+        results.put(('error', worker_id, request_id, (f"served by {os.getpid()}", 0.0)))
+        current.value = -1
+
+
+class EchoPool(InferencePool):
+    worker_main = staticmethod(echo_worker)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(inference_pool.FrameRing, 'create_if_room', classmethod(lambda cls: None))
+    pool = EchoPool(workers=1, request_timeout=1.0, health_interval=0.1)
+    assert pool._ready.wait(30)  # Spawned interpreters can take a while to start
+    yield pool
+    pool.close()
+
+
+def test_hung_worker_is_restarted_and_its_request_failed(pool):
+    first_pid = pool.stats[0].pid
+    hung = pool._submit('hang', 640)
+    with pytest.raises(WorkerFailed, match='hung'):
+        hung.result(timeout=30)
+
+    # The replacement worker picks up new requests
+    with pytest.raises(RuntimeError, match='served by') as served:
+        pool._submit('ping', 640).result(timeout=30)
+    assert str(served.value) != f"served by {first_pid}"
+    health = pool.health()
+    assert health['per_worker'][0]['restarts'] == 1
+    assert health['alive'] == 1 and health['in_flight'] == 0
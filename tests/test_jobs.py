@@ -0,0 +1,67 @@
+# tests/test_jobs.py
+
+import os
+import time
+
+import pytest
+
+pytest.importorskip('cv2')
+
+from jobs import BackgroundJobRunner
+
+KEY = 'ab' * 32
+
+
+def wait_for(job, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while job.status in ('queued', 'running'):
+        assert time.monotonic() < deadline, "job did not finish"
+        time.sleep(0.01)
+    return job
+
+
+def video_job(job, output_path, degraded_frames):
+    with open(output_path, 'wb') as f:
+        f.write(b'mp4')
+    return {'output_path': output_path, 'degraded_frames': degraded_frames}
+
+
+@pytest.fixture
+def runner(tmp_path):
+    return BackgroundJobRunner(max_workers=1, output_dir=str(tmp_path),
+                               cacheable=lambda result: not result.get('degraded_frames'))
+
+
+def test_degraded_result_is_not_saved_and_reruns_on_resubmit(runner):
+    output_path = runner.output_path(KEY, '.mp4')
+    job, started = runner.submit(KEY, video_job, output_path, 12)
+    assert started
+    assert wait_for(job).status == 'done'
+    assert job.result['degraded_frames'] == 12
+    assert not job.saved
+    assert not os.path.exists(runner.output_path(KEY, '.json'))
+
+    job, started = runner.submit(KEY, video_job, output_path, 0)
+    assert started  # The degraded job is not reused
+    assert wait_for(job).saved
+
+
+def test_clean_result_is_saved_and_reused(runner, tmp_path):
+    output_path = runner.output_path(KEY, '.mp4')
+    job, _ = runner.submit(KEY, video_job, output_path, 0)
+    assert wait_for(job).saved
+    assert runner.submit(KEY, video_job, output_path, 0) == (job, False)
+
+    restarted = BackgroundJobRunner(max_workers=1, output_dir=str(tmp_path))
+    loaded = restarted.get(KEY)
+    assert loaded.status == 'done' and loaded.result['degraded_frames'] == 0
+
+
+def test_failed_job_reports_the_error_and_can_be_resubmitted(runner):
+    def broken(job):
+        raise RuntimeError("decoder crashed")
+
+    job, _ = runner.submit(KEY, broken)
+    assert wait_for(job).status == 'failed'
+    assert job.error == "decoder crashed"
+    assert runner.submit(KEY, video_job, runner.output_path(KEY, '.mp4'), 0)[1]
@@ -0,0 +1,48 @@
+# tests/test_motion.py
+
+import numpy as np
+import pytest
+
+pytest.importorskip('cv2')
+
+from motion import MotionGate
+
+
+def frame(value):
+    return np.full((72, 128, 3), value, dtype=np.uint8)
+
+
+def test_static_scene_is_inferred_every_max_stride_frames():
+    gate = MotionGate(min_stride=1, max_stride=3, threshold=6.0)
+    assert [gate.should_infer(frame(100)) for _ in range(7)] == [True, False, False, True, False, False, True]
+    assert gate.stats() == {'frames': 7, 'inference_calls': 3, 'inference_saved': 4}
+
+
+def test_change_above_the_threshold_triggers_inference():
+    gate = MotionGate(min_stride=1, max_stride=15, threshold=6.0)
+    assert gate.should_infer(frame(100))
+    assert not gate.should_infer(frame(104))  # 4 grey levels: below the threshold
+    assert gate.should_infer(frame(110))
+    assert gate.last_score == pytest.approx(10.0)
+
+
+def test_drift_is_measured_against_the_last_inferred_frame():
+    gate = MotionGate(min_stride=1, max_stride=15, threshold=6.0)
+    gate.should_infer(frame(100))
+    assert [gate.should_infer(frame(100 + 3 * i)) for i in range(1, 4)] == [False, False, True]
+
+
+def test_min_stride_holds_off_inference_after_a_change():
+    gate = MotionGate(min_stride=2, max_stride=15, threshold=6.0)
+    assert gate.should_infer(frame(0))
+    assert not gate.should_infer(frame(200))  # Changed, but only one frame since the last inference
+    assert gate.should_infer(frame(200))
+
+
+def test_histogram_method_and_unknown_methods():
+    gate = MotionGate(min_stride=1, max_stride=15, threshold=0.1, method='hist')
+    assert gate.should_infer(frame(20))
+    assert not gate.should_infer(frame(20))
+    assert gate.should_infer(frame(230))
+    with pytest.raises(ValueError):
+        MotionGate(method='optical-flow')
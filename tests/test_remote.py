@@ -0,0 +1,126 @@
+# tests/test_remote.py
+
+import pytest
+
+import remote
+from remote import BackendUnavailable, CircuitBreaker, ResilientClient
+from replay import ReplayMiss
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(remote.time, 'monotonic', clock)
+    monkeypatch.setattr(remote.time, 'sleep', lambda seconds: None)
+    return clock
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=30)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == 'closed'
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+    assert breaker.retry_in() == 30
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+
+
+def test_half_open_lets_one_trial_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
+    assert not breaker.allow()  # Only one trial call at a time
+
+
+def test_half_open_trial_closes_or_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=30)
+    breaker.record_failure()
+    clock.now += 30
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert breaker.retry_in() == 30
+
+    clock.now += 30
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.allow()
+
+
+class FlakyClient:
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def infer(self, image_ref, model_id=None):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("backend down")
+        return {'predictions': []}
+
+
+def test_resilient_client_retries_then_succeeds(clock):
+    client = ResilientClient(FlakyClient(failures=2), 'test-retry', max_retries=2)
+    assert client.infer('image') == {'predictions': []}
+    assert client.client.calls == 3
+    assert client.breaker.state == 'closed'
+
+
+def test_resilient_client_skips_backend_while_circuit_is_open(clock):
+    client = ResilientClient(FlakyClient(failures=100), 'test-open', max_retries=0,
+                             breaker=CircuitBreaker(failure_threshold=1, cooldown=30))
+    with pytest.raises(ConnectionError):
+        client.infer('image')
+    with pytest.raises(BackendUnavailable):
+        client.infer('image')
+    assert client.client.calls == 1
+    assert client.health()['skipped'] == 1
+
+
+def test_retries_stop_at_the_budget(clock):
+    class SlowFailingClient(FlakyClient):
+        def infer(self, image_ref, model_id=None):
+            clock.now += 3  # Each attempt takes 3s before failing
+            return super().infer(image_ref, model_id)
+
+    client = ResilientClient(SlowFailingClient(failures=100), 'test-budget', max_retries=10, budget=8)
+    with pytest.raises(ConnectionError):
+        client.infer('image')
+    assert client.client.calls == 3  # A 4th attempt would start past the 8s deadline
+    assert client.breaker.consecutive_failures == 1
+
+
+def test_replay_miss_during_half_open_trial_frees_the_trial(clock):
+    class MissingClient:
+        def infer(self, image_ref, model_id=None):
+            raise ReplayMiss("not recorded")
+
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=30)
+    breaker.record_failure()
+    clock.now += 30
+    client = ResilientClient(MissingClient(), 'test-miss', breaker=breaker)
+    with pytest.raises(ReplayMiss):
+        client.infer('image')
+    assert breaker.state == 'half_open'
+    assert breaker.allow()  # The next call gets the trial instead of being skipped forever
@@ -0,0 +1,60 @@
+# tests/test_render.py
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+
+import render
+from render import box_label, draw_detections, encode_jpeg, jpeg_data_uri
+
+BOXES = [
+    {'box': [10, 30, 90, 100], 'class': 'pbottle', 'conf': 0.876, 'source': 'yolo'},
+    {'box': [50.6, 60.2, 150.9, 140.4], 'class': 'fish', 'conf': 0.51, 'source': 'seascanner'},
+    {'box': [120, 20, 190, 70], 'class': 'net', 'conf': 0.4, 'source': 'neuralocean', 'track_id': 7},
+]
+
+
+def frame():
+    return np.random.default_rng(0).integers(0, 255, (160, 200, 3), dtype=np.uint8)
+
+
+def previous_renderer(image, boxes):
+    """The drawing block process_image and process_video each had before render.py."""
+    for box in boxes:
+        x1, y1, x2, y2 = map(int, box['box'])
+        label = box_label(box)
+        color = render.SOURCE_COLORS[box['source']]
+        (w, h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.4, 1)
+        cv2.rectangle(image, (x1, y1), (x2, y2), color, 2)
+        cv2.rectangle(image, (x1, y1 - h - 5), (x1 + w, y1), color, -1)
+        cv2.putText(image, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
+    return image
+
+
+def test_pixels_match_the_previous_renderer():
+    expected = previous_renderer(frame(), BOXES)
+    image = frame()
+    assert draw_detections(image, BOXES) is image  # Drawn in place, no copy
+    assert np.array_equal(image, expected)
+
+
+def test_tracked_boxes_are_labelled_with_their_id():
+    assert box_label(BOXES[0]) == 'pbottle 0.88'
+    assert box_label(BOXES[2]) == '#7 net 0.40'
+
+
+def test_label_metrics_are_cached():
+    render.label_size.cache_clear()
+    for _ in range(3):
+        draw_detections(frame(), BOXES)
+    info = render.label_size.cache_info()
+    assert info.misses == len(BOXES) and info.hits == 2 * len(BOXES)
+
+
+def test_jpeg_encoding_round_trips():
+    image = draw_detections(frame(), BOXES)
+    decoded = cv2.imdecode(np.frombuffer(encode_jpeg(image, quality=100), dtype=np.uint8), cv2.IMREAD_COLOR)
+    assert decoded.shape == image.shape
+    assert np.abs(decoded.astype(int) - image).mean() < 3
+    assert jpeg_data_uri(image).startswith('data:image/jpeg;base64,/9j/')
@@ -0,0 +1,82 @@
+# tests/test_replay.py
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from replay import ReplayClient, ReplayMiss, image_digest
+
+
+class CountingClient:
+    def __init__(self):
+        self.calls = 0
+        self.configuration = None
+
+    def configure(self, configuration):
+        self.configuration = configuration
+
+    def infer(self, image_ref, model_id=None, **kwargs):
+        self.calls += 1
+        return {'predictions': [{'class': 'bottle', 'call': self.calls}], 'model_id': model_id}
+
+    def run_workflow(self, workspace_name=None, workflow_id=None, images=None, **kwargs):
+        self.calls += 1
+        return [{'workflow_id': workflow_id, 'call': self.calls}]
+
+
+def image(value=1):
+    return np.full((4, 4, 3), value, dtype=np.uint8)
+
+
+def test_recorded_responses_are_replayed_by_content(tmp_path):
+    recorder = ReplayClient(CountingClient(), 'seascanner', mode='record', store_dir=str(tmp_path))
+    recorded = recorder.infer(image(), model_id='seascanner/1')
+
+    replayer = ReplayClient(CountingClient(), 'seascanner', mode='replay', store_dir=str(tmp_path))
+    assert replayer.infer(image().copy(), model_id='seascanner/1') == recorded  # Same pixels, new array
+    assert replayer.client.calls == 0
+    replayer.infer(image(), model_id='seascanner/2')  # Different model: a miss, recorded for next time
+    replayer.infer(image(), model_id='seascanner/2')
+    assert replayer.client.calls == 1
+    assert replayer.stats() == {'mode': 'replay', 'hits': 2, 'misses': 1}
+
+
+def test_offline_miss_raises_without_calling_the_backend(tmp_path):
+    client = ReplayClient(CountingClient(), 'neuralocean', mode='offline', store_dir=str(tmp_path))
+    with pytest.raises(ReplayMiss):
+        client.run_workflow(workspace_name='ws', workflow_id='wf', images={'image': image()})
+    assert client.client.calls == 0
+
+
+def test_configuration_and_workflow_inputs_are_part_of_the_key(tmp_path):
+    client = ReplayClient(CountingClient(), 'neuralocean', mode='replay', store_dir=str(tmp_path))
+    client.configure(SimpleNamespace(confidence_threshold=0.5))
+    client.run_workflow(workspace_name='ws', workflow_id='wf', images={'image': image()})
+    client.run_workflow(workspace_name='ws', workflow_id='wf', images={'image': image(2)})
+    client.configure(SimpleNamespace(confidence_threshold=0.3))
+    client.run_workflow(workspace_name='ws', workflow_id='wf', images={'image': image()})
+    assert client.client.calls == 3
+    assert client.client.configuration.confidence_threshold == 0.3
+
+
+def test_image_digest_hashes_file_contents(tmp_path):
+    first, second = tmp_path / 'a.jpg', tmp_path / 'b.jpg'
+    first.write_bytes(b'jpeg bytes')
+    second.write_bytes(b'jpeg bytes')
+    assert image_digest(str(first)) == image_digest(str(second)) == image_digest(b'jpeg bytes')
+    assert image_digest(image(1)) != image_digest(image(1)[:2])  # Shape is part of the digest
+
+
+def test_unreadable_recording_is_ignored(tmp_path):
+    client = ReplayClient(CountingClient(), 'seascanner', mode='replay', store_dir=str(tmp_path))
+    client.infer(image())
+    key = client._key(image(), {'call': 'infer', 'model_id': None})
+    with open(client._path(key), 'w') as f:
+        f.write('{"trunc')
+    assert client.infer(image())['predictions'][0]['call'] == 2
+
+
+def test_unknown_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ReplayClient(CountingClient(), 'seascanner', mode='sometimes', store_dir=str(tmp_path))
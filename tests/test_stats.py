@@ -0,0 +1,76 @@
+# tests/test_stats.py
+
+import random
+
+import pytest
+
+from stats import CATEGORIES, RollingStats, category_counts
+
+
+def brute_force_window(events, seconds, now, bucket_seconds):
+    """Per-category counts of every event in a bucket newer than `seconds` before now."""
+    now_index = int(now // bucket_seconds)
+    oldest = now_index - int(seconds // bucket_seconds) + 1
+    counts = dict.fromkeys(CATEGORIES, 0)
+    for t, class_counts in events:
+        if int(t // bucket_seconds) >= oldest:
+            for category, count in category_counts(class_counts).items():
+                counts[category] += count
+    return counts
+
+
+def test_glove_counts_towards_both_of_its_categories():
+    stats = RollingStats(windows=(10,))
+    stats.add({'glove': 2}, t=0)
+    _, categories = stats.totals()
+    assert categories['Industrial Waste'] == 2
+    assert categories['Medical Waste'] == 2
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_windows_match_a_full_rescan(seed):
+    rng = random.Random(seed)
+    stats = RollingStats(windows=(5, 20), bucket_seconds=1.0)
+    events = []
+    t = 0.0
+    for _ in range(300):
+        t += rng.choice([0.1, 0.4, 1.0, 3.0, 12.0])  # Including gaps longer than the small window
+        if rng.random() < 0.7:
+            class_counts = {rng.choice(['can', 'fish', 'pbag', 'glove', 'syringe']): rng.randint(1, 3)}
+            stats.add(class_counts, t=t)
+            events.append((t, class_counts))
+        else:
+            stats.add({}, t=t)  # Frames with no new objects still slide the windows
+        for seconds in (5, 20):
+            assert stats.window(seconds, t=t) == brute_force_window(events, seconds, t, 1.0)
+
+
+def test_old_buckets_are_dropped():
+    stats = RollingStats(windows=(5, 10), bucket_seconds=1.0)
+    for t in range(1000):
+        stats.add({'can': 1}, t=t)
+    assert len(stats._buckets) <= 10
+    assert stats.totals()[0] == {'can': 1000}
+
+
+def test_add_cumulative_only_adds_the_increase():
+    stats = RollingStats(windows=(10,))
+    stats.add_cumulative({'can': 2}, t=0)
+    stats.add_cumulative({'can': 2, 'fish': 1}, t=1)
+    stats.add_cumulative({'can': 5, 'fish': 1}, t=2)
+    assert stats.totals()[0] == {'can': 5, 'fish': 1}
+    assert stats.window(10, t=2)['Industrial Waste'] == 5
+
+
+def test_timeline_covers_the_largest_window():
+    stats = RollingStats(windows=(3, 6), bucket_seconds=1.0)
+    stats.add({'can': 1}, t=0.5)
+    stats.add({'can': 2}, t=4.5)
+    times, series = stats.timeline(t=5.5)
+    assert times == [-5.0, -4.0, -3.0, -2.0, -1.0, 0.0]
+    assert series['Industrial Waste'] == [1, 0, 0, 0, 2, 0]
+
+
+def test_unknown_window_is_rejected():
+    with pytest.raises(ValueError):
+        RollingStats(windows=(10,)).window(30)
@@ -0,0 +1,80 @@
+# tests/test_tiling.py
+
+import numpy as np
+import pytest
+
+pytest.importorskip('cv2')
+
+from tiling import detect_tiled, make_tiles, tile_count, tile_origins
+
+
+@pytest.mark.parametrize('length', [640, 641, 1000, 1080, 1920, 3840])
+def test_tile_origins_cover_the_axis_with_overlap(length):
+    origins = tile_origins(length, 640, 0.2)
+    assert origins[0] == 0
+    assert origins[-1] + 640 == length  # The last tile ends on the edge
+    for previous, current in zip(origins, origins[1:]):
+        assert 0 < current - previous <= 512  # Neighbours overlap by at least 20%
+
+
+def test_small_axis_is_a_single_tile():
+    assert tile_origins(480, 640, 0.2) == [0]
+    image = np.zeros((480, 1000, 3), dtype=np.uint8)
+    tiles = make_tiles(image, 640, 0.2)
+    assert len(tiles) == tile_count(image, 640, 0.2) == 2
+    assert all(crop.base is image for _, _, crop in tiles)  # Views, not copies
+
+
+class FakeTensor:
+    def __init__(self, array):
+        self.array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+
+class FakeResult:
+    def __init__(self, boxes):
+        self.xyxy = [FakeTensor(boxes)]
+
+
+class BrightSpotModel:
+    """Reports one box (x1, y1, x2, y2, conf, cls) around the non-zero pixels of each crop."""
+    names = {0: 'bottle'}
+
+    def __init__(self):
+        self.crops = 0
+
+    def detect_bgr(self, frames, size=640, slots=None):
+        self.crops += len(frames)
+        results = []
+        for frame in frames:
+            ys, xs = np.nonzero(frame[..., 0])
+            boxes = np.zeros((0, 6), dtype=np.float32)
+            if len(xs):
+                boxes = np.array([[xs.min(), ys.min(), xs.max() + 1, ys.max() + 1, 0.9, 0]], dtype=np.float32)
+            results.append(FakeResult(boxes))
+        return np.array(results, dtype=object)
+
+
+def test_object_seen_by_overlapping_tiles_is_merged_in_image_coordinates():
+    image = np.zeros((1000, 1000, 3), dtype=np.uint8)
+    image[400:500, 420:480] = 255  # Inside the overlap of all four tiles
+    model = BrightSpotModel()
+    detections = detect_tiled(model, image, tile_size=640, overlap=0.2, batch_size=3, workers=2)
+    assert model.crops == 4 + 1  # Four tiles plus the full image
+    assert detections.timings['tiles'] == 4
+    np.testing.assert_allclose(detections.xyxy[0], [[420, 400, 480, 500, 0.9, 0]])
+    assert detections.names == {0: 'bottle'}
+
+
+def test_separate_objects_in_different_tiles_are_kept():
+    image = np.zeros((1000, 1000, 3), dtype=np.uint8)
+    image[10:30, 10:30] = 255
+    image[900:950, 900:990] = 255
+    detections = detect_tiled(BrightSpotModel(), image, tile_size=640, overlap=0.2, include_full=False)
+    boxes = sorted(detections.xyxy[0][:, :4].tolist())
+    assert boxes == [[10, 10, 30, 30], [900, 900, 990, 950]]
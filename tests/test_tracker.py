@@ -0,0 +1,68 @@
+# tests/test_tracker.py
+
+from tracker import Tracker
+
+
+def det(box, cls='can', conf=0.9):
+    return {'box': list(box), 'conf': conf, 'class': cls, 'source': 'yolo'}
+
+
+def moving(x, cls='can'):
+    return det([x, 100, x + 50, 150], cls)
+
+
+def test_object_moving_across_frames_keeps_one_id_and_counts_once():
+    tracker = Tracker(min_hits=2)
+    ids = set()
+    for frame in range(10):
+        for box in tracker.step([moving(10 + 5 * frame)]):
+            ids.add(box['track_id'])
+    assert len(ids) == 1
+    assert tracker.unique_counts() == {'can': 1}
+
+
+def test_object_is_only_counted_once_confirmed():
+    tracker = Tracker(min_hits=3)
+    tracker.step([moving(10)])
+    tracker.step([moving(12)])
+    assert tracker.unique_counts() == {}
+    tracker.step([moving(14)])
+    assert tracker.unique_counts() == {'can': 1}
+
+
+def test_two_objects_are_associated_with_their_own_tracks():
+    tracker = Tracker(min_hits=1)
+    first = tracker.step([moving(0, 'can'), moving(300, 'net')])
+    ids = {b['class']: b['track_id'] for b in first}
+    # Same objects, slightly moved and listed in the other order
+    second = tracker.step([moving(305, 'net'), moving(4, 'can')])
+    assert {b['class']: b['track_id'] for b in second} == ids
+    assert tracker.unique_counts() == {'can': 1, 'net': 1}
+
+
+def test_one_detection_updates_at_most_one_track():
+    tracker = Tracker(min_hits=1)
+    tracker.step([moving(0), moving(8)])  # Two heavily overlapping objects
+    tracker.step([moving(4)])
+    assert len(tracker.tracks) == 2
+    assert sum(t.time_since_update == 0 for t in tracker.tracks) == 1
+
+
+def test_skipped_frames_draw_predicted_boxes_for_confirmed_tracks():
+    tracker = Tracker(min_hits=2, max_age=10)
+    for frame in range(4):
+        tracker.step([moving(10 * frame)])
+    predicted = tracker.step(None)
+    assert len(predicted) == 1
+    # Constant velocity: the prediction has moved on past the last detection
+    assert predicted[0]['box'][0] > 30
+
+
+def test_tracks_expire_after_max_age_and_return_as_new_objects():
+    tracker = Tracker(min_hits=1, max_age=2)
+    tracker.step([moving(10)])
+    for _ in range(3):
+        tracker.step([])
+    assert tracker.tracks == []
+    tracker.step([moving(10)])
+    assert tracker.unique_counts() == {'can': 2}
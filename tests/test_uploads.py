@@ -0,0 +1,128 @@
+# tests/test_uploads.py
+
+import hashlib
+import io
+import os
+
+import pytest
+from flask import Flask
+
+from uploads import UploadGone, UploadStore, register_routes
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadStore(str(tmp_path))
+
+
+@pytest.fixture
+def client(store):
+    server = Flask(__name__)
+    register_routes(server, store)
+    return server.test_client()
+
+
+def test_chunks_must_arrive_at_the_current_offset(store):
+    upload_id = store.create('clip.mp4', 10)['upload_id']
+    assert store.append(upload_id, 0, io.BytesIO(b'abcd')) == 4
+    assert store.append(upload_id, 0, io.BytesIO(b'abcd')) is None  # Replayed chunk
+    assert store.append(upload_id, 8, io.BytesIO(b'ij')) is None  # Gap
+    assert store.append(upload_id, 4, io.BytesIO(b'efghij')) == 10
+    meta = store.complete(upload_id)
+    assert meta['size'] == 10
+    assert meta['sha256'] == hashlib.sha256(b'abcdefghij').hexdigest()
+    with open(store.completed_path(upload_id), 'rb') as f:
+        assert f.read() == b'abcdefghij'
+
+
+def test_hash_is_rebuilt_from_disk_after_a_restart(store):
+    upload_id = store.create('clip.mp4', None)['upload_id']
+    store.append(upload_id, 0, io.BytesIO(b'first half '))
+    restarted = UploadStore(store.upload_dir)
+    restarted.append(upload_id, 11, io.BytesIO(b'second half'))
+    assert restarted.complete(upload_id)['sha256'] == hashlib.sha256(b'first half second half').hexdigest()
+
+
+def test_completed_upload_rejects_more_chunks(store):
+    upload_id = store.create('photo.png', 3)['upload_id']
+    store.append(upload_id, 0, io.BytesIO(b'png'))
+    store.complete(upload_id)
+    with pytest.raises(ValueError):
+        store.append(upload_id, 3, io.BytesIO(b'more'))
+
+
+def test_unsupported_type_and_bad_ids_are_rejected(store):
+    with pytest.raises(ValueError):
+        store.create('script.sh', 10)
+    assert store.meta('../../etc/passwd') is None
+    assert store.completed_path('0' * 31) is None
+
+
+def test_take_moves_the_file_out_of_the_store(store):
+    upload_id = store.create('clip.mp4', 3)['upload_id']
+    store.append(upload_id, 0, io.BytesIO(b'mp4'))
+    store.complete(upload_id)
+    owned = store.take(upload_id)
+    try:
+        with open(owned, 'rb') as f:
+            assert f.read() == b'mp4'
+        assert store.meta(upload_id) is None
+        assert store.take(upload_id) is None
+    finally:
+        os.remove(owned)
+
+
+def test_stale_uploads_are_swept(store):
+    upload_id = store.create('clip.mp4', None)['upload_id']
+    for path in (store.path(upload_id), os.path.join(store.upload_dir, f"{upload_id}.json")):
+        os.utime(path, (0, 0))
+    store.evict_stale(max_age=60)
+    assert store.meta(upload_id) is None
+    assert os.listdir(store.upload_dir) == []
+
+
+def test_routes_resume_after_an_offset_mismatch(client):
+    upload_id = client.post('/uploads', json={'filename': 'clip.mp4', 'size': 6}).get_json()['upload_id']
+    assert client.put(f'/uploads/{upload_id}?offset=0', data=b'abc').get_json() == {'received': 3}
+    response = client.put(f'/uploads/{upload_id}?offset=0', data=b'abc')
+    assert response.status_code == 409
+    assert response.get_json()['received'] == 3
+    assert client.get(f'/uploads/{upload_id}').get_json() == {'received': 3, 'complete': False}
+    client.put(f'/uploads/{upload_id}?offset=3', data=b'def')
+    done = client.post(f'/uploads/{upload_id}/complete').get_json()
+    assert done['size'] == 6
+    assert done['sha256'] == hashlib.sha256(b'abcdef').hexdigest()
+
+
+def test_routes_validate_requests(client):
+    assert client.post('/uploads', json={'filename': 'notes.txt', 'size': 1}).status_code == 400
+    assert client.get(f"/uploads/{'f' * 32}").status_code == 404
+    upload_id = client.post('/uploads', json={'filename': 'clip.mp4', 'size': 1}).get_json()['upload_id']
+    assert client.put(f'/uploads/{upload_id}', data=b'x').status_code == 400
+
+
+def test_oversized_chunks_are_refused_without_moving_the_resume_point(store):
+    upload_id = store.create('clip.mp4', 6)['upload_id']
+    store.append(upload_id, 0, io.BytesIO(b'abc'))
+    with pytest.raises(ValueError):
+        store.append(upload_id, 3, io.BytesIO(b'defg'), length=4)  # Refused from Content-Length alone
+    with pytest.raises(ValueError):
+        store.append(upload_id, 3, io.BytesIO(b'defg'))  # Length unknown: rolled back once it overruns
+    assert store.received(upload_id) == 3
+    store.append(upload_id, 3, io.BytesIO(b'def'))
+    assert store.complete(upload_id)['sha256'] == hashlib.sha256(b'abcdef').hexdigest()
+
+
+def test_removed_upload_raises_upload_gone(store):
+    upload_id = store.create('clip.mp4', None)['upload_id']
+    store.remove(upload_id)
+    with pytest.raises(UploadGone):
+        store.append(upload_id, 0, io.BytesIO(b'abc'))
+    with pytest.raises(UploadGone):
+        store.complete(upload_id)
+
+
+def test_routes_reject_a_non_numeric_size(client):
+    assert client.post('/uploads', json={'filename': 'clip.mp4', 'size': 'big'}).status_code == 400
+    assert client.post('/uploads', json={'filename': 'clip.mp4', 'size': -1}).status_code == 400
+    assert client.post('/uploads', json={'filename': 'clip.mp4', 'size': '10'}).status_code == 200
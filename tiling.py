@@ -0,0 +1,101 @@
+# tiling.py
+# Sliced inference for high-resolution survey stills: run YOLO on overlapping tiles at native
+# resolution so small debris is not lost to letterboxing, then merge the tiles back together.
+
+import concurrent.futures
+import os
+import time
+
+import numpy as np
+
+from batching import detect_batch, batched
+from fusion import nms
+
+# Opt-in: a 1080p still becomes 9 YOLO passes and a 4K still 33
+TILED_INFERENCE = os.getenv('TILED_INFERENCE', '0') == '1'
+TILE_MIN_SIDE = int(os.getenv('TILE_MIN_SIDE', 1920))  # Only tile images whose longer side is at least this
+TILE_SIZE = int(os.getenv('TILE_SIZE', 640))
+TILE_OVERLAP = float(os.getenv('TILE_OVERLAP', 0.2))
+TILE_BATCH_SIZE = int(os.getenv('TILE_BATCH_SIZE', 8))
+TILE_WORKERS = int(os.getenv('TILE_WORKERS', 2))
+TILE_IOU_THRESHOLD = float(os.getenv('TILE_IOU_THRESHOLD', 0.5))
+
+
+class TiledDetections:
+    """Merged tile detections, shaped like a single-image YOLOv5 result (xyxy[0] rows of x1, y1, x2, y2, conf, cls)
+    so model.combine_results can consume it unchanged."""
+
+    def __init__(self, boxes, names, timings):
+        self.xyxy = [boxes]
+        self.names = names
+        self.timings = timings
+
+
+def tile_origins(length, tile_size, overlap):
+    """Start offsets along one axis so tiles overlap by `overlap` and the last tile ends on the edge."""
+    if length <= tile_size:
+        return [0]
+    stride = max(1, int(tile_size * (1 - overlap)))
+    origins = list(range(0, length - tile_size, stride))
+    origins.append(length - tile_size)
+    return origins
+
+
+def make_tiles(image, tile_size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """Overlapping (x0, y0, crop) tiles covering the whole image. Crops are views, not copies."""
+    h, w = image.shape[:2]
+    return [(x0, y0, image[y0:y0 + tile_size, x0:x0 + tile_size])
+            for y0 in tile_origins(h, tile_size, overlap)
+            for x0 in tile_origins(w, tile_size, overlap)]
+
+
+def tile_count(image, tile_size=TILE_SIZE, overlap=TILE_OVERLAP):
+    h, w = image.shape[:2]
+    return len(tile_origins(h, tile_size, overlap)) * len(tile_origins(w, tile_size, overlap))
+
+
+def should_tile(image, min_side=TILE_MIN_SIDE):
+    return TILED_INFERENCE and max(image.shape[:2]) >= min_side
+
+
+def detect_tiled(model, image, tile_size=TILE_SIZE, overlap=TILE_OVERLAP, batch_size=TILE_BATCH_SIZE,
+                 workers=TILE_WORKERS, iou_threshold=TILE_IOU_THRESHOLD, include_full=True):
+    """Run YOLO over overlapping tiles of a BGR image and merge the results in full-image coordinates.
+
+    Tiles are grouped into batched forward passes, spread over `workers` threads.
+    With include_full, the whole image is also run once at the default size so
+    objects larger than a tile are still found. Overlapping boxes from neighbouring
+    tiles are merged with class-aware NMS.
+    """
+    timings = {}
+    start = time.perf_counter()
+    tiles = make_tiles(image, tile_size, overlap)
+    jobs = [[(x0, y0) for x0, y0, _ in batch] for batch in batched(tiles, batch_size)]
+    crops = [[crop for _, _, crop in batch] for batch in batched(tiles, batch_size)]
+    if include_full:
+        jobs.append([(0, 0)])
+        crops.append([image])
+
+    def run(batch_crops):
+        return [r.xyxy[0].cpu().numpy() for r in detect_batch(model, batch_crops, size=tile_size)]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = list(executor.map(run, crops))
+    timings['inference'] = time.perf_counter() - start
+
+    merge_start = time.perf_counter()
+    shifted = []
+    for origins, batch_results in zip(jobs, results):
+        for (x0, y0), boxes in zip(origins, batch_results):
+            if len(boxes):
+                boxes = boxes.copy()
+                boxes[:, [0, 2]] += x0
+                boxes[:, [1, 3]] += y0
+                shifted.append(boxes)
+    merged = np.concatenate(shifted) if shifted else np.zeros((0, 6), dtype=np.float32)
+    if len(merged):
+        merged = merged[nms(merged[:, :4], merged[:, 4], iou_threshold, classes=merged[:, 5])]
+    timings['merge'] = time.perf_counter() - merge_start
+    timings['total'] = time.perf_counter() - start
+    timings['tiles'] = len(tiles)
+    return TiledDetections(merged, model.names, timings)
@@ -0,0 +1,135 @@
+# tracker.py
+# SORT-style multi-object tracker: constant-velocity Kalman filter per object + IoU association.
+# Gives every debris item a stable id so video dashboards count unique objects, and predicts
+# boxes on frames where inference was skipped.
+
+import itertools
+import os
+from collections import Counter
+
+import numpy as np
+
+from fusion import iou_matrix
+
+TRACK_IOU_THRESHOLD = float(os.getenv('TRACK_IOU_THRESHOLD', 0.3))
+TRACK_MAX_AGE = int(os.getenv('TRACK_MAX_AGE', 30))  # Frames a track survives without a matching detection
+TRACK_MIN_HITS = int(os.getenv('TRACK_MIN_HITS', 2))  # Matches before a track counts as a unique object
+
+
+def box_to_z(box):
+    x1, y1, x2, y2 = box
+    w, h = max(x2 - x1, 1e-6), max(y2 - y1, 1e-6)
+    return np.array([x1 + w / 2, y1 + h / 2, w * h, w / h])
+
+
+def z_to_box(z):
+    cx, cy, s, r = z[:4]
+    w = np.sqrt(max(s * r, 0.0))
+    h = s / w if w > 0 else 0.0
+    return [cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2]
+
+
+class KalmanBoxTrack:
+    """One tracked object. State is [cx, cy, area, aspect, vx, vy, v_area]."""
+
+    _ids = itertools.count(1)
+
+    # Constant-velocity model, shared by every track (same values as the SORT paper)
+    F = np.eye(7)
+    F[0, 4] = F[1, 5] = F[2, 6] = 1
+    H = np.eye(4, 7)
+    R = np.diag([1.0, 1.0, 10.0, 10.0])
+    Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.0001])
+
+    def __init__(self, detection):
+        self.track_id = next(self._ids)
+        self.x = np.zeros(7)
+        self.x[:4] = box_to_z(detection['box'])
+        self.P = np.diag([10.0, 10.0, 10.0, 10.0, 10000.0, 10000.0, 10000.0])
+        self.hits = 1
+        self.time_since_update = 0
+        self.classes = Counter([detection['class']])
+        self.last = detection
+
+    def predict(self):
+        # Keep the predicted area from going negative
+        if self.x[2] + self.x[6] <= 0:
+            self.x[6] = 0.0
+        self.x = self.F @ self.x
+        self.P = self.F @ self.P @ self.F.T + self.Q
+        self.time_since_update += 1
+
+    def update(self, detection):
+        y = box_to_z(detection['box']) - self.H @ self.x
+        S = self.H @ self.P @ self.H.T + self.R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ y
+        self.P = (np.eye(7) - K @ self.H) @ self.P
+        self.hits += 1
+        self.time_since_update = 0
+        self.classes[detection['class']] += 1
+        self.last = detection
+
+    @property
+    def box(self):
+        return z_to_box(self.x)
+
+    @property
+    def label(self):
+        return self.classes.most_common(1)[0][0]
+
+    def as_detection(self):
+        """Current state in the same dict shape as model.combine_results' boxes, plus the track id."""
+        return {'box': self.box, 'conf': self.last['conf'], 'class': self.label,
+                'source': self.last['source'], 'track_id': self.track_id}
+
+
+class Tracker:
+    """Call step() once per video frame, with that frame's fused boxes or None when inference was skipped.
+
+    Association is greedy on IoU (highest overlap first), which is enough for the
+    handful of objects per frame we see and avoids a scipy dependency.
+    """
+
+    def __init__(self, iou_threshold=TRACK_IOU_THRESHOLD, max_age=TRACK_MAX_AGE, min_hits=TRACK_MIN_HITS):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.tracks = []
+        self.class_counts = {}  # Unique confirmed objects per class
+
+    def _confirm(self, track):
+        if track.hits == self.min_hits:
+            self.class_counts[track.label] = self.class_counts.get(track.label, 0) + 1
+
+    def step(self, detections=None):
+        """Advance one frame; returns the boxes to draw (with track ids) for this frame."""
+        for track in self.tracks:
+            track.predict()
+
+        if detections is not None:
+            unmatched = set(range(len(detections)))
+            if self.tracks and detections:
+                ious = iou_matrix([t.box for t in self.tracks], [d['box'] for d in detections])
+                # Greedy matching: repeatedly take the best remaining pair above the threshold
+                for flat in np.argsort(-ious, axis=None):
+                    t, d = np.unravel_index(flat, ious.shape)
+                    if ious[t, d] < self.iou_threshold:
+                        break
+                    if d in unmatched and self.tracks[t].time_since_update > 0:
+                        self.tracks[t].update(detections[d])
+                        self._confirm(self.tracks[t])
+                        unmatched.discard(d)
+            for d in sorted(unmatched):
+                track = KalmanBoxTrack(detections[d])
+                self.tracks.append(track)
+                self._confirm(track)
+
+        self.tracks = [t for t in self.tracks if t.time_since_update <= self.max_age]
+
+        # Draw confirmed tracks (predicted on skipped frames) and anything matched this frame
+        return [t.as_detection() for t in self.tracks
+                if (t.hits >= self.min_hits and t.time_since_update <= max(1, self.max_age // 2)) or t.time_since_update == 0]
+
+    def unique_counts(self):
+        return dict(self.class_counts)
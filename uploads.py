@@ -0,0 +1,244 @@
+# uploads.py
+# Resumable chunked upload routes on the Flask server underneath Dash. Large files stream straight to
+# disk instead of travelling as one base64 data URI through dcc.Upload; Dash only carries the upload id.
+#
+#   POST /uploads                      {"filename": ..., "size": ...} -> {"upload_id": ...}
+#   GET  /uploads/<id>                 -> {"received": bytes on disk, "complete": bool}  (resume point)
+#   PUT  /uploads/<id>?offset=N        raw chunk body, must start at the current size
+#   POST /uploads/<id>/complete        -> {"upload_id", "filename", "size", "sha256"}
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+
+from flask import jsonify, request
+
+UPLOAD_DIR = os.getenv('UPLOAD_DIR', os.path.join('.cache', 'uploads'))
+UPLOAD_MAX_BYTES = int(os.getenv('UPLOAD_MAX_BYTES', 8 * 2**30))
+UPLOAD_CHUNK_READ = 1 << 20  # Bytes read from the request stream at a time
+UPLOAD_MAX_AGE = float(os.getenv('UPLOAD_MAX_AGE', 24 * 3600))  # Abandoned or unconsumed uploads are swept after this
+
+ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.mp4'}
+
+
+class UploadGone(LookupError):
+    """The upload was completed and taken, swept as stale, or never existed."""
+
+
+class UploadStore:
+    """Upload files and their metadata on disk, with a running content hash per upload."""
+
+    def __init__(self, upload_dir=UPLOAD_DIR):
+        self.upload_dir = upload_dir
+        os.makedirs(upload_dir, exist_ok=True)
+        self._hashes = {}  # upload_id -> hashlib object fed as chunks arrive (rebuilt from disk after a restart)
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def valid_id(upload_id):
+        return bool(upload_id) and re.fullmatch(r'[0-9a-f]{32}', upload_id) is not None
+
+    def _meta_path(self, upload_id):
+        return os.path.join(self.upload_dir, f"{upload_id}.json")
+
+    def _lock_for(self, upload_id):
+        with self._lock:
+            return self._locks.setdefault(upload_id, threading.Lock())
+
+    def meta(self, upload_id):
+        if not self.valid_id(upload_id):
+            return None
+        try:
+            with open(self._meta_path(upload_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_meta(self, meta):
+        with open(self._meta_path(meta['upload_id']), 'w') as f:
+            json.dump(meta, f)
+
+    def path(self, upload_id, meta=None):
+        meta = meta or self.meta(upload_id)
+        return os.path.join(self.upload_dir, f"{upload_id}{meta['ext']}") if meta else None
+
+    def create(self, filename, size):
+        self.evict_stale()
+        ext = os.path.splitext(filename or '')[1].lower()
+        if ext not in ALLOWED_EXTENSIONS:
+            raise ValueError(f"Unsupported file type '{ext}'")
+        if size is not None:
+            try:
+                size = int(size)
+            except (TypeError, ValueError):
+                raise ValueError("size must be a number of bytes") from None
+            if size < 0:
+                raise ValueError("size must be a number of bytes")
+            if size > UPLOAD_MAX_BYTES:
+                raise ValueError("File too large")
+        meta = {'upload_id': uuid.uuid4().hex, 'filename': os.path.basename(filename), 'ext': ext,
+                'size': size, 'complete': False, 'sha256': None}
+        open(self.path(meta['upload_id'], meta), 'wb').close()
+        self._save_meta(meta)
+        return meta
+
+    def received(self, upload_id):
+        path = self.path(upload_id)
+        return os.path.getsize(path) if path and os.path.exists(path) else 0
+
+    def _open_meta(self, upload_id):
+        """Metadata and data path of an upload that still exists on disk, else UploadGone."""
+        meta = self.meta(upload_id)
+        path = self.path(upload_id, meta)
+        if meta is None or not os.path.exists(path):
+            raise UploadGone(upload_id)
+        return meta, path
+
+    def append(self, upload_id, offset, stream, length=None):
+        """Append a chunk read from `stream` at `offset`; returns the new size, or None if the offset is stale.
+
+        `length` (the request's Content-Length, if known) lets an oversized chunk be refused before any of it is
+        written; a chunk that turns out too long while streaming is rolled back, so the resume point stays valid.
+        """
+        with self._lock_for(upload_id):
+            meta, path = self._open_meta(upload_id)
+            if meta['complete']:
+                raise ValueError("Upload already completed")
+            if offset != os.path.getsize(path):
+                return None
+            limit = meta['size'] if meta['size'] is not None else UPLOAD_MAX_BYTES
+            if length is not None and offset + length > limit:
+                raise ValueError("File too large")
+            digest = self._hashes.get(upload_id)
+            if digest is None:
+                digest = self._hash_file(path)
+            chunk_digest = digest.copy()  # Only committed once the whole chunk is on disk
+            with open(path, 'ab') as f:
+                while True:
+                    chunk = stream.read(UPLOAD_CHUNK_READ)
+                    if not chunk:
+                        break
+                    if f.tell() + len(chunk) > limit:
+                        f.truncate(offset)
+                        raise ValueError("File too large")
+                    f.write(chunk)
+                    chunk_digest.update(chunk)
+                self._hashes[upload_id] = chunk_digest
+                return f.tell()
+
+    @staticmethod
+    def _hash_file(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(UPLOAD_CHUNK_READ), b''):
+                digest.update(chunk)
+        return digest
+
+    def complete(self, upload_id):
+        with self._lock_for(upload_id):
+            meta, path = self._open_meta(upload_id)
+            if not meta['complete']:
+                digest = self._hashes.pop(upload_id, None) or self._hash_file(path)
+                meta['size'] = os.path.getsize(path)
+                meta['sha256'] = digest.hexdigest()
+                meta['complete'] = True
+                self._save_meta(meta)
+            return meta
+
+    def completed_path(self, upload_id):
+        """Path of a finished upload (for the detection pipelines), or None."""
+        meta = self.meta(upload_id)
+        return self.path(upload_id, meta) if meta and meta['complete'] else None
+
+    def take(self, upload_id, suffix=''):
+        """Move a finished upload out of the store to a temp file the caller owns and must delete."""
+        path = self.completed_path(upload_id)
+        if path is None:
+            return None
+        fd, owned_path = tempfile.mkstemp(suffix=suffix or os.path.splitext(path)[1], dir=self.upload_dir)
+        os.close(fd)
+        os.replace(path, owned_path)
+        self.remove(upload_id)
+        return owned_path
+
+    def remove(self, upload_id):
+        meta = self.meta(upload_id)
+        if meta is None:
+            return
+        for path in (self.path(upload_id, meta), self._meta_path(upload_id)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self._lock:
+            self._hashes.pop(upload_id, None)
+            self._locks.pop(upload_id, None)
+
+    def evict_stale(self, max_age=UPLOAD_MAX_AGE):
+        cutoff = time.time() - max_age
+        for name in os.listdir(self.upload_dir):
+            upload_id, ext = os.path.splitext(name)
+            meta = self.meta(upload_id) if ext == '.json' else None
+            if meta is None:
+                continue
+            # The data file is touched by every chunk, the metadata only on create/complete
+            paths = [self._meta_path(upload_id), self.path(upload_id, meta)]
+            if max(os.path.getmtime(p) for p in paths if os.path.exists(p)) < cutoff:
+                self.remove(upload_id)
+
+
+upload_store = UploadStore()
+
+
+def register_routes(server, store=upload_store):
+    """Add the chunked upload routes to the Flask server behind the Dash app."""
+
+    @server.route('/uploads', methods=['POST'])
+    def create_upload():
+        body = request.get_json(silent=True) or {}
+        try:
+            meta = store.create(body.get('filename'), body.get('size'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'upload_id': meta['upload_id']})
+
+    @server.route('/uploads/<upload_id>', methods=['GET'])
+    def upload_status(upload_id):
+        meta = store.meta(upload_id)
+        if meta is None:
+            return jsonify({'error': 'unknown upload'}), 404
+        return jsonify({'received': store.received(upload_id), 'complete': meta['complete']})
+
+    @server.route('/uploads/<upload_id>', methods=['PUT'])
+    def upload_chunk(upload_id):
+        if store.meta(upload_id) is None:
+            return jsonify({'error': 'unknown upload'}), 404
+        offset = request.args.get('offset', type=int)
+        if offset is None:
+            return jsonify({'error': 'offset is required'}), 400
+        try:
+            received = store.append(upload_id, offset, request.stream, request.content_length)
+        except UploadGone:
+            return jsonify({'error': 'upload no longer exists'}), 410  # Taken or swept since the check above
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if received is None:
+            # Client and server disagree about where we are: tell it where to resume
+            return jsonify({'error': 'offset mismatch', 'received': store.received(upload_id)}), 409
+        return jsonify({'received': received})
+
+    @server.route('/uploads/<upload_id>/complete', methods=['POST'])
+    def complete_upload(upload_id):
+        if store.meta(upload_id) is None:
+            return jsonify({'error': 'unknown upload'}), 404
+        try:
+            meta = store.complete(upload_id)
+        except UploadGone:
+            return jsonify({'error': 'upload no longer exists'}), 410
+        return jsonify({key: meta[key] for key in ('upload_id', 'filename', 'size', 'sha256')})